@@ -1,7 +1,16 @@
-class InnerPID:
+import numpy as np
+
+from controllers.controller_base import Controller
+from controllers.pid_core import pid_many
+from controllers.pid_controller import PIDBank
+from controllers.kernels import HAVE_COMPILED, cascade_bank_loop
+
+class CascadePID(Controller):
     """
-    Simple PID for the inner loop in a cascade arrangement.
+    Simple PID used for either level of a cascade arrangement.
     """
+    _state_fields = ('int_err', 'prev_err')
+
     def __init__(self, Kp=1.0, Ki=0.0, Kd=0.0, dt=0.01, windup_limit=1e6):
         self.Kp = Kp
         self.Ki = Ki
@@ -19,7 +28,7 @@ class InnerPID:
     def compute(self, setpoint, measurement):
         error = setpoint - measurement
         P_out = self.Kp * error
-        
+
         self.int_err += error * self.dt
         self.int_err = max(min(self.int_err, self.windup_limit), -self.windup_limit)
         I_out = self.Ki * self.int_err
@@ -30,34 +39,197 @@ class InnerPID:
         self.prev_err = error
         return P_out + I_out + D_out
 
-class OuterPID:
+    def compute_many(self, setpoints, measurements):
+        errors = np.subtract(setpoints, measurements, dtype=float)
+        out, self.int_err, self.prev_err = pid_many(
+            errors, self.Kp, self.Ki, self.Kd, self.dt, self.windup_limit,
+            self.int_err, self.prev_err)
+        return out
+
+class InnerPID(CascadePID):
+    """
+    Simple PID for the inner loop in a cascade arrangement.
+    """
+
+class OuterPID(CascadePID):
     """
     Simple PID for the outer loop in a cascade arrangement.
     """
-    def __init__(self, Kp=1.0, Ki=0.0, Kd=0.0, dt=0.01, windup_limit=1e6):
-        self.Kp = Kp
-        self.Ki = Ki
-        self.Kd = Kd
+
+class CascadeBank(Controller):
+    """
+    N outer/inner PID cascades (e.g. temperature -> flow) stepped together.
+
+    Both levels are PIDBanks, so gains and states are contiguous arrays and
+    every cascade gives the same numbers as a separate OuterPID/InnerPID pair.
+    The inner loop may run inner_ratio times faster than the outer loop: the
+    outer loop is evaluated on the first inner tick of each outer period and
+    its flow setpoint is held in between.
+    """
+    _state_fields = ('flow_setpoint', 'tick')
+
+    def __init__(self, n, outer_gains, inner_gains, dt=0.01, inner_ratio=1,
+                 outer_windup_limit=1e6, inner_windup_limit=1e6):
+        """
+        :param n: Number of cascades
+        :param outer_gains: (Kp, Ki, Kd) of the outer loop, scalars or arrays of length n
+        :param inner_gains: (Kp, Ki, Kd) of the inner loop, scalars or arrays of length n
+        :param dt: Sampling time of the outer loop
+        :param inner_ratio: Number of inner-loop ticks per outer-loop tick
+        :param outer_windup_limit, inner_windup_limit: Anti-windup clamps
+        """
+        if int(inner_ratio) != inner_ratio or inner_ratio < 1:
+            raise ValueError("inner_ratio must be a positive integer")
+        self.n = n
         self.dt = dt
-        self.windup_limit = windup_limit
+        self.inner_ratio = int(inner_ratio)
+        self.inner_dt = dt / self.inner_ratio
 
-        self.int_err = 0.0
-        self.prev_err = 0.0
+        Kp, Ki, Kd = outer_gains
+        self.outer = PIDBank(n, Kp=Kp, Ki=Ki, Kd=Kd, dt=dt, windup_limit=outer_windup_limit)
+        Kp, Ki, Kd = inner_gains
+        self.inner = PIDBank(n, Kp=Kp, Ki=Ki, Kd=Kd, dt=self.inner_dt,
+                             windup_limit=inner_windup_limit)
+
+        self.flow_setpoint = np.zeros(n)
+        self.tick = 0
+
+    @classmethod
+    def from_controllers(cls, pairs, inner_ratio=1):
+        """
+        Build a bank from existing (OuterPID, InnerPID) pairs, including their
+        state. The inner loops must run at dt / inner_ratio.
+        """
+        outers = [outer for outer, _ in pairs]
+        inners = [inner for _, inner in pairs]
+        bank = cls(len(pairs),
+                   ([c.Kp for c in outers], [c.Ki for c in outers], [c.Kd for c in outers]),
+                   ([c.Kp for c in inners], [c.Ki for c in inners], [c.Kd for c in inners]),
+                   dt=outers[0].dt, inner_ratio=inner_ratio,
+                   outer_windup_limit=[c.windup_limit for c in outers],
+                   inner_windup_limit=[c.windup_limit for c in inners])
+        bank.outer.dt[:] = [c.dt for c in outers]
+        bank.inner.dt[:] = [c.dt for c in inners]
+        for level, controllers in ((bank.outer, outers), (bank.inner, inners)):
+            level.integral_term[:] = [c.int_err for c in controllers]
+            level.prev_error[:] = [c.prev_err for c in controllers]
+        return bank
 
     def reset(self):
-        self.int_err = 0.0
-        self.prev_err = 0.0
+        self.outer.reset()
+        self.inner.reset()
+        self.flow_setpoint.fill(0.0)
+        self.tick = 0
 
-    def compute(self, setpoint, measurement):
-        error = setpoint - measurement
-        P_out = self.Kp * error
-        
-        self.int_err += error * self.dt
-        self.int_err = max(min(self.int_err, self.windup_limit), -self.windup_limit)
-        I_out = self.Ki * self.int_err
+    def get_state(self):
+        state = super().get_state()
+        state['outer'] = self.outer.get_state()
+        state['inner'] = self.inner.get_state()
+        return state
 
-        d_err = (error - self.prev_err) / self.dt
-        D_out = self.Kd * d_err
+    def set_state(self, state):
+        state = dict(state)
+        self.outer.set_state(state.pop('outer'))
+        self.inner.set_state(state.pop('inner'))
+        super().set_state(state)
 
-        self.prev_err = error
-        return P_out + I_out + D_out
+    def compute(self, setpoints, measurements, out=None):
+        """
+        Advance every cascade by one inner-loop tick.
+        :param setpoints: Outer setpoints (array of length n or a scalar); only
+                          read on ticks where the outer loop runs
+        :param measurements: Array of shape (2, n): row 0 the outer measurements
+                             (e.g. temperatures), row 1 the inner ones (e.g. flows)
+        :param out: Optional preallocated output array of length n
+        :return: Inner-loop outputs (e.g. valve commands), one per cascade
+        """
+        if self.tick % self.inner_ratio == 0:
+            self.outer.compute(setpoints, measurements[0], out=self.flow_setpoint)
+        self.tick += 1
+        return self.inner.compute(self.flow_setpoint, measurements[1], out=out)
+
+    def compute_many(self, setpoints, measurements):
+        """
+        compute() over T consecutive inner ticks.
+        :param setpoints: Array of shape (T, n) (or broadcastable to it)
+        :param measurements: Array of shape (T, 2, n) of stacked outer/inner measurements
+        :return: Array of shape (T, n) of inner-loop outputs
+        """
+        measurements = np.asarray(measurements, dtype=float)
+        setpoints = np.broadcast_to(setpoints, measurements[:, 0].shape)
+        out = np.empty(measurements[:, 0].shape)
+        for k in range(len(out)):
+            self.compute(setpoints[k], measurements[k], out=out[k])
+        return out
+
+    def rollout(self, setpoints, flow_plant, temp_plant, fast=True):
+        """
+        Closed-loop rollout of all cascades, as in run_cascade_example.py:
+          flow_sp = outer(setpoint, temp[k-1])       (every inner_ratio ticks)
+          valve   = inner(flow_sp, flow[k-1])
+          temp[k] = a_t*temp[k-1] + b_t*flow[k-1]
+          flow[k] = a_f*flow[k-1] + b_f*valve
+        The plants are FirstOrderPlants at the inner rate whose a, b and y may
+        be arrays of length n (one plant per cascade). On return their y holds
+        the final outputs (a new array; the caller's initial y is not written).
+
+        With numba installed the whole rollout, including every inner
+        sub-step, runs in one compiled kernel (controllers.kernels) with the
+        same numbers as stepping compute(); otherwise each inner tick is a
+        fixed number of array operations over all N cascades.
+
+        :param setpoints: Outer setpoints, shape (T_outer,) or (T_outer, n)
+        :param fast: Set False to force the array-operation loop
+        :return: temp, flow, flow_sp, valve arrays of shape (T_outer * inner_ratio + 1, n);
+                 row 0 is the initial plant state
+        """
+        n, ratio = self.n, self.inner_ratio
+        setpoints = np.asarray(setpoints, dtype=float)
+        n_ticks = len(setpoints) * ratio
+
+        temp = np.zeros((n_ticks + 1, n))
+        flow = np.zeros((n_ticks + 1, n))
+        flow_sp = np.zeros((n_ticks + 1, n))
+        valve = np.zeros((n_ticks + 1, n))
+        temp[0] = temp_plant.y
+        flow[0] = flow_plant.y
+        a_t, b_t, a_f, b_f = (np.ascontiguousarray(np.broadcast_to(np.asarray(c, dtype=float), (n,)))
+                              for c in (temp_plant.a, temp_plant.b, flow_plant.a, flow_plant.b))
+
+        if fast and HAVE_COMPILED:
+            outer, inner = self.outer, self.inner
+            outer_state = np.array([outer.integral_term, outer.prev_error])
+            inner_state = np.array([inner.integral_term, inner.prev_error])
+            cascade_bank_loop(np.ascontiguousarray(np.broadcast_to(setpoints.reshape(len(setpoints), -1),
+                                                                   (len(setpoints), n))),
+                              ratio, self.tick, temp, flow, flow_sp, valve, a_f, b_f, a_t, b_t,
+                              np.array([outer.Kp, outer.Ki, outer.Kd, outer.dt, outer.windup_limit]),
+                              outer_state,
+                              np.array([inner.Kp, inner.Ki, inner.Kd, inner.dt, inner.windup_limit]),
+                              inner_state, self.flow_setpoint)
+            outer.integral_term[:], outer.prev_error[:] = outer_state
+            inner.integral_term[:], inner.prev_error[:] = inner_state
+            self.tick += n_ticks
+        else:
+            measurements = np.empty((2, n))
+            for k in range(1, n_ticks + 1):
+                measurements[0] = temp[k - 1]
+                measurements[1] = flow[k - 1]
+                self.compute(setpoints[(k - 1) // ratio], measurements, out=valve[k])
+                flow_sp[k] = self.flow_setpoint
+                temp[k] = a_t * temp[k - 1] + b_t * flow[k - 1]
+                flow[k] = a_f * flow[k - 1] + b_f * valve[k]
+
+        temp_plant.y = temp[-1].copy()
+        flow_plant.y = flow[-1].copy()
+        return temp, flow, flow_sp, valve
+
+    def step_outer(self, setpoints, flow_plant, temp_plant):
+        """
+        Advance every cascade by one outer period against the plants: the
+        outer loop once and the inner loop inner_ratio times, in one rollout
+        call instead of inner_ratio compute() calls.
+        :param setpoints: Outer setpoints (array of length n or a scalar)
+        :return: Array of shape (inner_ratio, n) of inner-loop outputs
+        """
+        return self.rollout(np.broadcast_to(setpoints, (1, self.n)), flow_plant, temp_plant)[3][1:]
@@ -0,0 +1,76 @@
+import numpy as np
+
+class Controller:
+    """
+    Common interface shared by the stepping controllers, so a simulation or
+    serving layer can drive any of them without per-class special cases:
+
+      step(setpoint, measurement)           one sample (same as compute())
+      compute_many(setpoints, measurements) consecutive samples in one call,
+                                            returning the array of outputs and
+                                            leaving the controller in the same
+                                            state as the equivalent step() calls
+      reset()                               back to the initial state
+      get_state() / set_state(state)        snapshot / restore the dynamic state
+
+    For the bank controllers (PIDBank, DiscreteIMCBank, SmithPredictorBank)
+    a sample is an array with one entry per loop, so compute_many() takes
+    (T, n) arrays. CascadeBank takes its outer and inner measurements stacked
+    into one (2, n) measurement. Extra inputs such as scheduling values are
+    optional keywords or setters (GridGainSchedulingPID.set_schedule()).
+
+    The dynamic state is the attributes named in _state_fields. Subclasses
+    replace the generic compute_many() loop with vectorized versions where the
+    recursion allows it.
+    """
+    __slots__ = ()
+
+    # Attributes holding the controller's dynamic state
+    _state_fields = ()
+
+    def step(self, setpoint, measurement):
+        return self.compute(setpoint, measurement)
+
+    def reset(self):
+        for name in self._state_fields:
+            value = getattr(self, name)
+            if isinstance(value, np.ndarray):
+                value.fill(0.0)
+            else:
+                setattr(self, name, 0.0)
+
+    def get_state(self):
+        """
+        :return: Dict of state attribute name -> value (arrays are copied)
+        """
+        state = {}
+        for name in self._state_fields:
+            value = getattr(self, name)
+            state[name] = value.copy() if isinstance(value, np.ndarray) else value
+        return state
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state(). Arrays are copied into the
+        controller's own buffers, so views of them stay valid.
+        """
+        for name, value in state.items():
+            if name not in self._state_fields:
+                raise KeyError(f"{type(self).__name__} has no state '{name}'")
+            current = getattr(self, name)
+            if isinstance(current, np.ndarray):
+                current[...] = value
+            else:
+                setattr(self, name, value)
+
+    def compute_many(self, setpoints, measurements):
+        """
+        Run compute() over consecutive samples.
+        :param setpoints: Array of setpoints (or a scalar held for every sample)
+        :param measurements: Array of measurements, one per sample
+        :return: Array of control outputs, one per sample
+        """
+        measurements = np.asarray(measurements, dtype=float)
+        setpoints = np.broadcast_to(np.asarray(setpoints, dtype=float), measurements.shape)
+        compute = self.compute
+        return np.array([compute(sp, m) for sp, m in zip(setpoints, measurements)])
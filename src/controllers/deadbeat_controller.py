@@ -1,6 +1,8 @@
 import numpy as np
 
-class DeadbeatController:
+from controllers.controller_base import Controller
+
+class DeadbeatController(Controller):
     """
     A simple discrete-time deadbeat controller for a first-order system
     of the form x[k+1] = a*x[k] + b*u[k].
@@ -30,3 +32,11 @@ class DeadbeatController:
         """
         u = (setpoint - self.a*measurement) / self.b
         return u
+
+    def reset(self):
+        # The control law is static
+        pass
+
+    def compute_many(self, setpoints, measurements):
+        measurements = np.asarray(measurements, dtype=float)
+        return (setpoints - self.a*measurements) / self.b
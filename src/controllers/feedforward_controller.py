@@ -1,4 +1,8 @@
-class FeedForwardController:
+import numpy as np
+
+from controllers.controller_base import Controller
+
+class FeedForwardController(Controller):
     """
     Simple feed-forward + PID combination.
     The feed-forward term aims to invert the plant model (or partial),
@@ -24,3 +28,15 @@ class FeedForwardController:
         fb = self.pid.compute(setpoint, measurement)
         
         return ff + fb
+
+    def get_state(self):
+        return self.pid.get_state()
+
+    def set_state(self, state):
+        self.pid.set_state(state)
+
+    def compute_many(self, setpoints, measurements):
+        measurements = np.asarray(measurements, dtype=float)
+        setpoints = np.broadcast_to(np.asarray(setpoints, dtype=float), measurements.shape)
+        ff = self.ff_gain * setpoints
+        return ff + self.pid.compute_many(setpoints, measurements)
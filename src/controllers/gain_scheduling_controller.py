@@ -1,84 +1,325 @@
+from bisect import bisect_left, insort
+
 import numpy as np
 
-class GainSchedulingPID:
+from controllers.pid_core import PIDCore, pid_many
+
+class GainSchedulingPID(PIDCore):
     """
     A PID controller whose gains (Kp, Ki, Kd) depend on a scheduling variable,
     e.g. speed, temperature, etc.
 
     We'll do a simple "table lookup" approach with linear interpolation.
+    The P/I/D stepping itself is done by PIDCore with the interpolated gains.
+
+    The table is compiled into sorted arrays the first time it is used after a
+    change. A lookup first checks the segment used by the previous call (the
+    scheduling variable usually moves slowly) and otherwise bisects, so it is
+    O(1) amortized and O(log n) at worst. gain_table is a read-only tuple;
+    change the schedule through add_gain_point() or set_gain_table().
     """
+    __slots__ = ('__dict__', '_points', '_table', '_sched', '_gains', '_segment', '_dirty')
 
     def __init__(self, dt=0.01, windup_limit=1e6):
-        self.dt = dt
-        self.windup_limit = windup_limit
-
-        self.integral_term = 0.0
-        self.prev_error = 0.0
+        super().__init__(Kp=0.0, Ki=0.0, Kd=0.0, dt=dt, windup_limit=windup_limit)
 
         # Gains schedule: list of tuples (sched_value, Kp, Ki, Kd)
-        self.gain_table = []
+        self._points = []
+
+        # Compiled schedule: (n, 4) array plus float lists for the scalar path
+        self._table = np.empty((0, 4))
+        self._sched = []
+        self._gains = []
+        self._segment = 0
+        self._dirty = True
+
+    @property
+    def gain_table(self):
+        """
+        The schedule as a tuple of (sched_value, Kp, Ki, Kd) rows sorted by sched_value.
+        """
+        return tuple(self._points)
 
     def add_gain_point(self, sched_value, Kp, Ki, Kd):
         """
         Add a point (sched_value -> (Kp, Ki, Kd)) to the schedule.
-        Make sure to add them in ascending order of sched_value.
+        Points may be added in any order; they are inserted in sorted position.
+        """
+        insort(self._points, (sched_value, Kp, Ki, Kd), key=lambda x: x[0])
+        self._dirty = True
+
+    def set_gain_table(self, table):
+        """
+        Replace the whole schedule in one call.
+        :param table: Array-like of shape (n, 4) with rows (sched_value, Kp, Ki, Kd),
+                      in any order
+        """
+        table = np.asarray(table, dtype=float).reshape(-1, 4)
+        table = table[np.argsort(table[:, 0], kind='stable')]
+        self._points = [tuple(row) for row in table.tolist()]
+        self._dirty = True
+
+    def _compile(self):
+        """
+        Build the sorted array form of gain_table used by the lookups.
         """
-        self.gain_table.append((sched_value, Kp, Ki, Kd))
-        self.gain_table.sort(key=lambda x: x[0])  # keep sorted
+        self._table = np.array(self._points, dtype=float).reshape(-1, 4)
+        self._sched = [row[0] for row in self._points]
+        self._gains = [tuple(row[1:]) for row in self._points]
+        self._segment = 0
+        self._dirty = False
 
     def _interpolate_gains(self, current_sched):
         """
         Interpolate between the two nearest points in self.gain_table
         based on current_sched.
         """
+        if self._dirty:
+            self._compile()
+        sched = self._sched
+
         # If out of bounds, clamp to min or max
-        if current_sched <= self.gain_table[0][0]:
-            return self.gain_table[0][1:]
-        if current_sched >= self.gain_table[-1][0]:
-            return self.gain_table[-1][1:]
+        if current_sched <= sched[0]:
+            return self._gains[0]
+        if current_sched >= sched[-1]:
+            return self._gains[-1]
+
+        # Bracketing segment i satisfies sched[i] < current_sched <= sched[i+1];
+        # try the last one used before bisecting
+        i = self._segment
+        if not (sched[i] < current_sched <= sched[i+1]):
+            i = bisect_left(sched, current_sched) - 1
+            self._segment = i
 
-        # Otherwise, find bracketing points
-        for i in range(len(self.gain_table)-1):
-            s0, kp0, ki0, kd0 = self.gain_table[i]
-            s1, kp1, ki1, kd1 = self.gain_table[i+1]
+        s0 = sched[i]
+        s1 = sched[i+1]
+        kp0, ki0, kd0 = self._gains[i]
+        kp1, ki1, kd1 = self._gains[i+1]
 
-            if s0 <= current_sched <= s1:
-                # linear interpolation
-                ratio = (current_sched - s0)/(s1 - s0)
-                Kp = kp0 + ratio*(kp1 - kp0)
-                Ki = ki0 + ratio*(ki1 - ki0)
-                Kd = kd0 + ratio*(kd1 - kd0)
-                return (Kp, Ki, Kd)
+        # linear interpolation
+        ratio = (current_sched - s0)/(s1 - s0)
+        Kp = kp0 + ratio*(kp1 - kp0)
+        Ki = ki0 + ratio*(ki1 - ki0)
+        Kd = kd0 + ratio*(kd1 - kd0)
+        return (Kp, Ki, Kd)
 
-        # fallback (should not happen if logic is correct)
-        return self.gain_table[-1][1:]
+    def interpolate_gains_many(self, sched_values):
+        """
+        Vectorized version of the gain lookup for an array of scheduling values.
+        :return: Array of shape (len(sched_values), 3) with columns Kp, Ki, Kd
+        """
+        if self._dirty:
+            self._compile()
+        table = self._table
+        x = np.asarray(sched_values, dtype=float)
+        if len(table) == 1:
+            return np.broadcast_to(table[0, 1:], x.shape + (3,)).copy()
 
-    def reset(self):
-        self.integral_term = 0.0
-        self.prev_error = 0.0
+        i = np.clip(np.searchsorted(table[:, 0], x, side='left') - 1, 0, len(table) - 2)
+        s0 = table[i, 0]
+        s1 = table[i + 1, 0]
+        ratio = np.clip((x - s0) / (s1 - s0), 0.0, 1.0)[..., None]
+        g0 = table[i, 1:]
+        g1 = table[i + 1, 1:]
+        # Above the last point return its gains exactly, as the scalar lookup does
+        return np.where(x[..., None] >= table[-1, 0], table[-1, 1:], g0 + ratio * (g1 - g0))
 
-    def compute(self, setpoint, measurement, sched_value):
+    def compute(self, setpoint, measurement, sched_value=None):
         """
         :param setpoint: desired output
         :param measurement: actual output
-        :param sched_value: current scheduling parameter
+        :param sched_value: current scheduling parameter (defaults to the measurement)
         """
         error = setpoint - measurement
 
         # get current gains by interpolation
-        Kp, Ki, Kd = self._interpolate_gains(sched_value)
+        Kp, Ki, Kd = self._interpolate_gains(measurement if sched_value is None else sched_value)
+
+        return self.update(error, Kp, Ki, Kd)
+
+    def step(self, setpoint, measurement, sched_value=None):
+        return self.compute(setpoint, measurement, sched_value=sched_value)
+
+    def compute_many(self, setpoints, measurements, sched_values=None):
+        """
+        compute() over consecutive samples, with the gains looked up in one
+        vectorized call.
+        :param sched_values: Scheduling value per sample (defaults to the measurement)
+        """
+        measurements = np.asarray(measurements, dtype=float)
+        errors = np.subtract(setpoints, measurements, dtype=float)
+        gains = self.interpolate_gains_many(measurements if sched_values is None else sched_values)
+        out, self.integral_term, self.prev_error = pid_many(
+            errors, gains[:, 0], gains[:, 1], gains[:, 2], self.dt, self.windup_limit,
+            self.integral_term, self.prev_error)
+        return out
+
+class GridGainSchedulingPID(PIDCore):
+    """
+    A PID controller scheduled on several variables at once (e.g. speed x load
+    x temperature), with Kp/Ki/Kd tables given on a regular grid and
+    multilinear interpolation between grid points.
+
+    Grid origins, inverse spacings, flat-index strides and the 2^d cell-corner
+    offsets are precomputed, so a lookup is constant time for a given number of
+    scheduling variables. Outside the grid the scheduling values are clamped
+    to its edges.
+
+    interpolate_gains_many() evaluates the gains for a whole batch of loops or
+    a whole trajectory in one vectorized call; the result can be written into
+    the Kp/Ki/Kd arrays of a PIDBank to step many scheduled loops together.
+
+    For the common step(setpoint, measurement) call, give the current
+    scheduling values with set_schedule() instead of per call.
+    """
+    __slots__ = ('__dict__', 'axes', 'schedule', '_origin', '_inv_step', '_upper', '_strides', '_corners',
+                 '_corner_bits', '_flat_gains', '_axis_params', '_corner_list', '_flat_list')
+
+    def __init__(self, axes, Kp_table, Ki_table, Kd_table, dt=0.01, windup_limit=1e6):
+        """
+        :param axes: Sequence of d 1-D arrays of evenly spaced breakpoints, one per
+                     scheduling variable (at least 2 points each)
+        :param Kp_table, Ki_table, Kd_table: Gain tables of shape (len(axes[0]), ..., len(axes[d-1]))
+        :param dt: Sampling time
+        :param windup_limit: Anti-windup clamp
+        """
+        super().__init__(Kp=0.0, Ki=0.0, Kd=0.0, dt=dt, windup_limit=windup_limit)
+
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]
+        shape = tuple(len(axis) for axis in self.axes)
+        for axis in self.axes:
+            steps = np.diff(axis)
+            if len(axis) < 2 or steps[0] <= 0 or not np.allclose(steps, steps[0]):
+                raise ValueError("each axis must have at least 2 evenly spaced, increasing points")
+
+        gains = np.stack([np.asarray(t, dtype=float) for t in (Kp_table, Ki_table, Kd_table)], axis=-1)
+        if gains.shape != shape + (3,):
+            raise ValueError(f"gain tables must have shape {shape}")
+
+        d = len(shape)
+        self._origin = np.array([axis[0] for axis in self.axes])
+        self._inv_step = np.array([(len(axis) - 1) / (axis[-1] - axis[0]) for axis in self.axes])
+        # Largest valid lower-corner index per axis
+        self._upper = np.array(shape) - 2
+        self._strides = np.array([int(np.prod(shape[k + 1:])) for k in range(d)])
+        self._corner_bits = np.array([[(c >> (d - 1 - k)) & 1 for k in range(d)]
+                                      for c in range(2 ** d)])
+        self._corners = self._corner_bits @ self._strides
+        self._flat_gains = gains.reshape(-1, 3)
+
+        # Plain Python copies for the scalar path
+        self._axis_params = list(zip(self._origin.tolist(), self._inv_step.tolist(),
+                                     self._upper.tolist(), self._strides.tolist()))
+        self._corner_list = list(zip(self._corners.tolist(), map(tuple, self._corner_bits.tolist())))
+        self._flat_list = [tuple(row) for row in self._flat_gains.tolist()]
+
+        # Scheduling values used when compute()/step() are not given any
+        self.schedule = None
+
+    def set_schedule(self, sched_values):
+        """
+        Set the current value of each scheduling variable, so the controller
+        can be stepped through the common step(setpoint, measurement) call.
+        """
+        sched_values = tuple(sched_values)
+        self._check_point(sched_values)
+        self.schedule = sched_values
+
+    def _check_point(self, sched_values):
+        if len(sched_values) != len(self._axis_params):
+            raise ValueError(f"expected {len(self._axis_params)} scheduling values, "
+                             f"got {len(sched_values)}")
+
+    def _interpolate_gains(self, sched_values):
+        """
+        Multilinear interpolation of (Kp, Ki, Kd) at one point of the grid.
+        Plain-float arithmetic so a scalar step does not go through NumPy.
+        """
+        self._check_point(sched_values)
+        base = 0
+        fracs = []
+        for x, (origin, inv_step, upper, stride) in zip(sched_values, self._axis_params):
+            t = (x - origin) * inv_step
+            if t <= 0.0:
+                i, f = 0, 0.0
+            elif t >= upper + 1:
+                i, f = upper, 1.0
+            else:
+                i = int(t)
+                if i > upper:
+                    i = upper
+                f = t - i
+            base += i * stride
+            fracs.append(f)
+
+        Kp = Ki = Kd = 0.0
+        table = self._flat_list
+        for offset, bits in self._corner_list:
+            w = 1.0
+            for f, bit in zip(fracs, bits):
+                w *= f if bit else 1.0 - f
+            kp, ki, kd = table[base + offset]
+            Kp += w * kp
+            Ki += w * ki
+            Kd += w * kd
+        return (Kp, Ki, Kd)
+
+    def interpolate_gains_many(self, sched_values):
+        """
+        Vectorized gain lookup.
+        :param sched_values: Array of shape (m, d), one row of scheduling values
+                             per loop or per time sample (or shape (m,) for d = 1)
+        :return: Array of shape (m, 3) with columns Kp, Ki, Kd
+        """
+        d = len(self.axes)
+        x = np.asarray(sched_values, dtype=float)
+        if x.ndim == 1 and d == 1:
+            x = x[:, None]
+        if x.ndim != 2 or x.shape[1] != d:
+            raise ValueError(f"sched_values must have shape (m, {d}), got {x.shape}")
+        t = np.clip((x - self._origin) * self._inv_step, 0.0, self._upper + 1)
+        i = np.minimum(t.astype(np.intp), self._upper)
+        frac = t - i
+        base = i @ self._strides
+
+        out = np.zeros((len(x), 3))
+        for offset, bits in zip(self._corners, self._corner_bits):
+            w = np.prod(np.where(bits, frac, 1.0 - frac), axis=1)
+            out += w[:, None] * self._flat_gains[base + offset]
+        return out
 
-        # P
-        P_out = Kp * error
+    def _current_schedule(self):
+        if self.schedule is None:
+            raise ValueError("no scheduling values given; pass sched_values or call set_schedule()")
+        return self.schedule
 
-        # I
-        self.integral_term += error * self.dt
-        self.integral_term = np.clip(self.integral_term, -self.windup_limit, self.windup_limit)
-        I_out = Ki * self.integral_term
+    def compute(self, setpoint, measurement, sched_values=None):
+        """
+        :param setpoint: desired output
+        :param measurement: actual output
+        :param sched_values: sequence with the current value of each scheduling
+                             variable (defaults to the values from set_schedule())
+        """
+        error = setpoint - measurement
+        if sched_values is None:
+            sched_values = self._current_schedule()
+        Kp, Ki, Kd = self._interpolate_gains(sched_values)
+        return self.update(error, Kp, Ki, Kd)
 
-        # D
-        derivative = (error - self.prev_error) / self.dt
-        D_out = Kd * derivative
+    def step(self, setpoint, measurement, sched_values=None):
+        return self.compute(setpoint, measurement, sched_values=sched_values)
 
-        self.prev_error = error
-        return P_out + I_out + D_out
+    def compute_many(self, setpoints, measurements, sched_values=None):
+        """
+        compute() over consecutive samples.
+        :param sched_values: Array of shape (T, d), scheduling values per sample
+                             (defaults to the values from set_schedule() for every sample)
+        """
+        errors = np.subtract(setpoints, measurements, dtype=float)
+        if sched_values is None:
+            sched_values = np.broadcast_to(self._current_schedule(), (errors.size, len(self.axes)))
+        gains = self.interpolate_gains_many(sched_values)
+        out, self.integral_term, self.prev_error = pid_many(
+            errors, gains[:, 0], gains[:, 1], gains[:, 2], self.dt, self.windup_limit,
+            self.integral_term, self.prev_error)
+        return out
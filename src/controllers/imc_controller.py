@@ -1,4 +1,97 @@
+from functools import lru_cache
+
 import control as ctrl
+import numpy as np
+from scipy import signal
+from scipy.linalg import expm
+
+from controllers.controller_base import Controller
+from controllers.state_space_controller import tf_coefficients, tf_key, zoh
+
+def _ss_matrices(sys):
+    """
+    (A, B, C, D) arrays of a SISO python-control system.
+    """
+    ss = ctrl.ss(sys)
+    return tuple(np.asarray(m, dtype=float) for m in (ss.A, ss.B, ss.C, ss.D))
+
+def _reachable_basis(A, B, tol):
+    """
+    Orthonormal basis of the subspace reachable from B through A, built one
+    staircase block at a time: each new block is A times the previous one
+    with the directions already found projected out, and its rank is decided
+    from its singular values.
+    """
+    basis = np.zeros((A.shape[0], 0))
+    block = B
+    scale = max(1.0, np.linalg.norm(A, 2), np.linalg.norm(B, 2))
+    while basis.shape[1] < A.shape[0]:
+        block = block - basis @ (basis.T @ block)
+        U, sv, _ = np.linalg.svd(block, full_matrices=False)
+        rank = int(np.sum(sv > tol * scale))
+        if rank == 0:
+            break
+        basis = np.hstack([basis, U[:, :rank]])
+        block = A @ U[:, :rank]
+    return basis
+
+def _reduce_proper(num, den, tol):
+    """
+    Coprime form of a proper num/den: realize it in controllable canonical
+    form, where every factor shared by num and den is an unobservable mode,
+    and keep only the observable part (an orthogonal staircase, so repeated
+    roots cause no trouble).
+    """
+    if len(den) == 1:
+        return num, den
+    A, B, C, D = signal.tf2ss(num, den)
+    V = _reachable_basis(A.T, C.T, tol)
+    if V.shape[1] == 0:
+        return np.atleast_1d(D[0]), np.ones(1)
+    num, den = signal.ss2tf(V.T @ A @ V, V.T @ B, C @ V, D)
+    num = np.atleast_1d(np.squeeze(num))
+    # Leading coefficients that are zero up to rounding
+    big = np.abs(num) > tol * max(np.abs(num).max(), np.finfo(float).tiny)
+    num = num[np.argmax(big):] if big.any() else np.zeros(1)
+    return num, den
+
+def _cancel(num, den, tol=1e-9):
+    """
+    Remove the factors shared by num and den, returning coprime polynomials
+    with a monic denominator. An improper pair is reduced through its
+    reciprocal, which has the same common factors.
+    """
+    num = np.trim_zeros(np.atleast_1d(np.asarray(num, dtype=float)), 'f')
+    den = np.trim_zeros(np.atleast_1d(np.asarray(den, dtype=float)), 'f')
+    if len(num) == 0:
+        return np.zeros(1), np.ones(1)
+    if len(num) > len(den):
+        den, num = _reduce_proper(den, num, tol)
+    else:
+        num, den = _reduce_proper(num, den, tol)
+    return num / den[0], den / den[0]
+
+@lru_cache(maxsize=64)
+def _imc_q_cached(gm_key, f_key):
+    num_g, den_g = (np.array(c) for c in gm_key)
+    num_f, den_f = (np.array(c) for c in f_key)
+    num_q, den_q = _cancel(np.polymul(den_g, num_f), np.polymul(num_g, den_f))
+    if len(num_q) > len(den_q):
+        raise ValueError("Gm^-1 * F is improper; increase the order of the filter F")
+    return ctrl.ss(ctrl.tf(num_q, den_q))
+
+def _imc_q(Gm, F):
+    """
+    Minimal state-space realization of Q(s) = Gm(s)^-1 * F(s).
+
+    The polynomials of Q are formed once (den_Gm*num_F / num_Gm*den_F) and
+    common factors are cancelled, so the controllable-canonical realization
+    of the coprime pair is minimal. This replaces chained minreal calls on
+    transfer-function inversions and products. Realizations are shared by
+    all IMCController instances through a small LRU cache keyed by the
+    coefficients of (Gm, F).
+    """
+    return _imc_q_cached(tf_key(Gm), tf_key(F))
 
 class IMCController:
     """
@@ -9,6 +102,13 @@ class IMCController:
     where F(s) is a low-pass filter for robustness.
     
     The IMC Controller can be converted to a standard feedback controller if desired.
+
+    Q(s) and the closed loop are formed from coprime polynomial pairs (one
+    pole/zero cancellation each instead of repeated minreal), Q is kept as a
+    minimal state-space realization and cached per (Gm, F) across instances. For
+    tuning, the closed loop can be evaluated for a whole grid of filter time
+    constants lambda at once with frequency_response_sweep() and
+    step_response_sweep().
     """
 
     def __init__(self, plant_nominal, filter_tf):
@@ -19,11 +119,13 @@ class IMCController:
         self.Gm = plant_nominal
         self.F = filter_tf
 
-        # Attempt to invert Gm(s), if possible
-        self.Gm_inv = ctrl.minreal(1 / self.Gm)
+        # Gm(s)^-1, kept as a (possibly improper) transfer function for reference
+        num_g, den_g = tf_coefficients(self.Gm)
+        self.Gm_inv = ctrl.tf(den_g, num_g)
 
-        # IMC Q(s) = Gm_inv * F(s)
-        self.Q = ctrl.minreal(ctrl.series(self.Gm_inv, self.F))
+        # IMC Q(s) = Gm_inv * F(s), minimal state-space realization
+        self.Q_ss = _imc_q(self.Gm, self.F)
+        self.Q = ctrl.tf(self.Q_ss)
 
     def imc_closed_loop_tf(self, real_plant):
         """
@@ -31,21 +133,215 @@ class IMCController:
         real_plant (which might be G_good(s)*G_bad(s)).
         
         For reference, T(s) = [ Q(s)*G(s) ] / [1 + Q(s)*[G(s) - Gm(s)] ] in typical form.
-        We'll do it in python-control using block manipulations.
+        With Q = F/Gm and R = G/Gm (reduced to coprime form first, so R = 1 for a
+        perfect model) this is T = F R / (1 + F (R - 1)), formed directly:
+          T = num_F num_R / (den_F den_R + num_F (num_R - den_R))
         """
-        # Q(s)*G(s)
-        QG = ctrl.series(self.Q, real_plant)
+        num_g, den_g = tf_coefficients(real_plant)
+        num_m, den_m = tf_coefficients(self.Gm)
+        num_f, den_f = tf_coefficients(self.F)
+        num_r, den_r = _cancel(np.polymul(num_g, den_m), np.polymul(den_g, num_m))
 
-        # G(s) - Gm(s)
-        diff = ctrl.parallel(real_plant, -self.Gm)
+        num = np.polymul(num_f, num_r)
+        den = np.polyadd(np.polymul(den_f, den_r), np.polymul(num_f, np.polysub(num_r, den_r)))
+        return ctrl.tf(*_cancel(num, den))
 
-        # python-control represents TF(0) as TransferFunction([0], [1])
-        if diff.num[0][0] == [0] and diff.den[0][0] == [1]:
-            # G(s) - Gm(s) == 0
-            denominator = ctrl.tf([1], [1])
-        else:
-            denominator = ctrl.feedback(diff, self.Q, sign=1)
+    def discretize(self, dt, n=None):
+        """
+        Steppable discrete-time form of this IMC controller.
+        :param dt: Sampling time
+        :param n: Number of loops for a batched DiscreteIMCBank (None for a single loop)
+        """
+        if n is None:
+            return DiscreteIMCController(self.Q_ss, self.Gm, dt)
+        return DiscreteIMCBank(self.Q_ss, self.Gm, dt, n)
+
+    def _filter_order(self, filter_order):
+        """
+        Default IMC filter order: the relative degree of Gm (at least 1),
+        the lowest order that keeps Q proper.
+        """
+        if filter_order is not None:
+            return filter_order
+        num_g, den_g = tf_coefficients(self.Gm)
+        return max(1, len(np.trim_zeros(den_g, 'f')) - len(np.trim_zeros(num_g, 'f')))
+
+    def frequency_response_sweep(self, real_plant, lambdas, omega, filter_order=None):
+        """
+        Closed-loop frequency response for the filters F(s) = 1/(lambda*s + 1)^n
+        over a grid of lambda values, in one vectorized evaluation:
+          T = F G/Gm / (1 + F (G/Gm - 1))
+
+        :param real_plant: Actual plant G(s)
+        :param lambdas: Filter time constants
+        :param omega: Frequency grid (rad/s)
+        :param filter_order: Filter order n (defaults to the relative degree of Gm)
+        :return: Complex array of shape (len(lambdas), len(omega))
+        """
+        n = self._filter_order(filter_order)
+        omega = np.asarray(omega, dtype=float).reshape(-1)
+        lambdas = np.asarray(lambdas, dtype=float).reshape(-1, 1)
+        s = 1j * omega
+        ratio = np.asarray(real_plant(s)).reshape(-1) / np.asarray(self.Gm(s)).reshape(-1)
+        F = (lambdas * s + 1.0) ** -n
+        return F * ratio / (1.0 + F * (ratio - 1.0))
+
+    def step_response_sweep(self, real_plant, lambdas, t, filter_order=None):
+        """
+        Closed-loop unit-step responses for the filters F(s) = 1/(lambda*s + 1)^n
+        over a grid of lambda values.
+
+        For each lambda the loop [Q, G, Gm] is assembled directly as a block
+        state-space model and discretized exactly (matrix exponential at the
+        grid spacing); all lambdas are then stepped together with one batched
+        matrix product per sample. G and Gm must be strictly proper and stable.
+
+        :param real_plant: Actual plant G(s)
+        :param lambdas: Filter time constants
+        :param t: Evenly spaced time grid starting at 0
+        :param filter_order: Filter order n (defaults to the relative degree of Gm)
+        :return: Array of shape (len(lambdas), len(t))
+        """
+        n = self._filter_order(filter_order)
+        t = np.asarray(t, dtype=float)
+        dt = t[1] - t[0]
+        lambdas = np.asarray(lambdas, dtype=float).reshape(-1)
+
+        Ag, Bg, Cg, Dg = _ss_matrices(real_plant)
+        Am, Bm, Cm, Dm = _ss_matrices(self.Gm)
+        if np.any(Dg) or np.any(Dm):
+            raise ValueError("G and Gm must be strictly proper")
+        num_g, den_g = tf_coefficients(self.Gm)
+
+        Phi = []
+        Gam = []
+        for lam in lambdas:
+            den_f = np.poly1d([lam, 1.0]) ** n
+            Aq, Bq, Cq, Dq = signal.tf2ss(den_g, np.polymul(num_g, den_f.coeffs))
+            nq, ng, nm = Aq.shape[0], Ag.shape[0], Am.shape[0]
+            # e = r - Cg xg + Cm xm,  u = Cq xq + Dq e
+            A_cl = np.block([
+                [Aq, -Bq @ Cg, Bq @ Cm],
+                [Bg @ Cq, Ag - Bg @ Dq @ Cg, Bg @ Dq @ Cm],
+                [Bm @ Cq, -Bm @ Dq @ Cg, Am + Bm @ Dq @ Cm],
+            ])
+            B_cl = np.vstack([Bq, Bg @ Dq, Bm @ Dq])
+            # Exact discretization of the step input: [[A, B], [0, 0]] exponential
+            size = nq + ng + nm
+            M = np.zeros((size + 1, size + 1))
+            M[:size, :size] = A_cl
+            M[:size, size:] = B_cl
+            Md = expm(M * dt)
+            Phi.append(Md[:size, :size])
+            Gam.append(Md[:size, size])
+
+        Phi = np.array(Phi)
+        Gam = np.array(Gam)
+        nq = Phi.shape[1] - Ag.shape[0] - Am.shape[0]
+        C_out = np.concatenate([np.zeros(nq), Cg[0], np.zeros(Am.shape[0])])
+
+        x = np.zeros(Gam.shape)
+        y = np.empty((len(lambdas), len(t)))
+        for k in range(len(t)):
+            y[:, k] = x @ C_out
+            x = np.matmul(Phi, x[:, :, None])[:, :, 0] + Gam
+        return y
+
+def _imc_difference_equations(Q, Gm, dt):
+    """
+    ZOH-discretize Q(s) and Gm(s) and fuse them into one difference equation
+    driven by v = r - y (setpoint minus measurement):
+      x[k+1] = Phi x[k] + Gam v[k],   u[k] = H x[k] + Dq v[k]
+    with x = [xq; xm]. The model output is fed back through
+    e = r - (y - ym) = v + Cm xm.
+    """
+    Aq, Bq, Cq, Dq = _ss_matrices(Q)
+    Am, Bm, Cm, Dm = _ss_matrices(Gm)
+    if np.any(Dm):
+        raise ValueError("Gm must be strictly proper")
+    Aq, Bq = zoh(Aq, Bq, dt)
+    Am, Bm = zoh(Am, Bm, dt)
+
+    dq = Dq[0, 0]
+    Phi = np.block([
+        [Aq, Bq @ Cm],
+        [Bm @ Cq, Am + dq * Bm @ Cm],
+    ])
+    Gam = np.concatenate([Bq[:, 0], dq * Bm[:, 0]])
+    H = np.concatenate([Cq[0], dq * Cm[0]])
+    return Phi, Gam, H, dq
+
+class DiscreteIMCController(Controller):
+    """
+    Real-time IMC controller: Q(s) and Gm(s) discretized once (ZOH) into a
+    fused state-space difference equation that only holds NumPy arrays.
+    Each compute() is two small products into preallocated state buffers.
+    """
+    _state_fields = ('x',)
+
+    def __init__(self, Q, Gm, dt):
+        """
+        :param Q: IMC controller Q(s) (python-control system)
+        :param Gm: Strictly proper nominal model Gm(s)
+        :param dt: Sampling time
+        """
+        self.dt = dt
+        self.Phi, self.Gam, self.H, self.Dq = _imc_difference_equations(Q, Gm, dt)
+        self.x = np.zeros(len(self.Gam))
+        self._x_next = np.zeros(len(self.Gam))
+
+    def reset(self):
+        self.x.fill(0.0)
+
+    def compute(self, setpoint, measurement):
+        v = setpoint - measurement
+        u = float(self.H @ self.x) + self.Dq * v
+
+        np.dot(self.Phi, self.x, self._x_next)
+        self._x_next += self.Gam * v
+        self.x, self._x_next = self._x_next, self.x
+        return u
+
+class DiscreteIMCBank(Controller):
+    """
+    Batched DiscreteIMCController for N loops sharing the same model:
+    states are an (N, nx) array and each compute() steps every loop at once.
+    """
+    _state_fields = ('x',)
+
+    def __init__(self, Q, Gm, dt, n):
+        """
+        :param Q: IMC controller Q(s) (python-control system)
+        :param Gm: Strictly proper nominal model Gm(s)
+        :param dt: Sampling time
+        :param n: Number of loops
+        """
+        self.dt = dt
+        self.n = n
+        Phi, self.Gam, self.H, self.Dq = _imc_difference_equations(Q, Gm, dt)
+        self.Phi_T = Phi.T.copy()
+        self.x = np.zeros((n, len(self.Gam)))
+        self._x_next = np.zeros((n, len(self.Gam)))
+        self._vGam = np.zeros((n, len(self.Gam)))
+        self._v = np.zeros(n)
+        self._tmp = np.zeros(n)
+
+    def reset(self):
+        self.x.fill(0.0)
+
+    def compute(self, setpoints, measurements, out=None):
+        """
+        Step all N loops once.
+        :param out: Optional preallocated output array of length n
+        :return: Array of N control outputs
+        """
+        if out is None:
+            out = np.empty(self.n)
+        v = np.subtract(setpoints, measurements, self._v)
+        u = np.dot(self.x, self.H, out)
+        u += np.multiply(self.Dq, v, out=self._tmp)
 
-        # Overall closed-loop
-        closed_loop = ctrl.series(QG, 1/denominator)
-        return ctrl.minreal(closed_loop)
+        np.dot(self.x, self.Phi_T, self._x_next)
+        self._x_next += np.multiply(v[:, None], self.Gam, out=self._vGam)
+        self.x, self._x_next = self._x_next, self.x
+        return u
@@ -0,0 +1,286 @@
+import numpy as np
+from scipy.linalg import cholesky, cho_factor, cho_solve, expm, qr, solve_triangular
+
+def _psd_sqrt(M):
+    """
+    Lower-triangular square root of a symmetric positive semi-definite matrix
+    (Cholesky, or a QR-triangularized eigen-decomposition if M is singular).
+    """
+    try:
+        return cholesky(M, lower=True)
+    except np.linalg.LinAlgError:
+        w, V = np.linalg.eigh(M)
+        root = V * np.sqrt(np.clip(w, 0.0, None))
+        return qr(root.T, mode='r')[0].T
+
+def _van_loan(A, B, Qc, dt):
+    """
+    Exact discretization of x_dot = A x + B u + w, E[w w'] = Qc delta(t):
+    returns (Ad, Bd, Qd) for a zero-order hold on u over dt.
+    """
+    nx, nu = B.shape
+    M = np.zeros((2 * nx, 2 * nx))
+    M[:nx, :nx] = -A
+    M[:nx, nx:] = Qc
+    M[nx:, nx:] = A.T
+    Md = expm(M * dt)
+    Ad = Md[nx:, nx:].T
+    Qd = Ad @ Md[:nx, nx:]
+
+    M = np.zeros((nx + nu, nx + nu))
+    M[:nx, :nx] = A
+    M[:nx, nx:] = B
+    Bd = expm(M * dt)[:nx, nx:]
+    return Ad, Bd, 0.5 * (Qd + Qd.T)
+
+class KalmanFilter:
+    """
+    Time-varying Kalman filter that propagates the full state covariance,
+    for irregular sampling and time-varying measurement noise.
+
+    The model is either continuous (A, B, process noise intensity Qn),
+    discretized exactly for each sample interval dt (cached per distinct dt),
+    or already discrete (continuous=False). Measurement updates use the
+    Joseph form
+      P = (I - K C) P (I - K C)' + K R K'
+    on preallocated matrices (form='joseph'), or a square-root array
+    algorithm that propagates a Cholesky factor of P with QR factorizations
+    (form='sqrt'). Products go through np.dot, i.e. BLAS, so large states
+    (nx in the hundreds) stay efficient.
+
+    The state estimate x has shape (nx, 1) and is updated in place, so it can
+    back LQGController.x_hat (see LQGController.attach_kalman_filter).
+    """
+
+    def __init__(self, A, B, C, Qn, Rn, dt=None, P0=None, continuous=True, form='joseph'):
+        """
+        :param A, B, C: Model matrices
+        :param Qn: Process noise intensity (continuous) or covariance (discrete)
+        :param Rn: Measurement noise covariance (per sample)
+        :param dt: Default sample interval for predict()
+        :param P0: Initial covariance (defaults to identity)
+        :param continuous: Whether A, B, Qn describe a continuous-time model
+        :param form: 'joseph' or 'sqrt'
+        """
+        if form not in ('joseph', 'sqrt'):
+            raise ValueError("form must be 'joseph' or 'sqrt'")
+        self.A = np.asarray(A, dtype=float)
+        self.B = np.asarray(B, dtype=float)
+        self.C = np.asarray(C, dtype=float)
+        self.Qn = np.asarray(Qn, dtype=float)
+        self.Rn = np.asarray(Rn, dtype=float)
+        self.dt = dt
+        self.continuous = continuous
+        self.form = form
+
+        self.nx = self.A.shape[0]
+        self.nu = self.B.shape[1]
+        self.ny = self.C.shape[0]
+        self.P0 = np.eye(self.nx) if P0 is None else np.asarray(P0, dtype=float)
+        self._models = {}
+
+        nx, ny = self.nx, self.ny
+        self.x = np.zeros((nx, 1))
+        self.P = self.P0.copy()
+        self.S = _psd_sqrt(self.P0)  # Cholesky factor, used by form='sqrt'
+
+        # Workspaces
+        self._eye = np.eye(nx)
+        self._nn1 = np.zeros((nx, nx))
+        self._nn2 = np.zeros((nx, nx))
+        self._PCt = np.zeros((nx, ny))
+        self._Sy = np.zeros((ny, ny))
+        self._K = np.zeros((nx, ny))
+        self._KR = np.zeros((nx, ny))
+        self._innov = np.zeros((ny, 1))
+        self._x1 = np.zeros((nx, 1))
+        self._x2 = np.zeros((nx, 1))
+
+    def reset(self, x0=None, P0=None):
+        if x0 is None:
+            self.x.fill(0.0)
+        else:
+            self.x[...] = np.reshape(x0, (self.nx, 1))
+        self.P[...] = self.P0 if P0 is None else P0
+        self.S = _psd_sqrt(self.P)
+
+    def _model(self, dt):
+        """
+        (Ad, Bd, Qd, sqrt(Qd)) for the sample interval dt (cached).
+        """
+        key = None if not self.continuous else float(dt)
+        model = self._models.get(key)
+        if model is None:
+            if self.continuous:
+                Ad, Bd, Qd = _van_loan(self.A, self.B, self.Qn, dt)
+            else:
+                Ad, Bd, Qd = self.A, self.B, self.Qn
+            model = (Ad, Bd, Qd, _psd_sqrt(Qd))
+            self._models[key] = model
+        return model
+
+    def predict(self, u, dt=None):
+        """
+        Time update over dt (defaults to self.dt): x = Ad x + Bd u,
+        P = Ad P Ad' + Qd.
+        """
+        Ad, Bd, Qd, Lq = self._model(self.dt if dt is None else dt)
+        np.dot(Ad, self.x, self._x1)
+        np.dot(Bd, u, self._x2)
+        np.add(self._x1, self._x2, self.x)
+
+        if self.form == 'sqrt':
+            # P = [Ad S, Lq] [Ad S, Lq]'  ->  S = lower factor from QR
+            pre = np.hstack([Ad @ self.S, Lq])
+            self.S = qr(pre.T, mode='r')[0][:self.nx].T
+            return
+
+        np.dot(Ad, self.P, self._nn1)
+        np.dot(self._nn1, Ad.T, self._nn2)
+        np.add(self._nn2, Qd, self.P)
+
+    def update(self, y, Rn=None):
+        """
+        Measurement update with y, optionally with a time-varying covariance Rn.
+        """
+        R = self.Rn if Rn is None else np.asarray(Rn, dtype=float)
+        C = self.C
+        np.dot(C, self.x, self._innov)
+        np.subtract(y, self._innov, self._innov)
+
+        if self.form == 'sqrt':
+            self._update_sqrt(R)
+            return
+
+        P = self.P
+        np.dot(P, C.T, self._PCt)
+        np.dot(C, self._PCt, self._Sy)
+        self._Sy += R
+        # K = P C' Sy^-1
+        self._K[...] = cho_solve(cho_factor(self._Sy), self._PCt.T).T
+
+        # x += K innov
+        np.dot(self._K, self._innov, self._x1)
+        np.add(self.x, self._x1, self._x2)
+        np.copyto(self.x, self._x2)
+
+        # Joseph form: P = (I - K C) P (I - K C)' + K R K'
+        IKC = self._nn1
+        np.dot(self._K, C, IKC)
+        np.subtract(self._eye, IKC, IKC)
+        np.dot(IKC, P, self._nn2)
+        np.dot(self._nn2, IKC.T, P)
+        np.dot(self._K, R, self._KR)
+        np.dot(self._KR, self._K.T, self._nn2)
+        P += self._nn2
+        # Keep P exactly symmetric
+        np.add(P, P.T, self._nn2)
+        np.multiply(self._nn2, 0.5, P)
+
+    def _update_sqrt(self, R):
+        """
+        Square-root measurement update: lower-triangularize
+          [[Lr, C S], [0, S]]  ->  [[X, 0], [Y, S_new]]
+        so X X' = C P C' + R, Y = P C' X^-T and K = Y X^-1.
+        """
+        nx, ny = self.nx, self.ny
+        pre = np.zeros((ny + nx, ny + nx))
+        pre[:ny, :ny] = _psd_sqrt(R)
+        pre[:ny, ny:] = self.C @ self.S
+        pre[ny:, ny:] = self.S
+        post = qr(pre.T, mode='r')[0].T
+        X = post[:ny, :ny]
+        Y = post[ny:, :ny]
+        self.S = post[ny:, ny:].copy()
+        self.x += Y @ solve_triangular(X, self._innov, lower=True)
+
+    def covariance(self):
+        """
+        Current state covariance P (formed from S for form='sqrt').
+        """
+        if self.form == 'sqrt':
+            return self.S @ self.S.T
+        return self.P
+
+class KalmanFilterBank:
+    """
+    Many Joseph-form Kalman filters sharing one model, updated together with
+    stacked arrays: x has shape (m, nx, 1) and P shape (m, nx, nx), and every
+    product is a batched np.matmul into preallocated buffers.
+    """
+
+    def __init__(self, m, A, B, C, Qn, Rn, dt=None, P0=None, continuous=True):
+        """
+        :param m: Number of filters
+        Other parameters as for KalmanFilter.
+        """
+        self._model_filter = KalmanFilter(A, B, C, Qn, Rn, dt=dt, P0=P0, continuous=continuous)
+        self.m = m
+        self.C = self._model_filter.C
+        self.Rn = self._model_filter.Rn
+        self.dt = dt
+        nx, ny = self._model_filter.nx, self._model_filter.ny
+        self.nx, self.ny = nx, ny
+
+        self.x = np.zeros((m, nx, 1))
+        self.P = np.broadcast_to(self._model_filter.P0, (m, nx, nx)).copy()
+
+        self._eye = np.eye(nx)
+        self._nn1 = np.zeros((m, nx, nx))
+        self._nn2 = np.zeros((m, nx, nx))
+        self._PCt = np.zeros((m, nx, ny))
+        self._Sy = np.zeros((m, ny, ny))
+        self._KR = np.zeros((m, nx, ny))
+        self._innov = np.zeros((m, ny, 1))
+        self._x1 = np.zeros((m, nx, 1))
+        self._x2 = np.zeros((m, nx, 1))
+
+    def reset(self, x0=None, P0=None):
+        self.x.fill(0.0)
+        if x0 is not None:
+            self.x[...] = np.reshape(x0, (-1, self.nx, 1))
+        self.P[...] = self._model_filter.P0 if P0 is None else P0
+
+    def predict(self, u, dt=None):
+        """
+        :param u: Inputs of shape (m, nu) or (m, nu, 1)
+        """
+        Ad, Bd, Qd, _ = self._model_filter._model(self.dt if dt is None else dt)
+        u = np.reshape(u, (self.m, -1, 1))
+        np.matmul(Ad, self.x, self._x1)
+        np.matmul(Bd, u, self._x2)
+        np.add(self._x1, self._x2, self.x)
+
+        np.matmul(Ad, self.P, self._nn1)
+        np.matmul(self._nn1, Ad.T, self._nn2)
+        np.add(self._nn2, Qd, self.P)
+
+    def update(self, y, Rn=None):
+        """
+        :param y: Measurements of shape (m, ny) or (m, ny, 1)
+        :param Rn: Optional covariance, (ny, ny) shared or (m, ny, ny) per filter
+        """
+        R = self.Rn if Rn is None else np.asarray(Rn, dtype=float)
+        C = self.C
+        np.matmul(C, self.x, self._innov)
+        np.subtract(np.reshape(y, (self.m, -1, 1)), self._innov, self._innov)
+
+        np.matmul(self.P, C.T, self._PCt)
+        np.matmul(C, self._PCt, self._Sy)
+        self._Sy += R
+        K = np.linalg.solve(self._Sy, np.swapaxes(self._PCt, 1, 2)).swapaxes(1, 2)
+
+        np.matmul(K, self._innov, self._x1)
+        np.add(self.x, self._x1, self._x2)
+        np.copyto(self.x, self._x2)
+
+        IKC = self._nn1
+        np.matmul(K, C, IKC)
+        np.subtract(self._eye, IKC, IKC)
+        np.matmul(IKC, self.P, self._nn2)
+        np.matmul(self._nn2, np.swapaxes(IKC, 1, 2), self.P)
+        np.matmul(K, R, self._KR)
+        np.matmul(self._KR, np.swapaxes(K, 1, 2), self._nn2)
+        self.P += self._nn2
+        np.add(self.P, np.swapaxes(self.P, 1, 2), self._nn2)
+        np.multiply(self._nn2, 0.5, self.P)
@@ -0,0 +1,68 @@
+"""
+Compiled loops for the bank controllers.
+
+The kernels repeat the controllers' NumPy arithmetic operation for
+operation, so their output is bit-identical to the Python path. When numba is
+installed they are JIT-compiled (cached on disk after the first call);
+otherwise HAVE_COMPILED is False and the controllers keep using NumPy.
+compile_kernel() is shared with simulation.kernels.
+"""
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+HAVE_COMPILED = njit is not None
+
+def compile_kernel(kernel):
+    # No fastmath: the compiled loops must round exactly like the interpreter
+    if njit is None:
+        return kernel
+    return njit(cache=True)(kernel)
+
+@compile_kernel
+def cascade_bank_loop(setpoints, ratio, tick0, temp, flow, flow_sp, valve, a_f, b_f, a_t, b_t,
+                      outer_gains, outer_state, inner_gains, inner_state, held):
+    # CascadeBank.rollout() for all n cascades: gains are (5, n) arrays of
+    # (Kp, Ki, Kd, dt, windup_limit), states (2, n) arrays of
+    # (integral_term, prev_error) and held the flow setpoints of the outer loop
+    n_ticks = temp.shape[0] - 1
+    for i in range(temp.shape[1]):
+        oKp, oKi, oKd, odt, olim = (outer_gains[0, i], outer_gains[1, i], outer_gains[2, i],
+                                    outer_gains[3, i], outer_gains[4, i])
+        iKp, iKi, iKd, idt, ilim = (inner_gains[0, i], inner_gains[1, i], inner_gains[2, i],
+                                    inner_gains[3, i], inner_gains[4, i])
+        o_int, o_prev = outer_state[0, i], outer_state[1, i]
+        i_int, i_prev = inner_state[0, i], inner_state[1, i]
+        r_flow = held[i]
+        t_prev = temp[0, i]
+        f_prev = flow[0, i]
+        for k in range(1, n_ticks + 1):
+            if (tick0 + k - 1) % ratio == 0:
+                error = setpoints[(k - 1) // ratio, i] - t_prev
+                o_int += error * odt
+                if o_int > olim:
+                    o_int = olim
+                elif o_int < -olim:
+                    o_int = -olim
+                r_flow = oKp * error + oKi * o_int + oKd * ((error - o_prev) / odt)
+                o_prev = error
+
+            error = r_flow - f_prev
+            i_int += error * idt
+            if i_int > ilim:
+                i_int = ilim
+            elif i_int < -ilim:
+                i_int = -ilim
+            v = iKp * error + iKi * i_int + iKd * ((error - i_prev) / idt)
+            i_prev = error
+
+            t_prev = a_t[i] * t_prev + b_t[i] * f_prev
+            f_prev = a_f[i] * f_prev + b_f[i] * v
+            flow_sp[k, i] = r_flow
+            valve[k, i] = v
+            flow[k, i] = f_prev
+            temp[k, i] = t_prev
+        outer_state[0, i], outer_state[1, i] = o_int, o_prev
+        inner_state[0, i], inner_state[1, i] = i_int, i_prev
+        held[i] = r_flow
@@ -1,6 +1,41 @@
+import warnings
+
 import numpy as np
+from scipy.linalg import expm, solve_discrete_are
+
+from controllers.controller_base import Controller
+from controllers.state_space_controller import SynthesisCache, lqr_controller, matrix_key, zoh
+
+def servo_lqr_gains(A, B, C, Q, R, Qi):
+    """
+    LQR gains for reference tracking with integral action, from the system
+    augmented with the integrator xi_dot = r - y:
+      [x_dot ]   [ A  0] [x ]   [B]
+      [xi_dot] = [-C  0] [xi] + [0] u
+    :param Q, R: State and input weights
+    :param Qi: Weight on the integrator states (ny x ny)
+    :return: (K, Ki) such that u = -K x - Ki xi
+    """
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    C = np.asarray(C, dtype=float)
+    nx, ny = A.shape[0], C.shape[0]
+    A_aug = np.zeros((nx + ny, nx + ny))
+    A_aug[:nx, :nx] = A
+    A_aug[nx:, :nx] = -C
+    B_aug = np.vstack([B, np.zeros((ny, B.shape[1]))])
+    Q_aug = np.zeros((nx + ny, nx + ny))
+    Q_aug[:nx, :nx] = Q
+    Q_aug[nx:, nx:] = Qi
+    K_aug, _, _ = lqr_controller(A_aug, B_aug, Q_aug, R)
+    K_aug = np.asarray(K_aug)
+    return K_aug[:, :nx], K_aug[:, nx:]
+
+# Steady-state gains shared by every LQGController built with from_weights(),
+# keyed by a hash of the model and weights
+_GAIN_CACHE = SynthesisCache(maxsize=1024)
 
-class LQGController:
+class LQGController(Controller):
     """
     LQG (Linear Quadratic Gaussian) controller for a continuous-time system:
       x_dot = A x + B u + w   (process noise w)
@@ -11,14 +46,44 @@ class LQGController:
       x_hat_dot = A x_hat + B u + L (y - C x_hat)
 
     For simplicity, we discretize the update equations with a small time step dt.
+    With discretization='zoh' the observer is instead discretized exactly
+    (zero-order hold on u and y) once at construction, which stays accurate
+    at larger dt.
+
+    With discretization='discrete', A and B are already discrete-time matrices
+    and L is a discrete predictor gain:
+      x_hat[k+1] = A x_hat[k] + B u[k] + L (y[k] - C x_hat[k])
+    from_weights() builds such a controller from LQR/Kalman weights.
+
+    x_hat is an array owned by the controller and updated in place through
+    preallocated workspaces. Passing out= to step_measurement()/compute_control()
+    makes a
+    steady-state step free of heap allocations.
+
+    attach_kalman_filter() replaces the fixed observer gain L with a
+    time-varying Kalman filter that propagates the full covariance, so
+    step_measurement() can take an irregular sample interval dt.
+
+    enable_servo() switches to reference tracking:
+      u = -K x_hat - Ki xi + Nbar r,   xi[k+1] = xi[k] + dt (r - y[k])
+    with the gains stacked once so compute_control() stays a single product
+    [K Ki -Nbar] [x_hat; xi; r]. rollout() simulates the closed loop for a
+    whole batch of reference trajectories at once.
+
+    For the common Controller interface, step()/compute(setpoint, measurement)
+    take the reference as setpoint (servo mode). The measurement-only step is
+    step_measurement(y_meas, out=None, dt=None).
     """
 
-    def __init__(self, A, B, C, K, L, dt):
+    def __init__(self, A, B, C, K, L, dt, discretization='euler'):
         """
         :param A, B, C: System matrices (numpy arrays)
         :param K: LQR gain (numpy array)
         :param L: Kalman filter gain (numpy array)
         :param dt: Sampling time for discrete approximation
+        :param discretization: 'euler' (forward Euler observer step),
+                               'zoh' (exact matrix-exponential discretization) or
+                               'discrete' (A, B, L are already discrete-time)
         """
         self.A = A
         self.B = B
@@ -30,45 +95,413 @@ class LQGController:
         # Number of states
         self.nx = A.shape[0]
 
+        self.nu = B.shape[1]
+        self.ny = C.shape[0]
+
+        if discretization not in ('euler', 'zoh', 'discrete'):
+            raise ValueError("discretization must be 'euler', 'zoh' or 'discrete'")
+        self.discretization = discretization
+
         # Initialize state estimate
         self.x_hat = np.zeros((self.nx, 1))
+        self.kalman_filter = None
+        self.servo = False
+
+        # Workspaces for the in-place steps. Every operation writes into a buffer
+        # that does not overlap its inputs, since NumPy may allocate a temporary
+        # for overlapping size-1 operands.
+        self._Kx = np.zeros((self.nu, 1))
+        self._y_est = np.zeros((self.ny, 1))
+        self._innov = np.zeros((self.ny, 1))
+        self._w1 = np.zeros((self.nx, 1))
+        self._w2 = np.zeros((self.nx, 1))
+        self._w3 = np.zeros((self.nx, 1))
+        self._dt = np.array(float(dt))
+
+        if discretization == 'zoh':
+            self._discretize_zoh()
+        elif discretization == 'discrete':
+            self._set_fused_update(self.A - self.L @ self.C, np.hstack([self.B, self.L]))
+
+    @classmethod
+    def from_weights(cls, A, B, C, Q, R, Qn, Rn, dt, cache=None):
+        """
+        Build a discrete-time LQG controller from weights instead of gains.
+
+        The continuous model (A, B) is discretized with a zero-order hold at dt,
+        then the discrete LQR and Kalman Riccati equations are solved once:
+          K = (R + Bd' P Bd)^-1 Bd' P Ad               (P: control DARE)
+          L = Ad S C' (C S C' + Rn)^-1                 (S: filter DARE)
+        Q, R are the discrete-time state/input weights and Qn, Rn the discrete
+        process/measurement noise covariances.
+
+        The gains are cached by a hash of (A, B, C, Q, R, Qn, Rn, dt), so many
+        loops with the same model share a single solve.
+
+        :param cache: SynthesisCache to use (defaults to a module-wide cache)
+        """
+        if cache is None:
+            cache = _GAIN_CACHE
+        key = matrix_key('lqg', A, B, C, Q, R, Qn, Rn, np.array([dt]))
+        gains = cache.get(key)
+        if gains is None:
+            gains = _solve_discrete_lqg(A, B, C, Q, R, Qn, Rn, dt)
+            cache.put(key, gains)
+        Ad, Bd, K, L = gains
+        return cls(Ad, Bd, np.asarray(C, dtype=float), K, L, dt, discretization='discrete')
+
+    def _discretize_zoh(self):
+        """
+        Precompute the zero-order-hold discretization.
+
+        Plant:    x[k+1]     = Ad x[k] + Bd u[k]
+        Observer: x_hat[k+1] = F x_hat[k] + G [u[k]; y[k]]
+        where F, G are the exact discretization of
+          x_hat_dot = (A - L C) x_hat + [B L] [u; y]
+        obtained from the matrix exponential of an augmented block matrix.
+        """
+        nx, nu, ny = self.nx, self.nu, self.ny
+
+        self.Ad, self.Bd = zoh(self.A, self.B, self.dt)
+
+        M = np.zeros((nx + nu + ny, nx + nu + ny))
+        M[:nx, :nx] = self.A - self.L @ self.C
+        M[:nx, nx:nx + nu] = self.B
+        M[:nx, nx + nu:] = self.L
+        Md = expm(M * self.dt)
+        self._set_fused_update(Md[:nx, :nx], Md[:nx, nx:])
+
+    def _set_fused_update(self, F, G):
+        """
+        Set up the fused observer update x_hat[k+1] = F x_hat[k] + G [u; y].
+        """
+        nx, nu, ny = self.nx, self.nu, self.ny
+        self.F = F
+        self.G = G
+
+        # x_hat[k+1] = [F G] @ z with z = [x_hat; u; y] kept in one
+        # preallocated buffer. x_hat is a view into the top of z.
+        self._FG = np.ascontiguousarray(np.hstack([F, G]))
+        self._z = np.zeros((nx + nu + ny, 1))
+        self._x_next = np.zeros((nx, 1))
+        self.x_hat = self._z[:nx]
+        self._z_u = self._z[nx:nx + nu]
+        self._z_y = self._z[nx + nu:]
+
+    def attach_kalman_filter(self, kalman_filter):
+        """
+        Estimate x_hat with a time-varying KalmanFilter instead of the fixed
+        gain L. The filter's state becomes x_hat; each step does a measurement
+        update with y followed by a time update with u over dt.
+        :param kalman_filter: KalmanFilter built for this controller's model
+        """
+        if kalman_filter.nx != self.nx:
+            raise ValueError("Kalman filter state dimension does not match the controller")
+        if kalman_filter.dt is None:
+            kalman_filter.dt = self.dt
+        kalman_filter.x[...] = self.x_hat
+        self.kalman_filter = kalman_filter
+        self.x_hat = kalman_filter.x
+
+    def enable_servo(self, Ki=None, Nbar=None):
+        """
+        Track a reference r with integral action and feedforward.
+        :param Ki: Integral gain (nu x ny), e.g. from servo_lqr_gains(); None
+                   for feedforward only
+        :param Nbar: Feedforward gain (nu x ny); by default the inverse DC gain
+                     of the plant under u = -K x, so y = r in steady state
+        """
+        nx, nu, ny = self.nx, self.nu, self.ny
+        if Ki is None:
+            Ki = np.zeros((nu, ny))
+        if Nbar is None:
+            Nbar = self._feedforward_gain()
+        self.Ki = np.asarray(Ki, dtype=float).reshape(nu, ny)
+        self.Nbar = np.asarray(Nbar, dtype=float).reshape(nu, ny)
+
+        # u = -[K Ki -Nbar] @ s with s = [x_hat; xi; r]
+        self._K_servo = np.ascontiguousarray(np.hstack([self.K, self.Ki, -self.Nbar]))
+        self._s = np.zeros((nx + 2 * ny, 1))
+        self._s_x = self._s[:nx]
+        self.xi = self._s[nx:nx + ny]
+        self.r = self._s[nx + ny:]
+        self._e1 = np.zeros((ny, 1))
+        self._e2 = np.zeros((ny, 1))
+        self._xi_next = np.zeros((ny, 1))
+        self.servo = True
+
+    def _feedforward_gain(self):
+        """
+        Nbar = (DC gain from u' to y under u = -K x + u')^-1.
+        """
+        BK = self.B @ self.K
+        if self.discretization == 'discrete':
+            dc = self.C @ np.linalg.solve(np.eye(self.nx) - self.A + BK, self.B)
+        else:
+            dc = -self.C @ np.linalg.solve(self.A - BK, self.B)
+        return np.linalg.pinv(dc)
+
+    def set_reference(self, r):
+        """ Set the reference tracked in servo mode (copied into the controller's buffer). """
+        self.r[...] = np.reshape(r, (self.ny, 1))
 
     def reset(self, x_hat0=None):
-        """ Reset the estimated state. """
-        if x_hat0 is None:
-            self.x_hat = np.zeros((self.nx, 1))
+        """ Reset the estimated state (copied into the controller's own buffer). """
+        if self.servo:
+            self.xi.fill(0.0)
+        if self.kalman_filter is not None:
+            self.kalman_filter.reset(x_hat0)
+        elif x_hat0 is None:
+            self.x_hat.fill(0.0)
         else:
-            self.x_hat = x_hat0
+            self.x_hat[...] = np.reshape(x_hat0, (self.nx, 1))
+
+    def get_state(self):
+        state = {'x_hat': self.x_hat.copy()}
+        if self.servo:
+            state['xi'] = self.xi.copy()
+        if self.kalman_filter is not None:
+            state['P'] = self.kalman_filter.covariance().copy()
+        return state
+
+    def set_state(self, state):
+        if 'xi' in state and not self.servo:
+            raise ValueError("state has a servo integrator 'xi' but enable_servo() was not called")
+        if 'P' in state and self.kalman_filter is None:
+            raise ValueError("state has a covariance 'P' but no Kalman filter is attached")
+        self.x_hat[...] = state['x_hat']
+        if 'xi' in state:
+            self.xi[...] = state['xi']
+        if 'P' in state:
+            self.kalman_filter.reset(state['x_hat'], state['P'])
+
+    def compute(self, setpoint, measurement, out=None):
+        """
+        One control step toward the reference setpoint (servo mode only;
+        a regulator accepts setpoint=0).
+        """
+        if self.servo:
+            self.set_reference(setpoint)
+        elif np.any(setpoint):
+            raise ValueError("non-zero setpoints need enable_servo()")
+        return self.step_measurement(measurement, out)
+
+    def step(self, setpoint, measurement=None, out=None, dt=None):
+        """
+        step(setpoint, measurement) is compute(), as for every Controller.
+
+        The old measurement-only form step(y_meas, out=None, dt=None) is still
+        accepted when no measurement is given, with a DeprecationWarning; use
+        step_measurement() instead.
+        """
+        if measurement is None:
+            warnings.warn("LQGController.step(y_meas) is deprecated; use step_measurement(y_meas)",
+                          DeprecationWarning, stacklevel=2)
+            return self.step_measurement(setpoint, out, dt)
+        if dt is not None:
+            raise TypeError("dt is only accepted by step_measurement()")
+        return self.compute(setpoint, measurement, out)
 
-    def compute_control(self):
+    def compute_many(self, setpoints, measurements):
+        """
+        compute() over consecutive samples.
+        :param setpoints: Array of shape (T, ny) (or broadcastable to it)
+        :param measurements: Array of shape (T, ny)
+        :return: Array of shape (T, nu) of control inputs
+        """
+        measurements = np.asarray(measurements, dtype=float).reshape(-1, self.ny)
+        setpoints = np.broadcast_to(np.asarray(setpoints, dtype=float), measurements.shape)
+        out = np.empty((len(measurements), self.nu))
+        u = np.zeros((self.nu, 1))
+        for k in range(len(out)):
+            self.compute(setpoints[k], measurements[k].reshape(self.ny, 1), out=u)
+            out[k] = u[:, 0]
+        return out
+
+    def compute_control(self, out=None):
         """
         Compute control input based on current estimate x_hat.
         u = -K x_hat
+        :param out: Optional preallocated (nu, 1) array to write u into
         """
-        u = -self.K @ self.x_hat
-        return u
+        if self.servo:
+            np.copyto(self._s_x, self.x_hat)
+            if out is None:
+                return -self._K_servo @ self._s
+            np.dot(self._K_servo, self._s, self._Kx)
+            np.negative(self._Kx, out)
+            return out
+        if out is None:
+            return -self.K @ self.x_hat
+        np.dot(self.K, self.x_hat, self._Kx)
+        np.negative(self._Kx, out)
+        return out
 
-    def update_observer(self, y_meas, u):
+    def update_observer(self, y_meas, u, dt=None):
         """
         Update the Kalman filter (observer) with measurement y_meas and input u.
         We'll do a simple Euler discretization for demonstration:
         
         x_hat_dot = A x_hat + B u + L (y_meas - C x_hat)
         x_hat[k+1] = x_hat[k] + dt * x_hat_dot
+
+        With discretization='zoh' or 'discrete' this is the single fused product
+        x_hat[k+1] = F x_hat[k] + G [u; y_meas] into preallocated buffers.
+
+        With an attached Kalman filter, dt (defaults to the filter's dt) is the
+        time until the next sample; the servo integrator advances over the same
+        interval. Without one the nominal dt is used throughout.
         """
-        y_est = self.C @ self.x_hat
-        innov = y_meas - y_est  # measurement residual
-        x_hat_dot = self.A @ self.x_hat + self.B @ u + self.L @ innov
-        self.x_hat = self.x_hat + self.dt * x_hat_dot
+        if self.kalman_filter is not None and dt is None:
+            dt = self.kalman_filter.dt
+        if self.servo:
+            # xi += dt (r - y)
+            np.subtract(self.r, y_meas, self._e1)
+            step = self._dt if self.kalman_filter is None or dt is None else dt
+            np.multiply(step, self._e1, self._e2)
+            np.add(self.xi, self._e2, self._xi_next)
+            np.copyto(self.xi, self._xi_next)
+
+        if self.kalman_filter is not None:
+            self.kalman_filter.update(y_meas)
+            self.kalman_filter.predict(u, dt)
+            return
+
+        x_hat = self.x_hat
+        if self.discretization != 'euler':
+            np.copyto(self._z_u, u)
+            np.copyto(self._z_y, y_meas)
+            np.dot(self._FG, self._z, self._x_next)
+            np.copyto(x_hat, self._x_next)
+            return
+
+        w1, w2, w3 = self._w1, self._w2, self._w3
+        y_est = np.dot(self.C, x_hat, self._y_est)
+        innov = np.subtract(y_meas, y_est, self._innov)  # measurement residual
+        # x_hat_dot = A x_hat + B u + L innov
+        np.dot(self.A, x_hat, w1)
+        np.dot(self.B, u, w2)
+        np.add(w1, w2, w3)
+        np.dot(self.L, innov, w2)
+        np.add(w3, w2, w1)
+        # x_hat + dt * x_hat_dot
+        np.multiply(self._dt, w1, w2)
+        np.add(x_hat, w2, w3)
+        np.copyto(x_hat, w3)
 
-    def step(self, y_meas):
+    def step_measurement(self, y_meas, out=None, dt=None):
         """
         Convenience function that:
           1) computes control
           2) updates observer state
           3) returns control
         You can also do these in separate calls if you prefer.
+        :param out: Optional preallocated (nu, 1) array for u; with it the step
+                    does no heap allocation
+        :param dt: Time to the next sample (only with an attached Kalman filter)
         """
-        u = self.compute_control()
-        self.update_observer(y_meas, u)
+        u = self.compute_control(out)
+        self.update_observer(y_meas, u, dt)
         return u
+
+    def rollout(self, references, Ad=None, Bd=None, x0=None):
+        """
+        Simulate the noise-free servo loop for one or many reference
+        trajectories at once. The plant, observer, integrator and control law
+        are stacked into one closed-loop matrix, so each time step is a single
+        matrix product over all trajectories.
+
+        Uses the current x_hat and xi as the initial controller state (the
+        controller itself is not modified).
+
+        :param references: Array of shape (T, ny) or (m, T, ny)
+        :param Ad, Bd: Discrete plant model; defaults to the controller's own
+                       model at dt (forward Euler, ZOH or discrete, matching
+                       the observer)
+        :param x0: Initial plant state (nx,) or (m, nx); defaults to zero
+        :return: (y, u) with shapes (..., T, ny) and (..., T, nu)
+        """
+        if not self.servo:
+            raise ValueError("rollout() requires enable_servo()")
+        if self.kalman_filter is not None:
+            raise ValueError("rollout() needs a fixed-gain observer")
+        refs = np.asarray(references, dtype=float)
+        single = refs.ndim == 2
+        if single:
+            refs = refs[None]
+        m, T, _ = refs.shape
+        nx, nu, ny = self.nx, self.nu, self.ny
+        Acl, Bcl, Ccl, Dcl = self._servo_loop(Ad, Bd)
+
+        # z = [x; x_hat; xi], one column per trajectory
+        z = np.zeros((2 * nx + ny, m))
+        if x0 is not None:
+            z[:nx] = np.reshape(x0, (-1, nx)).T
+        z[nx:2 * nx] = self.x_hat
+        z[2 * nx:] = self.xi
+
+        # Output map [y; u] = Ccl z + Dcl r, evaluated for all steps at the end
+        states = np.empty((T, 2 * nx + ny, m))
+        r_cols = np.ascontiguousarray(refs.transpose(1, 2, 0))  # (T, ny, m)
+        for k in range(T):
+            states[k] = z
+            z = Acl @ z + Bcl @ r_cols[k]
+        out = np.matmul(Ccl, states) + np.matmul(Dcl, r_cols)  # (T, ny + nu, m)
+        out = out.transpose(2, 0, 1)
+        y, u = out[..., :ny], out[..., ny:]
+        if single:
+            return y[0], u[0]
+        return y, u
+
+    def _servo_loop(self, Ad=None, Bd=None):
+        """
+        Closed-loop matrices of the servo loop in z = [x; x_hat; xi]:
+          z[k+1] = Acl z[k] + Bcl r[k],   [y; u] = Ccl z[k] + Dcl r[k]
+        """
+        nx, nu, ny = self.nx, self.nu, self.ny
+        dt = self.dt
+        if self.discretization == 'euler':
+            F = np.eye(nx) + dt * (self.A - self.L @ self.C)
+            Gu, Gy = dt * self.B, dt * self.L
+            plant = (np.eye(nx) + dt * self.A, dt * self.B)
+        else:
+            F, Gu, Gy = self.F, self.G[:, :nu], self.G[:, nu:]
+            plant = (self.Ad, self.Bd) if self.discretization == 'zoh' else (self.A, self.B)
+        Ad = plant[0] if Ad is None else Ad
+        Bd = plant[1] if Bd is None else Bd
+
+        # u = Ku z + Nbar r
+        Ku = np.hstack([np.zeros((nu, nx)), -self.K, -self.Ki])
+        Cy = np.hstack([self.C, np.zeros((ny, nx + ny))])
+
+        Acl = np.zeros((2 * nx + ny, 2 * nx + ny))
+        Acl[:nx, :nx] = Ad
+        Acl[nx:2 * nx, nx:2 * nx] = F
+        Acl[nx:2 * nx, :nx] = Gy @ self.C
+        Acl[2 * nx:, 2 * nx:] = np.eye(ny)
+        Acl[2 * nx:, :nx] = -dt * self.C
+        Acl[:2 * nx] += np.vstack([Bd, Gu]) @ Ku
+
+        Bcl = np.zeros((2 * nx + ny, ny))
+        Bcl[:nx] = Bd @ self.Nbar
+        Bcl[nx:2 * nx] = Gu @ self.Nbar
+        Bcl[2 * nx:] = dt * np.eye(ny)
+
+        Ccl = np.vstack([Cy, Ku])
+        Dcl = np.vstack([np.zeros((ny, ny)), self.Nbar])
+        return Acl, Bcl, Ccl, Dcl
+
+def _solve_discrete_lqg(A, B, C, Q, R, Qn, Rn, dt):
+    """
+    ZOH-discretize (A, B) and solve the steady-state discrete LQR and Kalman
+    predictor gains. Returns (Ad, Bd, K, L).
+    """
+    C = np.asarray(C, dtype=float)
+    Ad, Bd = zoh(np.asarray(A, dtype=float), np.asarray(B, dtype=float), dt)
+
+    P = solve_discrete_are(Ad, Bd, Q, R)
+    K = np.linalg.solve(R + Bd.T @ P @ Bd, Bd.T @ P @ Ad)
+
+    S = solve_discrete_are(Ad.T, C.T, Qn, Rn)
+    L = Ad @ S @ C.T @ np.linalg.inv(C @ S @ C.T + Rn)
+    return Ad, Bd, K, L
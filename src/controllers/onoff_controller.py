@@ -1,7 +1,12 @@
-class OnOffController:
+import numpy as np
+
+from controllers.controller_base import Controller
+
+class OnOffController(Controller):
     """
     Simple on-off (bang-bang) controller with hysteresis.
     """
+    _state_fields = ('output_state',)
 
     def __init__(self, on_threshold, off_threshold):
         """
@@ -12,6 +17,9 @@ class OnOffController:
         self.off_threshold = off_threshold
         self.output_state = 0.0  # track current on/off state
 
+    def reset(self):
+        self.output_state = 0.0
+
     def compute(self, setpoint, measurement):
         error = setpoint - measurement
         
@@ -23,3 +31,18 @@ class OnOffController:
             self.output_state = 0.0
 
         return self.output_state
+
+    def compute_many(self, setpoints, measurements):
+        """
+        Vectorized hysteresis: each output holds the state set by the last
+        sample whose error crossed a threshold.
+        """
+        errors = np.subtract(setpoints, measurements, dtype=float)
+        if len(errors) == 0:
+            return errors
+        on = errors > self.on_threshold
+        switched = on | (errors < self.off_threshold)
+        last = np.maximum.accumulate(np.where(switched, np.arange(len(errors)), -1))
+        out = np.where(last >= 0, on[last].astype(float), self.output_state)
+        self.output_state = float(out[-1])
+        return out
@@ -1,4 +1,8 @@
-class PController:
+import numpy as np
+
+from controllers.controller_base import Controller
+
+class PController(Controller):
     """
     Simple Proportional (P) controller.
     """
@@ -8,6 +12,10 @@ class PController:
         """
         self.Kp = Kp
 
+    def reset(self):
+        # A P controller has no internal state
+        pass
+
     def compute(self, setpoint, measurement):
         """
         Computes the control output based on a setpoint and measurement.
@@ -18,3 +26,7 @@ class PController:
         error = setpoint - measurement
         control_output = self.Kp * error
         return control_output
+
+    def compute_many(self, setpoints, measurements):
+        errors = np.subtract(setpoints, measurements, dtype=float)
+        return self.Kp * errors
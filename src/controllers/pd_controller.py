@@ -1,9 +1,13 @@
 import numpy as np
 
-class PDController:
+from controllers.controller_base import Controller
+
+class PDController(Controller):
     """
     Proportional-Derivative (PD) controller.
     """
+    _state_fields = ('prev_error',)
+
     def __init__(self, Kp=1.0, Kd=0.0, dt=0.01):
         """
         :param Kp: Proportional gain
@@ -32,3 +36,13 @@ class PDController:
         self.prev_error = error
         
         return P_out + D_out
+
+    def compute_many(self, setpoints, measurements):
+        errors = np.subtract(setpoints, measurements, dtype=float)
+        if len(errors) == 0:
+            return errors
+        prev = np.empty_like(errors)
+        prev[0] = self.prev_error
+        prev[1:] = errors[:-1]
+        self.prev_error = float(errors[-1])
+        return self.Kp * errors + self.Kd * ((errors - prev) / self.dt)
@@ -1,9 +1,16 @@
 import numpy as np
 
-class PIController:
+from controllers.pid_core import PIDCore, pid_many
+
+class PIController(PIDCore):
     """
     Proportional-Integral (PI) controller.
+
+    A PIDCore with Kd fixed at zero; prev_error is still tracked so the state
+    matches a PIDController with Kd=0.
     """
+    __slots__ = ('__dict__',)
+
     def __init__(self, Kp=1.0, Ki=0.0, dt=0.01, windup_limit=1e6):
         """
         :param Kp: Proportional gain
@@ -11,25 +18,14 @@ class PIController:
         :param dt: Sampling time
         :param windup_limit: Anti-windup clamp
         """
-        self.Kp = Kp
-        self.Ki = Ki
-        self.dt = dt
-        self.windup_limit = windup_limit
-
-        self.integral_term = 0.0
-
-    def reset(self):
-        self.integral_term = 0.0
+        super().__init__(Kp=Kp, Ki=Ki, Kd=0.0, dt=dt, windup_limit=windup_limit)
 
     def compute(self, setpoint, measurement):
-        error = setpoint - measurement
-        
-        # Proportional
-        P_out = self.Kp * error
-        
-        # Integral
-        self.integral_term += error * self.dt
-        self.integral_term = np.clip(self.integral_term, -self.windup_limit, self.windup_limit)
-        I_out = self.Ki * self.integral_term
-        
-        return P_out + I_out
+        return self.update(setpoint - measurement, self.Kp, self.Ki, 0.0)
+
+    def compute_many(self, setpoints, measurements):
+        errors = np.subtract(setpoints, measurements, dtype=float)
+        out, self.integral_term, self.prev_error = pid_many(
+            errors, self.Kp, self.Ki, 0.0, self.dt, self.windup_limit,
+            self.integral_term, self.prev_error, derivative=False)
+        return out
@@ -1,43 +1,130 @@
 import numpy as np
 
-class PIDController:
+from controllers.controller_base import Controller
+from controllers.pid_core import PIDCore
+
+class PIDController(PIDCore):
     """
     Simple Proportional-Integral-Derivative (PID) controller class.
+
+    The stepping logic lives in PIDCore; this class only fixes the public
+    constructor signature. Unlike PIDCore it keeps a __dict__, so instances
+    still accept extra attributes.
     """
+    __slots__ = ('__dict__',)
+
     def __init__(self, Kp=1.0, Ki=0.0, Kd=0.0, dt=0.01, windup_limit=1e6):
-        self.Kp = Kp
-        self.Ki = Ki
-        self.Kd = Kd
-        self.dt = dt
-        self.windup_limit = windup_limit
+        super().__init__(Kp=Kp, Ki=Ki, Kd=Kd, dt=dt, windup_limit=windup_limit)
 
-        self.integral_term = 0.0
-        self.prev_error = 0.0
+
+def _as_bank_array(value, n):
+    """
+    Broadcast a scalar or per-loop value to a contiguous float array of length n.
+    """
+    return np.ascontiguousarray(np.broadcast_to(np.asarray(value, dtype=float), (n,)))
+
+
+class PIDBank(Controller):
+    """
+    A bank of N independent PID loops stepped together.
+
+    Gains, sample times, anti-windup limits and the integral/derivative state
+    are stored as contiguous NumPy arrays, so one compute() call advances every
+    loop with a handful of vectorized operations instead of N Python calls.
+    Each loop gives the same numbers as a separate PIDController.
+    """
+    _state_fields = ('integral_term', 'prev_error')
+
+    def __init__(self, n, Kp=1.0, Ki=0.0, Kd=0.0, dt=0.01, windup_limit=1e6):
+        """
+        :param n: Number of loops in the bank
+        :param Kp, Ki, Kd: Gains, either scalars shared by all loops or arrays of length n
+        :param dt: Sampling time (scalar or array of length n)
+        :param windup_limit: Anti-windup clamp (scalar or array of length n)
+        """
+        self.n = n
+        self.Kp = _as_bank_array(Kp, n)
+        self.Ki = _as_bank_array(Ki, n)
+        self.Kd = _as_bank_array(Kd, n)
+        self.dt = _as_bank_array(dt, n)
+        self.windup_limit = _as_bank_array(windup_limit, n)
+
+        self.integral_term = np.zeros(n)
+        self.prev_error = np.zeros(n)
+
+        # Scratch buffers reused on every step
+        self._error = np.empty(n)
+        self._tmp = np.empty(n)
+
+    @classmethod
+    def from_controllers(cls, controllers):
+        """
+        Build a bank from existing PIDController instances, including their state.
+        """
+        bank = cls(
+            len(controllers),
+            Kp=[c.Kp for c in controllers],
+            Ki=[c.Ki for c in controllers],
+            Kd=[c.Kd for c in controllers],
+            dt=[c.dt for c in controllers],
+            windup_limit=[c.windup_limit for c in controllers],
+        )
+        bank.integral_term[:] = [c.integral_term for c in controllers]
+        bank.prev_error[:] = [c.prev_error for c in controllers]
+        return bank
 
     def reset(self):
-        self.integral_term = 0.0
-        self.prev_error = 0.0
+        self.integral_term.fill(0.0)
+        self.prev_error.fill(0.0)
+
+    def compute(self, setpoints, measured_values, out=None):
+        """
+        Step all loops once.
+        :param setpoints: Array of length n (or a scalar shared by all loops)
+        :param measured_values: Array of length n
+        :param out: Optional preallocated output array of length n
+        :return: Array of control outputs, one per loop
+        """
+        if out is None:
+            out = np.empty(self.n)
+        error = self._error
+        tmp = self._tmp
+        np.subtract(setpoints, measured_values, out=error)
 
-    def compute(self, setpoint, measured_value):
-        error = setpoint - measured_value
-        
         # Proportional
-        P_out = self.Kp * error
-        
+        np.multiply(self.Kp, error, out=out)
+
         # Integral
-        self.integral_term += error * self.dt
+        np.multiply(error, self.dt, out=tmp)
+        self.integral_term += tmp
         # Anti-windup
-        self.integral_term = np.clip(self.integral_term, -self.windup_limit, self.windup_limit)
-        I_out = self.Ki * self.integral_term
-        
+        np.minimum(self.integral_term, self.windup_limit, out=self.integral_term)
+        np.negative(self.windup_limit, out=tmp)
+        np.maximum(self.integral_term, tmp, out=self.integral_term)
+        np.multiply(self.Ki, self.integral_term, out=tmp)
+        out += tmp
+
         # Derivative
-        derivative = (error - self.prev_error) / self.dt
-        D_out = self.Kd * derivative
-        
-        # Combine
-        output = P_out + I_out + D_out
-        
+        np.subtract(error, self.prev_error, out=tmp)
+        tmp /= self.dt
+        tmp *= self.Kd
+        out += tmp
+
         # Save state
-        self.prev_error = error
-        
-        return output
+        self.prev_error[:] = error
+
+        return out
+
+    def compute_many(self, setpoints, measured_values):
+        """
+        Step all loops over T consecutive samples.
+        :param setpoints: Array of shape (T, n) (or broadcastable to it)
+        :param measured_values: Array of shape (T, n)
+        :return: Array of shape (T, n) of control outputs
+        """
+        measured_values = np.asarray(measured_values, dtype=float)
+        setpoints = np.broadcast_to(np.asarray(setpoints, dtype=float), measured_values.shape)
+        out = np.empty(measured_values.shape)
+        for k in range(len(out)):
+            self.compute(setpoints[k], measured_values[k], out=out[k])
+        return out
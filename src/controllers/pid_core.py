@@ -0,0 +1,124 @@
+import numpy as np
+
+from controllers.controller_base import Controller
+
+def pid_many(errors, Kp, Ki, Kd, dt, windup_limit, integral, prev_error, derivative=True):
+    """
+    PIDCore.update() over consecutive errors in one vectorized pass.
+
+    The integral is a running sum (np.add.accumulate adds strictly in order),
+    so outputs are bit-identical to stepping sample by sample. Only if the
+    anti-windup clamp engages is the integral re-run in a plain loop.
+
+    :param errors: Array of errors, one per sample
+    :param Kp, Ki, Kd: Gains, scalars or arrays with one entry per sample
+    :param integral, prev_error: State before the first sample
+    :param derivative: Set False for the PI form Kp*e + Ki*I (no D term at all)
+    :return: (outputs, integral, prev_error) after the last sample
+    """
+    e = np.asarray(errors, dtype=float)
+    n = len(e)
+    if n == 0:
+        return np.empty(0), integral, prev_error
+
+    increments = np.empty(n + 1)
+    increments[0] = integral
+    np.multiply(e, dt, out=increments[1:])
+    integrals = np.add.accumulate(increments)[1:]
+    limit = windup_limit
+    if not (np.all(integrals <= limit) and np.all(integrals >= -limit)):
+        x = integral
+        for k, step in enumerate(increments[1:].tolist()):
+            x = x + step
+            if x > limit:
+                x = limit
+            elif x < -limit:
+                x = -limit
+            integrals[k] = x
+
+    out = Kp * e + Ki * integrals
+    if derivative:
+        prev = np.empty(n)
+        prev[0] = prev_error
+        prev[1:] = e[:-1]
+        out += Kd * ((e - prev) / dt)
+    return out, float(integrals[-1]), float(e[-1])
+
+class PIDCore(Controller):
+    """
+    Low-overhead scalar PID stepping core shared by the PID-family controllers.
+
+    State lives in __slots__ and the anti-windup clamp is done with plain float
+    comparisons, so a step never allocates a NumPy scalar. The integral term
+    stays a Python float as long as the inputs are Python floats.
+    """
+    __slots__ = ('Kp', 'Ki', 'Kd', 'dt', 'windup_limit', 'integral_term', 'prev_error')
+    _state_fields = ('integral_term', 'prev_error')
+
+    def __init__(self, Kp=1.0, Ki=0.0, Kd=0.0, dt=0.01, windup_limit=1e6):
+        """
+        :param Kp: Proportional gain
+        :param Ki: Integral gain
+        :param Kd: Derivative gain
+        :param dt: Sampling time
+        :param windup_limit: Anti-windup clamp
+        """
+        self.Kp = Kp
+        self.Ki = Ki
+        self.Kd = Kd
+        self.dt = dt
+        self.windup_limit = windup_limit
+
+        self.integral_term = 0.0
+        self.prev_error = 0.0
+
+    def reset(self):
+        self.integral_term = 0.0
+        self.prev_error = 0.0
+
+    def update(self, error, Kp, Ki, Kd):
+        """
+        Advance the integral/derivative state by one step for the given error
+        and gains, and return the PID output.
+        """
+        # Integral with anti-windup
+        integral = self.integral_term + error * self.dt
+        limit = self.windup_limit
+        if integral > limit:
+            integral = limit
+        elif integral < -limit:
+            integral = -limit
+        self.integral_term = integral
+
+        # P + I + D
+        output = Kp * error + Ki * integral + Kd * ((error - self.prev_error) / self.dt)
+
+        self.prev_error = error
+        return output
+
+    def compute(self, setpoint, measured_value):
+        # Same as update() with the stored gains, inlined to save a call per step
+        error = setpoint - measured_value
+
+        integral = self.integral_term + error * self.dt
+        limit = self.windup_limit
+        if integral > limit:
+            integral = limit
+        elif integral < -limit:
+            integral = -limit
+        self.integral_term = integral
+
+        output = self.Kp * error + self.Ki * integral + self.Kd * ((error - self.prev_error) / self.dt)
+
+        self.prev_error = error
+        return output
+
+    def compute_many(self, setpoints, measured_values):
+        """
+        compute() over consecutive samples, vectorized (see pid_many).
+        """
+        errors = np.subtract(setpoints, measured_values, dtype=float)
+        out, self.integral_term, self.prev_error = pid_many(
+            errors, self.Kp, self.Ki, self.Kd, self.dt, self.windup_limit,
+            self.integral_term, self.prev_error)
+        return out
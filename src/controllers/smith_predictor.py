@@ -1,4 +1,17 @@
+from collections import OrderedDict
+
 import control as ctrl
+import numpy as np
+
+from controllers.controller_base import Controller
+from controllers.state_space_controller import tf_key
+
+def _discretize(sys, dt):
+    """
+    ZOH discretization of a continuous system as (A, B, C, D) NumPy arrays.
+    """
+    sys_d = ctrl.c2d(ctrl.ss(sys), dt, 'zoh')
+    return tuple(np.asarray(m, dtype=float) for m in (sys_d.A, sys_d.B, sys_d.C, sys_d.D))
 
 class SmithPredictor:
     """
@@ -10,7 +23,15 @@ class SmithPredictor:
     3. A "normal" controller C(s) is designed for the no-delay portion Gm(s).
     4. The Smith Predictor compensates the effect of the real plant's delay
        by using the model internally, so the feedback sees a 'no delay' system.
+
+    Besides the Pade-based closed_loop_tf(), the closed loop can be evaluated
+    with the exact delay: frequency_response() on a frequency grid and
+    step_response() in the time domain, both vectorized over many actual plant
+    delays. The most recent model evaluations are memoized on the instance,
+    keyed by the coefficients of C and Gm, L and the evaluation grid.
     """
+    # Number of memoized model evaluations kept per instance
+    cache_size = 8
 
     def __init__(self, controller_no_delay, plant_nominal, delay):
         """
@@ -22,39 +43,301 @@ class SmithPredictor:
         self.C = controller_no_delay
         self.Gm = plant_nominal
         self.delay = delay
+        self._cache = OrderedDict()
+
+    def _cached(self, key, build):
+        """
+        Memoize build() under key for the current (C, Gm, L), keeping the
+        cache_size most recently used entries.
+        """
+        key = (tf_key(self.C), tf_key(self.Gm), self.delay) + key
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        value = self._cache[key] = build()
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
 
     def closed_loop_tf(self):
         """
         Build the closed-loop transfer function with the Smith Predictor structure:
         
-        Output(s)/Reference(s) = [C(s)*Gm(s)] / [1 + C(s)*[Gp(s) - Gm(s)] + C(s)*Gm(s)]
+        Output(s)/Reference(s) = [C(s)*Gp(s)] / [1 + C(s)*[Gp(s) - Gm(s)*e^{-Ls}] + C(s)*Gm(s)]
         
         However, in practice with python-control, we approximate the delay for the real plant
         (Gp(s) = Gm(s)*exp(-Ls)) using a Pade approximation or by a direct 'transport delay' if available.
+        With a perfect model the bracketed mismatch term vanishes, leaving
+        T(s) = e^{-Ls} * C(s)*Gm(s) / [1 + C(s)*Gm(s)],
+        which is built directly so the polynomial order stays low.
         """
+        return self._cached(('tf',), self._build_closed_loop_tf)
+
+    def _build_closed_loop_tf(self):
         # Approximate e^{-Ls} with Pade:
-        delay_approx = ctrl.pade(self.delay, 1)  # 1st-order Pade for simplicity
-        num_delay, den_delay = delay_approx
-        
-        # Real plant: Gp(s) = Gm(s) * e^{-Ls} (approx)
-        Gp = ctrl.series(self.Gm, ctrl.TransferFunction(num_delay, den_delay))
-        
-        # Smith Predictor loop:
-        # The closed-loop TF can be formed by the 'internal model control' approach:
-        # T(s) = C(s)*Gp(s) / [1 + C(s)*(Gp(s) - Gm(s))].
-        # But we also have the nominal loop in parallel. 
-        # A simpler approach is to do it explicitly:
-        
-        # C(s)*Gp(s)
-        CGp = ctrl.series(self.C, Gp)
-        
-        # Gp(s) - Gm(s)
-        diff = ctrl.parallel(Gp, -self.Gm)
-        
-        # Denominator = 1 + C(s)*[Gp(s) - Gm(s)]
-        denominator = ctrl.feedback(diff, self.C, sign=1)
-        
-        # Overall closed-loop (using "series / parallel" logic):
-        closed_loop = ctrl.series(CGp, 1/denominator)
-        
-        return closed_loop
+        num_delay, den_delay = ctrl.pade(self.delay, 1)  # 1st-order Pade for simplicity
+
+        # Delay-free loop C*Gm/(1 + C*Gm), then the delay in series
+        T0 = ctrl.feedback(ctrl.series(self.C, self.Gm), 1)
+        return ctrl.series(T0, ctrl.TransferFunction(num_delay, den_delay))
+
+    def _model_freq(self, omega):
+        """
+        C(jw) and Gm(jw) on the grid omega (memoized).
+        """
+        def build():
+            s = 1j * omega
+            return np.asarray(self.C(s)).reshape(-1), np.asarray(self.Gm(s)).reshape(-1)
+        return self._cached(('freq', omega.tobytes()), build)
+
+    def frequency_response(self, omega, plant_delays=None):
+        """
+        Closed-loop frequency response with the exact delay e^{-jwL}.
+
+        The plant is Gm(s)*e^{-Lp s} with actual delay Lp, while the predictor
+        uses the model delay L = self.delay:
+          T(jw) = C Gm e^{-jw Lp} / [1 + C Gm + C Gm (e^{-jw Lp} - e^{-jw L})]
+
+        :param omega: Frequency grid (rad/s)
+        :param plant_delays: Actual plant delays Lp to sweep (defaults to [self.delay])
+        :return: Complex array of shape (len(plant_delays), len(omega))
+        """
+        omega = np.asarray(omega, dtype=float).reshape(-1)
+        Cjw, Gjw = self._model_freq(omega)
+        L_p = np.atleast_1d(self.delay if plant_delays is None else np.asarray(plant_delays, dtype=float))
+
+        CG = Cjw * Gjw
+        model_delay = np.exp(-1j * omega * self.delay)
+        plant_delay = np.exp(-1j * np.outer(L_p, omega))
+        return CG * plant_delay / (1.0 + CG + CG * (plant_delay - model_delay))
+
+    def _nominal_step(self, t):
+        """
+        Step response of the delay-free loop C*Gm/(1 + C*Gm) on t (memoized).
+        """
+        def build():
+            T0 = ctrl.feedback(ctrl.series(self.C, self.Gm), 1)
+            return np.asarray(ctrl.step_response(T0, t).outputs).reshape(-1)
+        return self._cached(('step', t.tobytes()), build)
+
+    def _discrete_models(self, dt):
+        """
+        ZOH state-space discretizations of C(s) and Gm(s) (memoized).
+        """
+        def build():
+            Gd = _discretize(self.Gm, dt)
+            if np.any(Gd[3]):
+                raise ValueError("the nominal plant must be strictly proper")
+            return _discretize(self.C, dt), Gd
+        return self._cached(('ss', dt), build)
+
+    def step_response(self, t, plant_delays=None):
+        """
+        Closed-loop unit-step response with an exact (sample-delay) dead time.
+
+        With plant_delays=None the model is perfect, so the response is the
+        delay-free loop's step response shifted by L. Otherwise the loop is
+        simulated at the sample time of the (evenly spaced) grid t for every
+        actual plant delay at once, with C and Gm discretized by ZOH and both
+        delays implemented as ring buffers of round(delay/dt) samples.
+
+        :param t: Evenly spaced time grid starting at 0
+        :param plant_delays: Actual plant delays to sweep
+        :return: y of shape (len(t),), or (len(plant_delays), len(t)) for a sweep
+        """
+        t = np.asarray(t, dtype=float)
+        if plant_delays is None:
+            y0 = self._nominal_step(t)
+            return np.interp(t - self.delay, t, y0, left=0.0)
+
+        dt = t[1] - t[0]
+        L_p = np.atleast_1d(np.asarray(plant_delays, dtype=float))
+        (Ac, Bc, Cc, Dc), (Ag, Bg, Cg, _) = self._discrete_models(dt)
+
+        m = len(L_p)
+        rows = np.arange(m)
+        d_model = int(round(self.delay / dt))
+        d_plant = np.rint(L_p / dt).astype(int)
+        size = max(d_model, int(d_plant.max())) + 1
+
+        # Row-stacked states, one row per plant delay
+        xc = np.zeros((m, Ac.shape[0]))
+        xm = np.zeros((m, Ag.shape[0]))   # delay-free model
+        xp = np.zeros((m, Ag.shape[0]))   # plant (delay applied at its input)
+        u_buf = np.zeros((m, size))
+        ym_buf = np.zeros((m, size))
+        y = np.empty((m, len(t)))
+
+        for k in range(len(t)):
+            slot = k % size
+            y_k = xp @ Cg[0]
+            ym_k = xm @ Cg[0]
+            ym_buf[:, slot] = ym_k
+            ym_delayed = ym_buf[:, (k - d_model) % size] if k >= d_model else 0.0
+
+            # Smith predictor feedback: y plus the predicted delay-free minus delayed model output
+            e = 1.0 - y_k - (ym_k - ym_delayed)
+            u = xc @ Cc[0] + Dc[0, 0] * e
+            xc = xc @ Ac.T + np.outer(e, Bc[:, 0])
+
+            u_buf[:, slot] = u
+            u_plant = np.where(k >= d_plant, u_buf[rows, (k - d_plant) % size], 0.0)
+            xm = xm @ Ag.T + np.outer(u, Bg[:, 0])
+            xp = xp @ Ag.T + np.outer(u_plant, Bg[:, 0])
+            y[:, k] = y_k
+        return y
+
+class DiscreteSmithPredictor(Controller):
+    """
+    Sample-by-sample Smith predictor for online control.
+
+    Wraps any stepping controller with compute(setpoint, measurement), e.g.
+    PIDController, designed for the delay-free model Gm(s). The model is
+    discretized once (ZOH at dt), and its output is delayed through a
+    preallocated ring buffer of round(delay/dt) samples, so each step is O(1):
+      ym[k]     = Cm xm[k]
+      feedback  = y[k] + ym[k] - ym[k-d]
+      u[k]      = controller.compute(setpoint, feedback)
+      xm[k+1]   = Am xm[k] + Bm u[k]
+    """
+
+    def __init__(self, controller, plant_nominal, delay, dt):
+        """
+        :param controller: Stepping controller for the delay-free model
+        :param plant_nominal: Strictly proper nominal model Gm(s) (python-control)
+        :param delay: Plant dead time (seconds), rounded to whole samples
+        :param dt: Sampling time
+        """
+        self.controller = controller
+        self.dt = dt
+        self.delay_samples = int(round(delay / dt))
+
+        Am, Bm, Cm, Dm = _discretize(plant_nominal, dt)
+        if np.any(Dm):
+            raise ValueError("the nominal plant must be strictly proper")
+        self.Am = Am
+        self.Bm = Bm[:, 0].copy()
+        self.Cm = Cm[0].copy()
+
+        self.xm = np.zeros(Am.shape[0])
+        self._x_next = np.zeros(Am.shape[0])
+        self._bu = np.zeros(Am.shape[0])
+        self._buffer = np.zeros(max(self.delay_samples, 1))
+        self._index = 0
+
+    def reset(self):
+        if hasattr(self.controller, 'reset'):
+            self.controller.reset()
+        self.xm.fill(0.0)
+        self._buffer.fill(0.0)
+        self._index = 0
+
+    def get_state(self):
+        state = {'xm': self.xm.copy(), 'buffer': self._buffer.copy(), 'index': self._index}
+        if hasattr(self.controller, 'get_state'):
+            state['controller'] = self.controller.get_state()
+        return state
+
+    def set_state(self, state):
+        self.xm[...] = state['xm']
+        self._buffer[...] = state['buffer']
+        self._index = state['index']
+        if 'controller' in state:
+            self.controller.set_state(state['controller'])
+
+    def compute(self, setpoint, measurement):
+        ym = float(self.Cm @ self.xm)
+        if self.delay_samples:
+            ym_delayed = self._buffer[self._index]
+            self._buffer[self._index] = ym
+            self._index = (self._index + 1) % self.delay_samples
+        else:
+            ym_delayed = ym
+
+        u = self.controller.compute(setpoint, measurement + ym - ym_delayed)
+
+        # Advance the delay-free model
+        np.dot(self.Am, self.xm, self._x_next)
+        self._x_next += np.multiply(self.Bm, u, self._bu)
+        self.xm, self._x_next = self._x_next, self.xm
+        return u
+
+class SmithPredictorBank(Controller):
+    """
+    Batched DiscreteSmithPredictor for N loops sharing the same nominal model
+    and delay, wrapping a bank controller such as PIDBank whose
+    compute(setpoints, measurements) works on arrays of length N.
+    Model states are an (N, nx) array and the delay line a (d, N) ring buffer.
+    """
+
+    def __init__(self, controller_bank, plant_nominal, delay, dt, n):
+        """
+        :param controller_bank: Bank controller stepping N loops per call
+        :param plant_nominal: Strictly proper nominal model Gm(s) (python-control)
+        :param delay: Plant dead time (seconds), rounded to whole samples
+        :param dt: Sampling time
+        :param n: Number of loops
+        """
+        self.controller = controller_bank
+        self.dt = dt
+        self.n = n
+        self.delay_samples = int(round(delay / dt))
+
+        Am, Bm, Cm, Dm = _discretize(plant_nominal, dt)
+        if np.any(Dm):
+            raise ValueError("the nominal plant must be strictly proper")
+        self.Am_T = Am.T.copy()
+        self.Bm = Bm[:, 0].copy()
+        self.Cm = Cm[0].copy()
+
+        nx = Am.shape[0]
+        self.xm = np.zeros((n, nx))
+        self._x_next = np.zeros((n, nx))
+        self._uB = np.zeros((n, nx))
+        self._ym = np.zeros(n)
+        self._feedback = np.zeros(n)
+        self._buffer = np.zeros((max(self.delay_samples, 1), n))
+        self._index = 0
+
+    def reset(self):
+        if hasattr(self.controller, 'reset'):
+            self.controller.reset()
+        self.xm.fill(0.0)
+        self._buffer.fill(0.0)
+        self._index = 0
+
+    def get_state(self):
+        state = {'xm': self.xm.copy(), 'buffer': self._buffer.copy(), 'index': self._index}
+        if hasattr(self.controller, 'get_state'):
+            state['controller'] = self.controller.get_state()
+        return state
+
+    def set_state(self, state):
+        self.xm[...] = state['xm']
+        self._buffer[...] = state['buffer']
+        self._index = state['index']
+        if 'controller' in state:
+            self.controller.set_state(state['controller'])
+
+    def compute(self, setpoints, measurements):
+        """
+        Step all N loops once.
+        :return: Array of N control outputs
+        """
+        ym = np.dot(self.xm, self.Cm, self._ym)
+        feedback = np.add(measurements, ym, self._feedback)
+        if self.delay_samples:
+            row = self._buffer[self._index]
+            feedback -= row
+            row[:] = ym
+            self._index = (self._index + 1) % self.delay_samples
+        else:
+            feedback -= ym
+
+        u = self.controller.compute(setpoints, feedback)
+
+        # Advance the delay-free models
+        np.dot(self.xm, self.Am_T, self._x_next)
+        self._x_next += np.multiply(u[:, None], self.Bm, out=self._uB)
+        self.xm, self._x_next = self._x_next, self.xm
+        return u
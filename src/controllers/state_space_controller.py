@@ -1,16 +1,308 @@
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 import control as ctrl
 import numpy as np
+from scipy.linalg import expm, solve_continuous_lyapunov
+
+def zoh(A, B, dt):
+    """
+    Zero-order-hold discretization (Ad, Bd) of x' = A x + B u via the matrix
+    exponential.
+    """
+    nx, nu = B.shape
+    M = np.zeros((nx + nu, nx + nu))
+    M[:nx, :nx] = A
+    M[:nx, nx:] = B
+    Md = expm(M * dt)
+    return Md[:nx, :nx], Md[:nx, nx:]
 
-def pole_placement(A, B, desired_poles):
+def pole_placement(A, B, desired_poles, cache=None):
     """
     Returns the state-feedback gain K given system matrices A, B.
+    :param cache: Optional SynthesisCache to memoize the result
     """
+    if cache is not None:
+        key = matrix_key('place', A, B, np.sort_complex(np.asarray(desired_poles, dtype=complex)))
+        hit = cache.get(key)
+        if hit is not None:
+            return hit[0]
     K = ctrl.place(A, B, desired_poles)
+    if cache is not None:
+        cache.put(key, (K,))
     return K
 
-def lqr_controller(A, B, Q, R):
+def lqr_controller(A, B, Q, R, cache=None):
     """
     Returns LQR gain K, cost-to-go S, closed-loop eigenvalues E.
+    :param cache: Optional SynthesisCache to memoize the result
     """
+    if cache is not None:
+        key = matrix_key('lqr', A, B, Q, R)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
     K, S, E = ctrl.lqr(A, B, Q, R)
+    if cache is not None:
+        cache.put(key, (K, S, E), inputs=(A, B, Q, R))
+    return K, S, E
+
+
+# Batched synthesis
+#
+# Design sweeps solve many closely related problems (Q/R weight sweeps,
+# parameter-varying A). Results are memoized by a hash of the input matrices in
+# a SynthesisCache, cache misses are farmed out to a process pool in
+# contiguous chunks, and each LQR solve inside a chunk is warm-started from the
+# previous one with Newton-Kleinman iterations (one Lyapunov solve per step,
+# much cheaper than a full Riccati solve when the guess is close).
+
+def matrix_key(kind, *matrices):
+    """
+    Stable hash of a synthesis problem: kind plus the shape and float64 bytes
+    of every input matrix.
+    """
+    h = hashlib.blake2b(kind.encode(), digest_size=20)
+    for m in matrices:
+        m = np.ascontiguousarray(m, dtype=complex if np.iscomplexobj(m) else float)
+        h.update(str(m.shape).encode())
+        h.update(m.tobytes())
+    return h.hexdigest()
+
+def tf_coefficients(sys):
+    """
+    (num, den) coefficient arrays of a SISO python-control system.
+    """
+    tf = ctrl.tf(sys)
+    return np.atleast_1d(np.squeeze(tf.num[0][0])), np.atleast_1d(np.squeeze(tf.den[0][0]))
+
+def tf_key(sys):
+    """
+    Hashable key of a SISO python-control system: the tuples of its
+    transfer-function numerator and denominator coefficients. Unlike id(),
+    equal models give equal keys.
+    """
+    num, den = tf_coefficients(sys)
+    return (tuple(num.tolist()), tuple(den.tolist()))
+
+class SynthesisCache:
+    """
+    LRU cache of synthesis results keyed by matrix_key(), optionally
+    persisted to a directory as one .npz file per entry so later runs of a
+    design sweep can reuse earlier solves.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        """
+        :param maxsize: Maximum number of entries kept in memory
+        :param path: Optional directory for on-disk persistence
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Return the cached result tuple for key, or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None and self.path is not None:
+            entry = self._load(key)
+            if entry is not None:
+                self._store(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, result, inputs=None):
+        """
+        Store a result tuple; inputs (the problem matrices) are kept in memory
+        so the cache can provide warm starts for nearby problems.
+        """
+        self._store(key, (tuple(result), inputs))
+        if self.path is not None:
+            np.savez(os.path.join(self.path, key + '.npz'),
+                     **{f'r{i}': np.asarray(r) for i, r in enumerate(result)})
+
+    def nearest(self, inputs):
+        """
+        Result of the cached problem closest to inputs (same shapes, smallest
+        Frobenius distance), or None.
+        """
+        best = None
+        best_dist = np.inf
+        for result, cached in self._entries.values():
+            if cached is None or any(np.shape(a) != np.shape(b) for a, b in zip(cached, inputs)):
+                continue
+            dist = sum(np.sum((np.asarray(a) - np.asarray(b)) ** 2) for a, b in zip(cached, inputs))
+            if dist < best_dist:
+                best, best_dist = result, dist
+        return best
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _load(self, key):
+        filename = os.path.join(self.path, key + '.npz')
+        if not os.path.exists(filename):
+            return None
+        with np.load(filename) as data:
+            return tuple(data[f'r{i}'] for i in range(len(data.files))), None
+
+def _lqr_newton(A, B, Q, R, K0, max_iter=50, rtol=1e-12):
+    """
+    Newton-Kleinman iteration for the continuous-time LQR Riccati equation,
+    started from a stabilizing gain K0. Returns (K, S) or None if K0 is not
+    stabilizing or the iteration does not converge.
+    """
+    if np.max(np.linalg.eigvals(A - B @ K0).real) >= 0:
+        return None
+    R_inv_BT = np.linalg.solve(R, B.T)
+    K = K0
+    S_prev = None
+    for _ in range(max_iter):
+        Acl = A - B @ K
+        S = solve_continuous_lyapunov(Acl.T, -(Q + K.T @ R @ K))
+        K = R_inv_BT @ S
+        if S_prev is not None and np.linalg.norm(S - S_prev) <= rtol * np.linalg.norm(S):
+            return K, S
+        S_prev = S
+    return None
+
+def _solve_lqr_chunk(problems, K0, warm_start):
+    """
+    Solve a list of (A, B, Q, R) problems in order, warm-starting each one
+    from the previous gain (or K0 for the first). Runs in pool workers.
+    """
+    results = []
+    for A, B, Q, R in problems:
+        solved = None
+        if warm_start and K0 is not None and np.shape(K0) == (B.shape[1], A.shape[0]):
+            solved = _lqr_newton(A, B, Q, R, K0)
+        if solved is None:
+            K, S, E = ctrl.lqr(A, B, Q, R)
+        else:
+            K, S = solved
+            E = np.linalg.eigvals(A - B @ K)
+        results.append((K, S, E))
+        K0 = K
+    return results
+
+def _solve_place_chunk(problems):
+    return [(ctrl.place(A, B, poles),) for A, B, poles in problems]
+
+def _as_stack(matrices, count, name):
+    """
+    Accept a single 2-D matrix (shared by every problem) or a stack of them.
+    :raises ValueError: if a stack does not hold exactly count matrices
+    """
+    if isinstance(matrices, np.ndarray) and matrices.ndim == 2:
+        return [matrices] * count
+    if len(matrices) != count:
+        raise ValueError(f"{name} has {len(matrices)} entries, expected {count} "
+                         "(or a single 2-D matrix shared by all problems)")
+    return [np.asarray(m) for m in matrices]
+
+def _run_chunks(solve, chunks, n_workers):
+    if n_workers is None or n_workers <= 1 or len(chunks) <= 1:
+        return [solve(*chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(solve, *zip(*chunks)))
+
+def _split(indices, n_chunks):
+    """
+    Split indices into at most n_chunks contiguous, non-empty parts.
+    """
+    return [part.tolist() for part in np.array_split(np.asarray(indices, dtype=int), n_chunks) if len(part)]
+
+def lqr_batch(As, Bs, Qs, Rs, cache=None, n_workers=None, warm_start=True):
+    """
+    Solve many LQR problems. Any argument may be a single matrix shared by
+    all problems or a sequence/stack of matrices (one per problem).
+
+    :param cache: Optional SynthesisCache; hits are returned without solving
+    :param n_workers: Process pool size for the cache misses (None or 1 solves in-process)
+    :param warm_start: Warm-start each solve from its neighbor in the sweep
+                       (or the nearest cached problem) with Newton-Kleinman
+    :return: Lists K, S, E with one entry per problem, in input order
+    """
+    count = max(len(m) if not (isinstance(m, np.ndarray) and m.ndim == 2) else 1
+                for m in (As, Bs, Qs, Rs))
+    problems = list(zip(*(_as_stack(m, count, name)
+                          for m, name in ((As, 'As'), (Bs, 'Bs'), (Qs, 'Qs'), (Rs, 'Rs')))))
+
+    results = [None] * count
+    keys = [matrix_key('lqr', *p) for p in problems]
+    missing = []
+    for i, key in enumerate(keys):
+        hit = cache.get(key) if cache is not None else None
+        if hit is None:
+            missing.append(i)
+        else:
+            results[i] = hit
+
+    parts = _split(missing, max(1, n_workers or 1))
+    chunks = []
+    for part in parts:
+        K0 = None
+        if warm_start and cache is not None:
+            near = cache.nearest(problems[part[0]])
+            K0 = None if near is None else near[0]
+        chunks.append(([problems[i] for i in part], K0, warm_start))
+
+    for part, solved in zip(parts, _run_chunks(_solve_lqr_chunk, chunks, n_workers)):
+        for i, result in zip(part, solved):
+            results[i] = result
+            if cache is not None:
+                cache.put(keys[i], result, inputs=problems[i])
+
+    K, S, E = (list(r) for r in zip(*results)) if results else ([], [], [])
     return K, S, E
+
+def pole_placement_batch(As, Bs, poles, cache=None, n_workers=None):
+    """
+    Pole placement for many (A, B, desired_poles) problems.
+    A and B may be single matrices shared by all problems; poles is a
+    sequence of desired pole sets, one per problem.
+
+    :param cache: Optional SynthesisCache; hits are returned without solving
+    :param n_workers: Process pool size for the cache misses
+    :return: List of gains K, in input order
+    """
+    poles = [np.asarray(p) for p in poles]
+    count = len(poles)
+    problems = list(zip(_as_stack(As, count, 'As'), _as_stack(Bs, count, 'Bs'), poles))
+
+    results = [None] * count
+    keys = [matrix_key('place', A, B, np.sort_complex(p.astype(complex))) for A, B, p in problems]
+    missing = []
+    for i, key in enumerate(keys):
+        hit = cache.get(key) if cache is not None else None
+        if hit is None:
+            missing.append(i)
+        else:
+            results[i] = hit[0]
+
+    parts = _split(missing, max(1, n_workers or 1))
+    chunks = [([problems[i] for i in part],) for part in parts]
+    for part, solved in zip(parts, _run_chunks(_solve_place_chunk, chunks, n_workers)):
+        for i, result in zip(part, solved):
+            results[i] = result[0]
+            if cache is not None:
+                cache.put(keys[i], result)
+    return results
@@ -1,4 +1,20 @@
+from functools import lru_cache
+
 import numpy as np
+from scipy import signal as sp_signal
+
+def _time_chunks(total_time, dt, chunk_size):
+    """
+    Yield (k0, t) for successive time-vector chunks of at most chunk_size
+    samples, where k0 is the index of the chunk's first sample.
+    total_time=None streams forever.
+    """
+    n_total = None if total_time is None else int(np.ceil(total_time / dt))
+    k = 0
+    while n_total is None or k < n_total:
+        n = chunk_size if n_total is None else min(chunk_size, n_total - k)
+        yield k, (k + np.arange(n)) * dt
+        k += n
 
 class SyntheticDataGenerator:
     """
@@ -56,3 +72,346 @@ class SyntheticDataGenerator:
         t = np.arange(0, total_time, dt)
         u = self.rng.normal(loc=mean, scale=std, size=len(t))
         return t, u
+
+    # Streaming variants: same signals as above, produced lazily in fixed-size
+    # (t, u) chunks so memory stays flat however long the run is. Sample k is
+    # always at t = k*dt, exactly as in np.arange(0, total_time, dt), so the
+    # concatenated chunks equal the materialized arrays.
+
+    def step_stream(self, step_time=1.0, total_time=None, dt=0.01, amplitude=1.0, chunk_size=1024):
+        """
+        Streaming version of step_data().
+
+        :param total_time: Total time (seconds), or None for an unbounded stream.
+        :param chunk_size: Samples per yielded chunk (the last one may be shorter).
+        :return: Generator of (t, u) chunks
+        """
+        for _, t in _time_chunks(total_time, dt, chunk_size):
+            u = np.zeros_like(t)
+            u[t >= step_time] = amplitude
+            yield t, u
+
+    def sine_stream(self, freq=1.0, total_time=None, dt=0.01, amplitude=1.0, phase=0.0, chunk_size=1024):
+        """
+        Streaming version of sine_data().
+
+        :param total_time: Total time (seconds), or None for an unbounded stream.
+        :param chunk_size: Samples per yielded chunk (the last one may be shorter).
+        :return: Generator of (t, u) chunks
+        """
+        for _, t in _time_chunks(total_time, dt, chunk_size):
+            yield t, amplitude * np.sin(2 * np.pi * freq * t + phase)
+
+    def random_stream(self, total_time=None, dt=0.01, mean=0.0, std=1.0, chunk_size=1024):
+        """
+        Streaming version of random_data(). Draws come from self.rng in order,
+        so the chunks continue the same random sequence a single call would give.
+
+        :param total_time: Total time (seconds), or None for an unbounded stream.
+        :param chunk_size: Samples per yielded chunk (the last one may be shorter).
+        :return: Generator of (t, u) chunks
+        """
+        for _, t in _time_chunks(total_time, dt, chunk_size):
+            yield t, self.rng.normal(loc=mean, scale=std, size=len(t))
+
+
+# Composable signal graph
+#
+# Signals are small node objects combined into a tree, e.g.
+#   profile = Clip(Concat([(Step(0.5), 5.0), (Chirp(0.1, 2.0, 10.0), 10.0)])
+#                  + ColoredNoise(std=0.05, tau=0.2, seed=1), -1.0, 1.0)
+#   t, u = profile.evaluate(total_time=15.0, dt=0.01)
+# Evaluation fills one preallocated buffer with whole-array NumPy operations per
+# node, and stream() yields the same samples chunk by chunk.
+
+class Signal:
+    """
+    Base class of the signal graph nodes.
+
+    Subclasses implement _fill(out, t, k0, dt), writing the samples with local
+    indices k0 .. k0+len(out)-1 (local times t) into out.
+    """
+
+    def _fill(self, out, t, k0, dt):
+        raise NotImplementedError
+
+    def evaluate(self, total_time=10.0, dt=0.01, out=None):
+        """
+        Evaluate the signal on t = 0, dt, ..., like the *_data() methods.
+
+        :param out: Optional preallocated buffer with ceil(total_time/dt) samples
+        :return: t (time array), u (signal array)
+        """
+        n = int(np.ceil(total_time / dt))
+        t = np.arange(n) * dt
+        if out is None:
+            out = np.empty(n)
+        self._fill(out, t, 0, dt)
+        return t, out
+
+    def stream(self, total_time=None, dt=0.01, chunk_size=1024):
+        """
+        Evaluate the signal lazily in (t, u) chunks; total_time=None streams forever.
+        Chunks concatenate to exactly what evaluate() returns.
+        """
+        for k0, t in _time_chunks(total_time, dt, chunk_size):
+            out = np.empty(len(t))
+            self._fill(out, t, k0, dt)
+            yield t, out
+
+    def __add__(self, other):
+        return Sum(self, other)
+
+class Step(Signal):
+    """
+    initial until step_time, then amplitude.
+    """
+
+    def __init__(self, amplitude=1.0, step_time=0.0, initial=0.0):
+        self.amplitude = amplitude
+        self.step_time = step_time
+        self.initial = initial
+
+    def _fill(self, out, t, k0, dt):
+        out.fill(self.initial)
+        out[t >= self.step_time] = self.amplitude
+
+class Ramp(Signal):
+    """
+    initial + slope * (t - start_time) after start_time, initial before.
+    """
+
+    def __init__(self, slope=1.0, start_time=0.0, initial=0.0):
+        self.slope = slope
+        self.start_time = start_time
+        self.initial = initial
+
+    def _fill(self, out, t, k0, dt):
+        np.subtract(t, self.start_time, out=out)
+        np.maximum(out, 0.0, out=out)
+        out *= self.slope
+        out += self.initial
+
+class Sine(Signal):
+    """
+    amplitude * sin(2*pi*freq*t + phase)
+    """
+
+    def __init__(self, freq=1.0, amplitude=1.0, phase=0.0):
+        self.freq = freq
+        self.amplitude = amplitude
+        self.phase = phase
+
+    def _fill(self, out, t, k0, dt):
+        np.multiply(t, 2 * np.pi * self.freq, out=out)
+        out += self.phase
+        np.sin(out, out=out)
+        out *= self.amplitude
+
+class Chirp(Signal):
+    """
+    Linear chirp sweeping from f0 to f1 (Hz) over sweep_time seconds:
+      amplitude * sin(2*pi*(f0*t + (f1 - f0)/(2*sweep_time) * t^2) + phase)
+    """
+
+    def __init__(self, f0=0.1, f1=10.0, sweep_time=10.0, amplitude=1.0, phase=0.0):
+        self.f0 = f0
+        self.f1 = f1
+        self.sweep_time = sweep_time
+        self.amplitude = amplitude
+        self.phase = phase
+
+    def _fill(self, out, t, k0, dt):
+        rate = (self.f1 - self.f0) / (2.0 * self.sweep_time)
+        np.multiply(t, rate, out=out)
+        out += self.f0
+        out *= t
+        out *= 2 * np.pi
+        out += self.phase
+        np.sin(out, out=out)
+        out *= self.amplitude
+
+# Feedback taps of maximal-length Fibonacci LFSRs, by register length
+_PRBS_TAPS = {
+    2: (2, 1), 3: (3, 2), 4: (4, 3), 5: (5, 3), 6: (6, 5), 7: (7, 6),
+    8: (8, 6, 5, 4), 9: (9, 5), 10: (10, 7), 11: (11, 9), 12: (12, 11, 10, 4),
+    13: (13, 12, 11, 8), 14: (14, 13, 12, 2), 15: (15, 14), 16: (16, 15, 13, 4),
+}
+
+@lru_cache(maxsize=None)
+def _prbs_period(order):
+    """
+    One period of the maximal-length sequence of the given order, started
+    from register state 1, and the index at which each register state occurs
+    in it. Any other seed gives a rotation of the same period, so the LFSR
+    only runs once per order.
+    """
+    taps = _PRBS_TAPS[order]
+    bits = np.empty(2 ** order - 1, dtype=np.intp)
+    position = np.zeros(2 ** order, dtype=np.intp)
+    state = 1
+    for i in range(len(bits)):
+        position[state] = i
+        bits[i] = state & 1
+        feedback = 0
+        for tap in taps:
+            feedback ^= (state >> (order - tap)) & 1
+        state = (state >> 1) | (feedback << (order - 1))
+    bits.flags.writeable = False
+    position.flags.writeable = False
+    return bits, position
+
+class PRBS(Signal):
+    """
+    Pseudo-random binary sequence (maximal-length LFSR) switching between
+    offset - amplitude and offset + amplitude, holding each bit for bit_time.
+    One full period (2^order - 1 bits) is generated once per order and shared
+    by all instances (rotated to the seed); samples are then looked up by
+    index, so any chunking gives the same sequence.
+    """
+
+    def __init__(self, order=10, bit_time=0.1, amplitude=1.0, offset=0.0, seed=1):
+        """
+        :param order: LFSR register length (2..16)
+        :param bit_time: Hold time of each bit (seconds)
+        :param amplitude: Half the peak-to-peak level
+        :param offset: Mean level
+        :param seed: Non-zero initial register state
+        """
+        if order not in _PRBS_TAPS:
+            raise ValueError(f"order must be between 2 and 16, got {order}")
+        self.order = order
+        self.bit_time = bit_time
+        self.amplitude = amplitude
+        self.offset = offset
+
+        state = seed % (2 ** order) or 1
+        self._bits, position = _prbs_period(order)
+        self._start = int(position[state])
+        self._table = np.array([offset - amplitude, offset + amplitude])
+
+    @property
+    def levels(self):
+        """ One period of levels, starting at the seed. """
+        return self._table[np.roll(self._bits, -self._start)]
+
+    def _fill(self, out, t, k0, dt):
+        samples_per_bit = max(1, int(round(self.bit_time / dt)))
+        index = (k0 + np.arange(len(out))) // samples_per_bit + self._start
+        np.take(self._table, self._bits[index % len(self._bits)], out=out)
+
+class ColoredNoise(Signal):
+    """
+    Stationary first-order (Ornstein-Uhlenbeck-like) Gaussian noise with
+    standard deviation std and correlation time tau; tau=0 gives white noise.
+
+    The noise is stateful: chunks must be requested in order, and evaluation
+    restarts from the seed whenever sample 0 is requested.
+    """
+
+    def __init__(self, std=1.0, tau=0.0, mean=0.0, seed=None):
+        self.std = std
+        self.tau = tau
+        self.mean = mean
+        self.seed = seed
+        self._rng = None
+        self._prev = 0.0
+        self._next_index = 0
+
+    def _fill(self, out, t, k0, dt):
+        if k0 == 0:
+            self._rng = np.random.default_rng(self.seed)
+            # Start from the stationary distribution
+            self._prev = self.std * self._rng.standard_normal()
+        elif k0 != self._next_index:
+            raise ValueError("ColoredNoise chunks must be evaluated in order")
+
+        w = self._rng.standard_normal(len(out))
+        if self.tau > 0:
+            a = np.exp(-dt / self.tau)
+            b = self.std * np.sqrt(1.0 - a * a)
+            x, _ = sp_signal.lfilter([b], [1.0, -a], w, zi=[a * self._prev])
+        else:
+            x = self.std * w
+        if len(x):
+            self._prev = x[-1]
+        np.add(x, self.mean, out=out)
+        self._next_index = k0 + len(out)
+
+class Sum(Signal):
+    """
+    Sample-wise sum of several signals.
+    """
+
+    def __init__(self, *signals):
+        self.signals = signals
+
+    def _fill(self, out, t, k0, dt):
+        self.signals[0]._fill(out, t, k0, dt)
+        scratch = np.empty_like(out)
+        for sig in self.signals[1:]:
+            sig._fill(scratch, t, k0, dt)
+            out += scratch
+
+class Concat(Signal):
+    """
+    Signals played one after another. Each segment runs on its own local time
+    axis starting at 0.
+    """
+
+    def __init__(self, segments):
+        """
+        :param segments: List of (signal, duration) pairs; the last duration may
+                         be None to play that segment forever. Samples after the
+                         last finite segment are 0.
+        """
+        self.segments = segments
+
+    def _fill(self, out, t, k0, dt):
+        out.fill(0.0)
+        start = 0
+        k1 = k0 + len(out)
+        for sig, duration in self.segments:
+            n = None if duration is None else int(round(duration / dt))
+            stop = k1 if n is None else start + n
+            lo = max(k0, start)
+            hi = min(k1, stop)
+            if lo < hi:
+                local_k0 = lo - start
+                local_t = (local_k0 + np.arange(hi - lo)) * dt
+                sig._fill(out[lo - k0:hi - k0], local_t, local_k0, dt)
+            if n is None or stop >= k1:
+                break
+            start = stop
+
+class Clip(Signal):
+    """
+    Signal clamped to [lower, upper] (either bound may be None).
+    """
+
+    def __init__(self, signal, lower=None, upper=None):
+        self.signal = signal
+        self.lower = lower
+        self.upper = upper
+
+    def _fill(self, out, t, k0, dt):
+        self.signal._fill(out, t, k0, dt)
+        if self.lower is not None:
+            np.maximum(out, self.lower, out=out)
+        if self.upper is not None:
+            np.minimum(out, self.upper, out=out)
+
+def evaluate_signals(signals, total_time=10.0, dt=0.01):
+    """
+    Evaluate many signal graphs (e.g. a campaign of excitation profiles) into
+    one preallocated (len(signals), n_samples) array. The graphs are filled
+    one row at a time (a Python loop over signals); each fill is vectorized
+    over the samples, so the loop overhead matters only for very short runs.
+    :return: t (time array), U (one row per signal)
+    """
+    n = int(np.ceil(total_time / dt))
+    t = np.arange(n) * dt
+    U = np.empty((len(signals), n))
+    for row, sig in zip(U, signals):
+        sig._fill(row, t, 0, dt)
+    return t, U
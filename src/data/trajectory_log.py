@@ -0,0 +1,231 @@
+import json
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+_HEADER = 'header.json'
+_VERSION = 1
+
+def _column_file(path, name):
+    return os.path.join(path, name + '.f64')
+
+def _write_header(path, header):
+    # Write-then-rename so a reader never sees a half-written header
+    tmp = os.path.join(path, _HEADER + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(header, f)
+    os.replace(tmp, os.path.join(path, _HEADER))
+
+class TrajectoryRecorder:
+    """
+    Append-only logger for long, high-rate runs, stored column by column on
+    disk.
+
+    A log is a directory with one raw float64 file per column (rows of the
+    column's shape, e.g. () for a scalar or (2, 1) for LQGController.x_hat)
+    and a small JSON header. The header holds the column layout, the number
+    of committed rows and an index of the first/last time of every chunk.
+
+    Every column has a preallocated chunk buffer of chunk_size rows: record()
+    writes one row into the buffers by index and record_many() copies whole
+    blocks in, so nothing is allocated per row. When a chunk is full the new
+    rows of every buffer are appended to its file and the chunk is committed
+    by rewriting the header; the buffers are then reused for the next chunk.
+    flush() does the same for a partial chunk and close() commits whatever is
+    left. Readers (TrajectoryLog) only see committed rows.
+
+    record_many() is the logging path for high-rate loops: run the loop in
+    blocks (simulate(), compute_many(), rollout()) and log each block's output
+    arrays, which only adds a copy per block. record() costs a Python call per
+    row, on the order of a microsecond, which is several times a cheap scalar
+    step; use it for slow or occasional rows (events, supervisory loops), not
+    for per-step logging of a fast loop.
+    """
+
+    def __init__(self, path, columns, chunk_size=65536):
+        """
+        :param path: Directory to create for the log
+        :param columns: Dict of column name -> shape (use () for scalars). The
+                        first column is the time stamp and must be scalar and
+                        non-decreasing.
+        :param chunk_size: Rows per chunk
+        """
+        names = list(columns)
+        if not names or tuple(columns[names[0]]) != ():
+            raise ValueError("the first column must be a scalar time stamp")
+        os.makedirs(path)
+        self.path = path
+        self.columns = {name: tuple(shape) for name, shape in columns.items()}
+        self.chunk_size = chunk_size
+        self.n_rows = 0
+        self.chunk_index = []  # [first_t, last_t] per committed chunk
+
+        self._order = names
+        self._buffers = [np.zeros((chunk_size,) + self.columns[name]) for name in names]
+        # record() writes scalars through memoryviews, which skips NumPy's
+        # per-item indexing machinery
+        self._slots = [memoryview(buffer) if buffer.ndim == 1 else buffer
+                       for buffer in self._buffers]
+        self._files = [open(_column_file(path, name), 'wb') for name in names]
+        self._row = 0  # rows collected in the current chunk
+        self._written = 0  # rows of the current chunk already appended to the files
+        self._commit()
+
+    def record(self, *values):
+        """
+        Append one row, one value per column in the order given at construction,
+        e.g. recorder.record(t, setpoint, y, u, pid.integral_term, lqg.x_hat).
+        Arrays are copied, so passing a buffer that is updated in place is safe.
+        """
+        if len(values) != len(self._slots):
+            raise ValueError(f"expected {len(self._slots)} values (one per column), "
+                             f"got {len(values)}")
+        row = self._row
+        for slot, value in zip(self._slots, values):
+            slot[row] = value
+        self._row = row + 1
+        if self._row == self.chunk_size:
+            self.flush()
+
+    def record_many(self, **columns):
+        """
+        Append a block of rows given as arrays with one row per entry (e.g.
+        the outputs of simulate() or compute_many()). Every column is required
+        and all blocks must have the same number of rows.
+        """
+        if set(columns) != set(self._order):
+            missing = [name for name in self._order if name not in columns]
+            unknown = [name for name in columns if name not in self.columns]
+            raise ValueError(f"record_many() needs exactly the log's columns; "
+                             f"missing {missing}, unknown {unknown}")
+        blocks = [np.asarray(columns[name], dtype=np.float64) for name in self._order]
+        n = len(blocks[0])
+        if any(len(block) != n for block in blocks):
+            raise ValueError("record_many() blocks have different numbers of rows")
+        start = 0
+        while start < n:
+            take = min(n - start, self.chunk_size - self._row)
+            for buffer, block in zip(self._buffers, blocks):
+                buffer[self._row:self._row + take] = block[start:start + take].reshape(
+                    (take,) + buffer.shape[1:])
+            self._row += take
+            start += take
+            if self._row == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Append the rows collected since the last flush to the column files and
+        commit them. Once a chunk is full the recorder moves on to the next one.
+        """
+        n = self._row
+        if n == self._written:
+            return
+        for buffer, f in zip(self._buffers, self._files):
+            f.write(memoryview(buffer[self._written:n]).cast('B'))
+            f.flush()
+        self._written = n
+
+        t = self._buffers[0]
+        entry = [float(t[0]), float(t[n - 1])]
+        chunk_start = len(self.chunk_index) * self.chunk_size
+        if chunk_start > self.n_rows:
+            self.chunk_index[-1] = entry  # chunk grew since an earlier flush()
+            chunk_start -= self.chunk_size
+        else:
+            self.chunk_index.append(entry)
+        self.n_rows = chunk_start + n
+        self._commit()
+
+        if n == self.chunk_size:
+            self._row = 0
+            self._written = 0
+
+    def _commit(self):
+        _write_header(self.path, dict(
+            version=_VERSION,
+            columns={name: list(shape) for name, shape in self.columns.items()},
+            order=self._order,
+            chunk_size=self.chunk_size,
+            n_rows=self.n_rows,
+            chunk_index=self.chunk_index,
+        ))
+
+    def close(self):
+        self.flush()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryLog:
+    """
+    Read-only view of a log written by TrajectoryRecorder.
+
+    Columns are memory-mapped, so opening a log or slicing a time window
+    only touches the pages that are actually read.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Log directory
+        """
+        with open(os.path.join(path, _HEADER)) as f:
+            header = json.load(f)
+        if header['version'] != _VERSION:
+            raise ValueError(f"unsupported log version {header['version']}")
+        self.path = path
+        self.columns = {name: tuple(header['columns'][name]) for name in header['order']}
+        self.time_column = header['order'][0]
+        self.n_rows = header['n_rows']
+        self.chunk_size = header['chunk_size']
+        self.chunk_index = header['chunk_index']
+        self._chunk_t0 = [entry[0] for entry in self.chunk_index]
+        self._maps = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def column(self, name):
+        """
+        The whole column as a read-only memory map of shape (n_rows, *shape).
+        """
+        data = self._maps.get(name)
+        if data is None:
+            shape = (self.n_rows,) + self.columns[name]
+            if self.n_rows == 0:
+                data = np.empty(shape)
+            else:
+                data = np.memmap(_column_file(self.path, name), dtype=np.float64,
+                                 mode='r', shape=shape)
+            self._maps[name] = data
+        return data
+
+    def _row_range(self, t0, t1):
+        """
+        Rows with t0 <= t < t1: the chunk index narrows the search to the
+        chunks that can contain the bounds, then a binary search on the time
+        column finds the exact rows. The search starts in the chunk before the
+        first one starting at t0, since equal time stamps may span chunks.
+        """
+        t = self.column(self.time_column)
+        first = max(bisect_left(self._chunk_t0, t0) - 1, 0) * self.chunk_size
+        last = min(bisect_left(self._chunk_t0, t1) * self.chunk_size, self.n_rows)
+        start = first + int(np.searchsorted(t[first:last], t0, side='left'))
+        stop = first + int(np.searchsorted(t[first:last], t1, side='left'))
+        return start, max(stop, start)
+
+    def window(self, t0, t1, columns=None):
+        """
+        All rows with t0 <= t < t1.
+        :param columns: Column names to return (default: all)
+        :return: Dict of column name -> array (views of the memory maps)
+        """
+        start, stop = self._row_range(t0, t1)
+        names = self.columns if columns is None else columns
+        return {name: self.column(name)[start:stop] for name in names}
@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+
+from controllers.kalman_filter import KalmanFilter, KalmanFilterBank
+from controllers.lqg_controller import LQGController
+
+def build_model(nx, rng):
+    """
+    Random stable continuous model with nx states, one input and nx // 4 + 1 outputs.
+    """
+    ny = nx // 4 + 1
+    A = rng.normal(size=(nx, nx)) / np.sqrt(nx) - 1.5 * np.eye(nx)
+    B = rng.normal(size=(nx, 1))
+    C = rng.normal(size=(ny, nx))
+    return A, B, C, 0.1 * np.eye(nx), 0.01 * np.eye(ny)
+
+def time_steps(step, measurements):
+    """
+    Mean seconds per call of step(y).
+    """
+    for y in measurements[:10]:
+        step(y)
+    start = time.perf_counter()
+    for y in measurements:
+        step(y)
+    return (time.perf_counter() - start) / len(measurements)
+
+def main():
+    dt = 0.01
+    rng = np.random.default_rng(0)
+    m = 64
+
+    print(f"{'nx':>5}{'fixed gain us':>16}{'joseph us':>12}{'sqrt us':>12}{f'bank/{m} us':>14}")
+    for nx in (2, 50, 200):
+        A, B, C, Qn, Rn = build_model(nx, rng)
+        ny = C.shape[0]
+        n_steps = 2000 if nx < 200 else 200
+        measurements = [rng.normal(size=(ny, 1)) for _ in range(n_steps)]
+        out = np.zeros((1, 1))
+        K = rng.normal(size=(1, nx)) * 0.01
+
+        lqg = LQGController.from_weights(A, B, C, np.eye(nx), np.eye(1), Qn * dt, Rn, dt)
+        t_fixed = time_steps(lambda y: lqg.step_measurement(y, out=out), measurements)
+
+        times = []
+        for form in ('joseph', 'sqrt'):
+            lqg_kf = LQGController(A, B, C, K, np.zeros((nx, ny)), dt)
+            lqg_kf.attach_kalman_filter(KalmanFilter(A, B, C, Qn, Rn, dt=dt, form=form))
+            times.append(time_steps(lambda y: lqg_kf.step_measurement(y, out=out), measurements))
+
+        # Bank: m filters updated together, reported per filter
+        bank = KalmanFilterBank(m, A, B, C, Qn, Rn, dt=dt)
+        u = np.zeros((m, 1, 1))
+        Y = [np.repeat(y[None], m, axis=0) for y in measurements[:max(20, n_steps // 20)]]
+
+        def bank_step(y):
+            bank.update(y)
+            bank.predict(u)
+        t_bank = time_steps(bank_step, Y) / m
+
+        print(f"{nx:>5}{t_fixed * 1e6:>16.1f}{times[0] * 1e6:>12.1f}{times[1] * 1e6:>12.1f}{t_bank * 1e6:>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import time
+
+import numpy as np
+
+from controllers.pid_controller import PIDController
+from controllers.onoff_controller import OnOffController
+from simulation.closed_loop import simulate
+from simulation.kernels import HAVE_COMPILED
+from simulation.plants import FirstOrderPlant
+
+def run(make_controller, setpoint, dt, fast):
+    controller = make_controller()
+    plant = FirstOrderPlant.euler(tau=1.0, gain=1.0, dt=dt)
+    start = time.perf_counter()
+    result = simulate(controller, plant, setpoint, fast=fast)
+    return result, time.perf_counter() - start
+
+def main():
+    dt = 0.01
+    n_steps = 10_000_000
+    rng = np.random.default_rng(0)
+    setpoint = np.repeat(rng.uniform(-1.0, 1.0, n_steps // 1000), 1000)
+
+    if not HAVE_COMPILED:
+        print("numba is not installed: simulate() uses the Python classes, nothing to compare")
+        return
+
+    controllers = {
+        'PID': lambda: PIDController(Kp=2.0, Ki=1.0, Kd=0.05, dt=dt, windup_limit=0.5),
+        'OnOff': lambda: OnOffController(on_threshold=0.05, off_threshold=-0.05),
+    }
+    # Compile outside the timed runs
+    for make_controller in controllers.values():
+        run(make_controller, setpoint[:10], dt, fast=True)
+
+    print(f"{n_steps:,}-step closed-loop rollouts")
+    for name, make_controller in controllers.items():
+        interpreted, t_interp = run(make_controller, setpoint, dt, fast=False)
+        compiled, t_comp = run(make_controller, setpoint, dt, fast=True)
+        identical = all(np.array_equal(a, b) for a, b in zip(interpreted, compiled))
+        print(f"{name:<6} interpreted {t_interp:7.2f} s   compiled {t_comp:7.3f} s   "
+              f"speedup {t_interp / t_comp:6.0f}x   bit-identical: {identical}")
+
+if __name__ == "__main__":
+    main()
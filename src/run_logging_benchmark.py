@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+import time
+from functools import partial
+
+import numpy as np
+
+from controllers.pid_controller import PIDBank, PIDController
+from data.trajectory_log import TrajectoryLog, TrajectoryRecorder
+from run_lqg_benchmark import build_controller
+from simulation.closed_loop import simulate
+from simulation.plants import FirstOrderPlant
+
+def run_pid(n_steps, dt, recorder=None):
+    """
+    PID on a first-order plant, optionally logging t, setpoint, y, u and the
+    integral term every step.
+    """
+    pid = PIDController(Kp=2.0, Ki=1.0, Kd=0.1, dt=dt)
+    plant = FirstOrderPlant.euler(tau=1.0, gain=1.0, dt=dt)
+    setpoint = 1.0
+    start = time.perf_counter()
+    if recorder is None:
+        for k in range(n_steps):
+            u = pid.compute(setpoint, plant.y)
+            plant.step(u)
+    else:
+        record = recorder.record
+        for k in range(n_steps):
+            y = plant.y
+            u = pid.compute(setpoint, y)
+            plant.step(u)
+            record(k * dt, setpoint, y, u, pid.integral_term)
+    return time.perf_counter() - start
+
+def run_lqg(n_steps, dt, recorder=None):
+    """
+    LQG controller stepped on noisy measurements, optionally logging t, y, u
+    and the state estimate x_hat every step.
+    """
+    lqg = build_controller(dt, 'zoh')
+    measurements = np.random.default_rng(0).normal(size=n_steps).tolist()
+    u = np.zeros((1, 1))
+    start = time.perf_counter()
+    if recorder is None:
+        for y in measurements:
+            lqg.step_measurement(y, out=u)
+    else:
+        record = recorder.record
+        for k, y in enumerate(measurements):
+            lqg.step_measurement(y, out=u)
+            record(k * dt, y, u[0, 0], lqg.x_hat)
+    return time.perf_counter() - start
+
+def run_bank(n_steps, dt, recorder=None, n=64):
+    """
+    PIDBank stepping n loops at once, optionally logging t and the setpoint,
+    measurement, output and integral arrays of all loops every step.
+    """
+    pid = PIDBank(n, Kp=2.0, Ki=1.0, Kd=0.1, dt=dt)
+    plant = FirstOrderPlant.euler(tau=1.0, gain=1.0, dt=dt, y0=np.zeros(n))
+    setpoint = np.linspace(0.5, 1.5, n)
+    u = np.zeros(n)
+    start = time.perf_counter()
+    if recorder is None:
+        for k in range(n_steps):
+            pid.compute(setpoint, plant.y, out=u)
+            plant.step(u)
+    else:
+        record = recorder.record
+        for k in range(n_steps):
+            y = plant.y
+            pid.compute(setpoint, y, out=u)
+            plant.step(u)
+            record(k * dt, setpoint, y, u, pid.integral_term)
+    return time.perf_counter() - start
+
+def run_blocks(n_steps, dt, recorder=None, fast=True, block=10_000):
+    """
+    simulate() over consecutive blocks of the run, optionally logging each
+    block's t, setpoint, y, u and e with one record_many() call. fast=False
+    steps the PID in Python, fast=True takes simulate()'s compiled/vectorized
+    path.
+    """
+    pid = PIDController(Kp=2.0, Ki=1.0, Kd=0.1, dt=dt)
+    plant = FirstOrderPlant.euler(tau=1.0, gain=1.0, dt=dt)
+    setpoint = np.ones(block)
+    start = time.perf_counter()
+    for first in range(0, n_steps, block):
+        y, u, e = simulate(pid, plant, setpoint, fast=fast)
+        if recorder is not None:
+            recorder.record_many(t=(first + np.arange(block)) * dt, setpoint=setpoint,
+                                 y=y, u=u, e=e)
+    return time.perf_counter() - start
+
+def main():
+    dt = 0.01
+    n_steps = 500_000
+    # Block logging should add at most this fraction to the cost of a step.
+    # Per-row record() pays a Python call per row and is shown for reference.
+    bound = 0.15
+
+    scalars = {'t': (), 'setpoint': (), 'y': (), 'u': (), 'integral': ()}
+    bank = {'t': (), 'setpoint': (64,), 'y': (64,), 'u': (64,), 'integral': (64,)}
+    block = {'t': (), 'setpoint': (), 'y': (), 'u': (), 'e': ()}
+    cases = (('pid', 'record', run_pid, scalars),
+             ('lqg', 'record', run_lqg, {'t': (), 'y': (), 'u': (), 'x_hat': (2, 1)}),
+             ('bank64', 'record', run_bank, bank),
+             ('pid', 'block', partial(run_blocks, fast=False), block),
+             ('kernel', 'block', run_blocks, block))
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"{'loop':<8}{'logging':<9}{'step us':>9}{'logged us':>11}{'log us/row':>12}"
+              f"{'overhead':>10}  within {bound:.0%}")
+        for label, mode, run, columns in cases:
+            # Alternate bare and logged runs and keep the best of each, so drift
+            # and one-off costs (compilation, page faults) drop out
+            bare, logged = [], []
+            for repeat in range(3):
+                bare.append(run(n_steps, dt))
+                path = os.path.join(root, f"{label}-{mode}{repeat}")
+                with TrajectoryRecorder(path, columns) as recorder:
+                    logged.append(run(n_steps, dt, recorder))
+                if repeat:
+                    shutil.rmtree(path)
+            bare, logged = min(bare), min(logged)
+            overhead = (logged - bare) / bare
+            within = '-' if mode == 'record' else 'yes' if overhead <= bound else 'no'
+            print(f"{label:<8}{mode:<9}{bare / n_steps * 1e6:>9.2f}{logged / n_steps * 1e6:>11.2f}"
+                  f"{(logged - bare) / n_steps * 1e6:>12.2f}{overhead:>10.0%}  {within}")
+
+        # Reading back a 1 s window only maps the pages it touches
+        log = TrajectoryLog(os.path.join(root, 'pid-record0'))
+        start = time.perf_counter()
+        window = log.window(2500.0, 2501.0)
+        elapsed = time.perf_counter() - start
+        print(f"\n{len(log):,} rows on disk; window(2500, 2501) returned {len(window['t'])} rows "
+              f"in {elapsed * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    main()
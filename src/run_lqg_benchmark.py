@@ -0,0 +1,83 @@
+import time
+import tracemalloc
+
+import numpy as np
+import control as ctrl
+
+from controllers.lqg_controller import LQGController
+
+def build_controller(dt, discretization):
+    A = np.array([[0.0, 1.0],
+                  [-1.0, -0.2]])
+    B = np.array([[0.0],
+                  [1.0]])
+    C = np.array([[1.0, 0.0]])
+    K, _, _ = ctrl.lqr(A, B, np.diag([10.0, 1.0]), np.array([[0.1]]))
+    L, _, _ = ctrl.lqe(A, np.eye(2), C, np.diag([0.1, 0.1]), np.array([[0.01]]))
+    return LQGController(A, B, C, K, L, dt, discretization=discretization)
+
+def measure(lqg, measurements, out):
+    """
+    Return per-step latencies (ns) and the tracemalloc allocation profile of a
+    run of lqg.step_measurement() calls.
+    """
+    # Warm up so lazily created objects are not counted
+    for y in measurements[:100]:
+        lqg.step_measurement(y, out=out)
+
+    latencies = np.empty(len(measurements), dtype=np.int64)
+    clock = time.perf_counter_ns
+    for i, y in enumerate(measurements):
+        start = clock()
+        lqg.step_measurement(y, out=out)
+        latencies[i] = clock() - start
+
+    # Allocation profile on a separate pass (tracing slows the calls down):
+    # the largest transient allocation seen inside a single step (minus the
+    # harness's own overhead, measured with a no-op), and the number of memory
+    # blocks still held by lqg_controller.py afterwards.
+    n_alloc = 1000
+    sample = measurements[:n_alloc]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peak = (_peak_step_bytes(lqg.step_measurement, sample, out)
+            - _peak_step_bytes(_noop, sample, out))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'lineno')
+    net_blocks = sum(s.count_diff for s in stats if 'lqg_controller' in s.traceback[0].filename)
+    return latencies, peak, net_blocks / n_alloc
+
+def _noop(y, out=None):
+    return out
+
+def _peak_step_bytes(step, sample, out):
+    """
+    Largest traced allocation made during any single step(y, out=out) call.
+    """
+    peak = 0
+    for y in sample:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step(y, out=out)
+        _, step_peak = tracemalloc.get_traced_memory()
+        peak = max(peak, step_peak - current)
+    return peak
+
+def main():
+    n_steps = 50_000
+    rng = np.random.default_rng(0)
+    measurements = [rng.normal(size=(1, 1)) for _ in range(n_steps)]
+
+    print(f"{'mode':<22}{'p50 ns':>10}{'p99 ns':>10}{'peak bytes/step':>17}{'net blocks/step':>17}")
+    for discretization in ('euler', 'zoh'):
+        for in_place in (False, True):
+            lqg = build_controller(0.01, discretization)
+            out = np.zeros((1, 1)) if in_place else None
+            latencies, peak, blocks = measure(lqg, measurements, out)
+            label = f"{discretization} {'in-place' if in_place else 'allocating'}"
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{label:<22}{p50:>10.0f}{p99:>10.0f}{peak:>17d}{blocks:>17.2f}")
+
+if __name__ == "__main__":
+    main()
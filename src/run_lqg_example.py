@@ -2,7 +2,7 @@ import numpy as np
 import control as ctrl
 import matplotlib.pyplot as plt
 
-from controllers.lqg_controller import LQGController
+from controllers.lqg_controller import LQGController, servo_lqr_gains
 
 def main():
     # 1. Define the continuous-time plant:
@@ -33,8 +33,11 @@ def main():
     #    Suppose we want to penalize position heavily, velocity moderately, and control effort lightly.
     Q = np.diag([10.0, 1.0])  # state cost
     R = np.array([[0.1]])     # input cost
-    K_lqr, S, E = ctrl.lqr(A, B, Q, R)
-    # Note python-control returns K that is row vector if single input
+    # To track a non-zero position reference we add integral action: the LQR
+    # problem is solved for the system augmented with xi_dot = r - y, weighting
+    # the integrator state with Qi.
+    Qi = np.array([[20.0]])
+    K_lqr, K_i = servo_lqr_gains(A, B, C, Q, R, Qi)
 
     # 3. Design Kalman filter gain L (continuous-time LQE)
     #    We define process noise covariance Qn and measurement noise covariance Rn
@@ -49,6 +52,7 @@ def main():
     #    We'll do a discrete simulation with dt=0.01 for demonstration.
     dt = 0.01
     lqg = LQGController(A, B, C, K_lqr, L_kf, dt)
+    lqg.enable_servo(K_i)  # u = -K x_hat - Ki xi + Nbar r
 
     # 5. Simulate the closed-loop system with process and measurement noise in a loop
     t_final = 10.0
@@ -60,6 +64,9 @@ def main():
     y_data = np.zeros(len(t_vec))
     u_data = np.zeros(len(t_vec))
 
+    # Position reference: hold at 0, then step to 1 at t = 3 s
+    r_data = np.where(t_vec >= 3.0, 1.0, 0.0)
+
     # Initialize x and x_hat
     x = np.array([[0.5],  # initial position
                   [0.0]]) # initial velocity
@@ -71,16 +78,15 @@ def main():
 
     rng = np.random.default_rng(42)  # for reproducibility
 
-    # Let's assume a reference of 0 (we want to keep position near 0).
-    # If you want to track a non-zero reference, you can augment the system or do integrator approach.
-
     for i, t in enumerate(t_vec):
         # measure y with noise
         y = C @ x + v_std*rng.normal(size=(1,1))
-        y_data[i] = y.ravel()
+        y_data[i] = y[0,0]
+
+        lqg.set_reference(r_data[i])
 
         # LQG step: get control based on the measurement
-        u = lqg.step(y)
+        u = lqg.step_measurement(y)
         u_data[i] = u[0,0]
 
         # store current states
@@ -99,6 +105,7 @@ def main():
     plt.subplot(3,1,1)
     plt.plot(t_vec, x_data[:,0], label='True Pos')
     plt.plot(t_vec, x_hat_data[:,0], '--', label='Est Pos')
+    plt.plot(t_vec, r_data, 'k:', label='Reference')
     plt.ylabel("Position")
     plt.legend()
 
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+
+from controllers.pid_controller import PIDController
+from controllers.pi_controller import PIController
+from controllers.gain_scheduling_controller import GainSchedulingPID
+
+class LegacyPIDController:
+    """
+    The previous PIDController step (np.clip on a Python float), kept here
+    as the 'before' reference for the benchmark.
+    """
+    def __init__(self, Kp=1.0, Ki=0.0, Kd=0.0, dt=0.01, windup_limit=1e6):
+        self.Kp = Kp
+        self.Ki = Ki
+        self.Kd = Kd
+        self.dt = dt
+        self.windup_limit = windup_limit
+
+        self.integral_term = 0.0
+        self.prev_error = 0.0
+
+    def compute(self, setpoint, measured_value):
+        error = setpoint - measured_value
+        P_out = self.Kp * error
+        self.integral_term += error * self.dt
+        self.integral_term = np.clip(self.integral_term, -self.windup_limit, self.windup_limit)
+        I_out = self.Ki * self.integral_term
+        derivative = (error - self.prev_error) / self.dt
+        D_out = self.Kd * derivative
+        self.prev_error = error
+        return P_out + I_out + D_out
+
+def calls_per_second(compute, setpoints, measurements, *args):
+    """
+    Time a tight loop of compute() calls and return calls per second.
+    """
+    start = time.perf_counter()
+    for sp, m in zip(setpoints, measurements):
+        compute(sp, m, *args)
+    elapsed = time.perf_counter() - start
+    return len(setpoints) / elapsed
+
+def main():
+    n_calls = 200_000
+    rng = np.random.default_rng(0)
+    # Python floats, as a soft-PLC would feed them
+    setpoints = rng.normal(size=n_calls).tolist()
+    measurements = rng.normal(size=n_calls).tolist()
+
+    legacy = LegacyPIDController(Kp=2.0, Ki=1.0, Kd=0.5, windup_limit=0.5)
+    pid = PIDController(Kp=2.0, Ki=1.0, Kd=0.5, windup_limit=0.5)
+    pi = PIController(Kp=2.0, Ki=1.0, windup_limit=0.5)
+    gs = GainSchedulingPID(windup_limit=0.5)
+    gs.add_gain_point(0.0, 2.0, 1.0, 0.5)
+    gs.add_gain_point(1.0, 1.0, 0.5, 0.1)
+
+    before = calls_per_second(legacy.compute, setpoints, measurements)
+    after = calls_per_second(pid.compute, setpoints, measurements)
+    pi_rate = calls_per_second(pi.compute, setpoints, measurements)
+    gs_rate = calls_per_second(gs.compute, setpoints, measurements, 0.5)
+
+    print(f"{'controller':<28}{'calls/s':>14}")
+    print(f"{'PID (before, np.clip)':<28}{before:>14,.0f}")
+    print(f"{'PID (after, PIDCore)':<28}{after:>14,.0f}")
+    print(f"{'PI (PIDCore)':<28}{pi_rate:>14,.0f}")
+    print(f"{'GainSchedulingPID (PIDCore)':<28}{gs_rate:>14,.0f}")
+    print(f"PID speedup: {after / before:.1f}x")
+
+    # Sanity check: both implementations produce the same numbers
+    legacy = LegacyPIDController(Kp=2.0, Ki=1.0, Kd=0.5, windup_limit=0.5)
+    pid = PIDController(Kp=2.0, Ki=1.0, Kd=0.5, windup_limit=0.5)
+    for sp, m in zip(setpoints[:1000], measurements[:1000]):
+        assert legacy.compute(sp, m) == pid.compute(sp, m)
+
+if __name__ == "__main__":
+    main()
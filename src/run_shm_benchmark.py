@@ -0,0 +1,84 @@
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+from controllers.pid_controller import PIDBank
+from runtime.shared_memory_channel import LoopChannel
+from simulation.plants import FirstOrderPlant
+
+def plant_process(spec, n_steps, dt):
+    """
+    Plant side: publish (setpoint, measurement) for every loop, wait for the
+    control outputs and advance the plants.
+    """
+    channel = LoopChannel.attach(spec)
+    n = channel.n
+    plant = FirstOrderPlant.euler(tau=1.0, gain=1.0, dt=dt, y0=np.zeros(n))
+    setpoints = np.linspace(0.5, 1.5, n)
+    for _ in range(n_steps):
+        setpoint, measurement = channel.measurements.claim()
+        setpoint[:] = setpoints
+        measurement[:] = plant.y
+        channel.measurements.publish()
+
+        (u,) = channel.outputs.peek()
+        plant.step(u)
+        channel.outputs.release()
+    channel.close()
+
+def controller_loop(channel, n_steps, dt):
+    """
+    Controller side: one PIDBank step per record, reading and writing the
+    shared buffers in place.
+    """
+    pid = PIDBank(channel.n, Kp=2.0, Ki=1.0, Kd=0.0, dt=dt)
+    for _ in range(n_steps):
+        setpoint, measurement = channel.measurements.peek()
+        (u,) = channel.outputs.claim()
+        pid.compute(setpoint, measurement, out=u)
+        channel.measurements.release()
+        channel.outputs.publish()
+
+def pipe_plant_process(conn, n, n_steps, dt):
+    plant = FirstOrderPlant.euler(tau=1.0, gain=1.0, dt=dt, y0=np.zeros(n))
+    setpoints = np.linspace(0.5, 1.5, n)
+    for _ in range(n_steps):
+        conn.send((setpoints, plant.y))
+        plant.step(conn.recv())
+
+def run_shared_memory(n, n_steps, dt):
+    channel = LoopChannel(n, capacity=8)
+    proc = mp.Process(target=plant_process, args=(channel.spec(), n_steps, dt))
+    proc.start()
+    start = time.perf_counter()
+    controller_loop(channel, n_steps, dt)
+    proc.join()
+    elapsed = time.perf_counter() - start
+    channel.close()
+    channel.unlink()
+    return elapsed
+
+def run_pipe(n, n_steps, dt):
+    parent, child = mp.Pipe()
+    proc = mp.Process(target=pipe_plant_process, args=(child, n, n_steps, dt))
+    proc.start()
+    pid = PIDBank(n, Kp=2.0, Ki=1.0, Kd=0.0, dt=dt)
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        setpoint, measurement = parent.recv()
+        parent.send(pid.compute(setpoint, measurement))
+    proc.join()
+    return time.perf_counter() - start
+
+def main():
+    dt = 0.01
+    n_steps = 20_000
+    print(f"{'loops':>7}{'pipe updates/s':>18}{'shm updates/s':>18}")
+    for n in (1, 16, 256):
+        t_pipe = run_pipe(n, n_steps, dt)
+        t_shm = run_shared_memory(n, n_steps, dt)
+        print(f"{n:>7}{n * n_steps / t_pipe:>18,.0f}{n * n_steps / t_shm:>18,.0f}")
+
+if __name__ == "__main__":
+    main()
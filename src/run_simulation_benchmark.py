@@ -0,0 +1,29 @@
+import time
+
+import numpy as np
+
+from data.synthetic_data import SyntheticDataGenerator
+from controllers.pid_controller import PIDController
+from simulation.closed_loop import simulate
+from simulation.plants import FirstOrderPlant
+
+def main():
+    dt = 0.01
+    gen = SyntheticDataGenerator(seed=42)
+    t, setpoint = gen.step_data(step_time=2.0, total_time=10000.0, dt=dt, amplitude=1.0)
+
+    results = {}
+    for fast in (False, True):
+        pid = PIDController(Kp=2.0, Ki=1.0, Kd=0.5, dt=dt)
+        plant = FirstOrderPlant.euler(tau=1.0, gain=1.0, dt=dt)
+        start = time.perf_counter()
+        results[fast] = simulate(pid, plant, setpoint, fast=fast)
+        elapsed = time.perf_counter() - start
+        label = 'vectorized' if fast else 'interpreted'
+        print(f"{label:<12} {len(t):,} steps in {elapsed:.3f} s ({len(t) / elapsed:,.0f} steps/s)")
+
+    max_diff = max(np.max(np.abs(a - b)) for a, b in zip(results[True], results[False]))
+    print(f"max |vectorized - interpreted| = {max_diff:.2e}")
+
+if __name__ == "__main__":
+    main()
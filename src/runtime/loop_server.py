@@ -0,0 +1,329 @@
+import asyncio
+import inspect
+import time
+from bisect import bisect_right
+
+class LatencyHistogram:
+    """
+    Fixed log-spaced histogram of durations in nanoseconds.
+
+    Buckets are precomputed (buckets_per_decade per factor of ten between
+    min_ns and max_ns), so recording is one bisect and an increment, and
+    percentiles are read from the cumulative counts with a resolution of one
+    bucket (about 12% at 20 buckets per decade).
+    """
+
+    def __init__(self, min_ns=1_000, max_ns=10_000_000_000, buckets_per_decade=20):
+        """
+        :param min_ns: Upper edge of the first bucket
+        :param max_ns: Values above this land in an overflow bucket
+        :param buckets_per_decade: Resolution
+        """
+        edges = []
+        edge = float(min_ns)
+        factor = 10.0 ** (1.0 / buckets_per_decade)
+        while edge < max_ns:
+            edges.append(int(edge))
+            edge *= factor
+        edges.append(int(max_ns))
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns):
+        self.counts[bisect_right(self.edges, ns)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def merge(self, other):
+        """
+        Add the counts of another histogram with the same buckets.
+        """
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, p):
+        """
+        Upper bucket edge below which p percent of the recorded values fall
+        (capped at the largest value recorded).
+        """
+        if not self.count:
+            return 0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                return min(self.edges[i], self.max_ns) if i < len(self.edges) else self.max_ns
+        return self.max_ns
+
+    def mean(self):
+        return self.total_ns / self.count if self.count else 0.0
+
+class SimulatedPlant:
+    """
+    In-process stand-in for real I/O: one plant (e.g. FirstOrderPlant) that
+    acts as both the measurement source and the output sink of a loop.
+    Each write applies the control output and advances the plant one sample.
+    """
+
+    def __init__(self, plant, setpoint):
+        """
+        :param plant: Plant with step(u) and an output attribute y
+        :param setpoint: Setpoint reported with every measurement (a value or a
+                         callable setpoint(t))
+        """
+        self.plant = plant
+        self.setpoint = setpoint
+
+    def read(self, t):
+        setpoint = self.setpoint(t) if callable(self.setpoint) else self.setpoint
+        return setpoint, self.plant.y
+
+    def write(self, u, t):
+        self.plant.step(u)
+
+class DelayedSimulatedPlant(SimulatedPlant):
+    """
+    SimulatedPlant behind asynchronous I/O that takes io_delay seconds per
+    read and write, emulating a field bus.
+    """
+
+    def __init__(self, plant, setpoint, io_delay=0.001):
+        super().__init__(plant, setpoint)
+        self.io_delay = io_delay
+
+    async def read(self, t):
+        await asyncio.sleep(self.io_delay)
+        return super().read(t)
+
+    async def write(self, u, t):
+        await asyncio.sleep(self.io_delay)
+        super().write(u, t)
+
+class ControlLoop:
+    """
+    One hosted controller: its source, sink, period and timing statistics.
+
+      jitter   = actual start - scheduled tick time
+      latency  = output published - scheduled tick time
+      compute  = time spent in controller.compute()
+    A tick whose output is published after tick time + deadline is a deadline
+    miss; ticks skipped because the loop fell a whole period behind also
+    count as misses.
+    """
+
+    def __init__(self, name, controller, period, source, sink, deadline):
+        self.name = name
+        self.controller = controller
+        self.period = period
+        self.deadline_ns = int(deadline * 1e9)
+        self.source = source
+        self.sink = sink
+        self._read = source.read if hasattr(source, 'read') else source
+        self._read_async = inspect.iscoroutinefunction(self._read)
+        self._write = None
+        self._write_async = False
+        if sink is not None:
+            self._write = sink.write if hasattr(sink, 'write') else sink
+            self._write_async = inspect.iscoroutinefunction(self._write)
+        self.is_async = self._read_async or self._write_async
+
+        self.ticks = 0
+        self.deadline_misses = 0
+        self.skipped_ticks = 0
+        self.last_output = None
+        self.jitter = LatencyHistogram()
+        self.latency = LatencyHistogram()
+        self.compute_time = LatencyHistogram()
+
+    async def tick(self, t, scheduled, clock):
+        """
+        Read, compute and publish once for the tick scheduled at the given
+        monotonic time (ns); t is the tick time in seconds since start.
+        """
+        now = clock()
+        self.jitter.record(max(now - scheduled, 0))
+        if self._read_async:
+            setpoint, measurement = await self._read(t)
+        else:
+            setpoint, measurement = self._read(t)
+        start = clock()
+        u = self.controller.compute(setpoint, measurement)
+        self.compute_time.record(clock() - start)
+        if self._write_async:
+            await self._write(u, t)
+        elif self._write is not None:
+            self._write(u, t)
+        self.last_output = u
+
+        done = clock()
+        self.latency.record(done - scheduled)
+        if done - scheduled > self.deadline_ns:
+            self.deadline_misses += 1
+        self.ticks += 1
+
+    def skip(self, missed):
+        self.skipped_ticks += missed
+        self.deadline_misses += missed
+
+async def _run_rate(loops, period, t0_ns, stop, wake_early):
+    """
+    Tick every loop of one period at t0 + k*period on the monotonic clock
+    until stop is set. Tick times are computed from k rather than by adding
+    periods, so they do not drift. One task serves all loops of the period,
+    which avoids a task wake-up per loop: loops with synchronous sources and
+    sinks are ticked inline, and the ticks of loops with asynchronous I/O run
+    concurrently (asyncio.gather) so their I/O waits overlap.
+
+    asyncio timers fire up to about a millisecond late (the selector timeout
+    is rounded to whole milliseconds). With wake_early > 0 the task wakes that
+    many seconds before the tick and yields to the event loop until it is
+    due, trading CPU time for lower jitter.
+    """
+    clock = time.monotonic_ns
+    sync_loops = [loop for loop in loops if not loop.is_async]
+    async_loops = [loop for loop in loops if loop.is_async]
+    period_ns = int(period * 1e9)
+    early_ns = int(wake_early * 1e9)
+    k = 0
+    while not stop.is_set():
+        scheduled = t0_ns + k * period_ns
+        now = clock()
+        if now < scheduled:
+            if scheduled - now > early_ns:
+                await asyncio.sleep((scheduled - now - early_ns) / 1e9)
+            while clock() < scheduled:
+                await asyncio.sleep(0)
+        elif now - scheduled >= period_ns:
+            # A whole period late: drop the missed ticks and keep the phase
+            missed = (now - scheduled) // period_ns
+            for loop in loops:
+                loop.skip(missed)
+            k += missed
+            continue
+        t = (scheduled - t0_ns) / 1e9
+        pending = None
+        if async_loops:
+            # Start the I/O-bound ticks first so they wait while the rest compute
+            pending = asyncio.gather(*(loop.tick(t, scheduled, clock) for loop in async_loops))
+        for loop in sync_loops:
+            await loop.tick(t, scheduled, clock)
+        if pending is not None:
+            await pending
+        k += 1
+
+class LoopServer:
+    """
+    asyncio host for many control loops in one process.
+
+    Each registered controller (anything with compute(setpoint, measurement))
+    runs on a drift-free monotonic tick; loops sharing a period are served by
+    one task, in registration order. Measurements come from a pluggable
+    source, an object with read(t) -> (setpoint, measurement) or a callable;
+    outputs go to a sink with write(u, t) or a callable. Both may be
+    coroutine functions (real I/O) or plain functions, which are called
+    without going through the event loop. SimulatedPlant provides both
+    in-process; DelayedSimulatedPlant adds asynchronous I/O latency.
+
+    All loops share one start time, so loops with commensurate periods tick
+    in phase.
+    """
+
+    def __init__(self, wake_early=0.0):
+        """
+        :param wake_early: Seconds to wake before each tick and yield until it
+                           is due, to reduce timer jitter (costs CPU)
+        """
+        self.wake_early = wake_early
+        self.loops = []
+        self._stop = None
+
+    def register(self, controller, period, source, sink=None, deadline=None, name=None):
+        """
+        :param controller: Controller with compute(setpoint, measurement)
+        :param period: Sample period in seconds
+        :param source: Measurement source (see class docstring)
+        :param sink: Optional output sink
+        :param deadline: Seconds after each tick by which the output must be
+                         published (defaults to the period)
+        :param name: Loop label (defaults to loop<index>)
+        :return: The ControlLoop
+        """
+        if name is None:
+            name = f"loop{len(self.loops)}"
+        loop = ControlLoop(name, controller, period, source, sink,
+                           period if deadline is None else deadline)
+        self.loops.append(loop)
+        return loop
+
+    async def run(self, duration=None):
+        """
+        Run every loop until stop() is called or duration seconds have passed.
+        An exception raised by a controller, source or sink stops the server
+        and is re-raised here.
+        """
+        self._stop = asyncio.Event()
+        t0 = time.monotonic_ns()
+        by_period = {}
+        for loop in self.loops:
+            by_period.setdefault(loop.period, []).append(loop)
+        tasks = [asyncio.create_task(_run_rate(loops, period, t0, self._stop, self.wake_early))
+                 for period, loops in by_period.items()]
+        stopped = asyncio.create_task(self._stop.wait())
+        try:
+            # A rate task only finishes before the stop event by raising
+            await asyncio.wait(tasks + [stopped], timeout=duration,
+                               return_when=asyncio.FIRST_COMPLETED)
+            self._stop.set()
+            await asyncio.gather(*tasks)
+        finally:
+            stopped.cancel()
+            for task in tasks:
+                task.cancel()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    def histograms(self):
+        """
+        :return: Server-wide (jitter, latency, compute) histograms
+        """
+        merged = (LatencyHistogram(), LatencyHistogram(), LatencyHistogram())
+        for loop in self.loops:
+            for total, hist in zip(merged, (loop.jitter, loop.latency, loop.compute_time)):
+                total.merge(hist)
+        return merged
+
+    def stats(self):
+        """
+        :return: Dict with ticks, deadline misses, skipped ticks and p50/p99/max
+                 (microseconds) of jitter, latency and compute time over all loops
+        """
+        stats = dict(loops=len(self.loops),
+                     ticks=sum(loop.ticks for loop in self.loops),
+                     deadline_misses=sum(loop.deadline_misses for loop in self.loops),
+                     skipped_ticks=sum(loop.skipped_ticks for loop in self.loops))
+        for label, hist in zip(('jitter', 'latency', 'compute'), self.histograms()):
+            stats[label] = dict(p50_us=hist.percentile(50) / 1e3,
+                                p99_us=hist.percentile(99) / 1e3,
+                                max_us=hist.max_ns / 1e3)
+        return stats
+
+    def report(self):
+        s = self.stats()
+        lines = [f"{s['loops']} loops, {s['ticks']} ticks, {s['deadline_misses']} deadline misses "
+                 f"({s['skipped_ticks']} skipped ticks)",
+                 f"{'':<10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+        for label in ('jitter', 'latency', 'compute'):
+            h = s[label]
+            lines.append(f"{label:<10}{h['p50_us']:>10.1f}{h['p99_us']:>10.1f}{h['max_us']:>10.1f}")
+        return "\n".join(lines)
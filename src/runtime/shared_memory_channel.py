@@ -0,0 +1,223 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Header layout (uint64 words). The producer's and consumer's counters sit on
+# separate 64-byte cache lines so the two processes do not contend for one line.
+_WRITE = 0
+_READ = 8
+_HEADER_BYTES = 128
+
+class ShmRing:
+    """
+    Single-producer/single-consumer ring buffer of fixed-layout records in
+    shared memory (multiprocessing.shared_memory).
+
+    Each record holds a sequence number and one float64 array of length n per
+    field (e.g. setpoint and measurement for n loops). Records are written
+    and read in place through NumPy views of the shared buffer, so nothing is
+    pickled or copied on the way:
+
+      producer: views = ring.claim(); fill views; ring.publish()
+      consumer: views = ring.peek();  use views;  ring.release()
+
+    The producer only advances the write counter and the consumer only the
+    read counter, so no lock is needed. A record is published by storing its
+    sequence number (1, 2, 3, ...) after its data and then bumping the write
+    counter; the consumer checks the sequence number before using a record.
+    This relies on aligned 8-byte stores becoming visible in program order,
+    which holds on x86-64 (and in practice for NumPy stores on ARM64 between
+    processes that synchronize on these counters).
+
+    Create the ring in one process, pass ring.spec() (a small dict) to the
+    other and call ShmRing.attach(spec) there. The creating process should
+    call unlink() when done.
+    """
+
+    def __init__(self, n, fields, capacity=64, name=None, _create=True):
+        """
+        :param n: Length of each field array (e.g. number of loops)
+        :param fields: Field names, e.g. ('setpoint', 'measurement')
+        :param capacity: Number of records in the ring
+        :param name: Shared memory block name (generated if None)
+        """
+        self.n = n
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        # Pad each record to whole cache lines
+        self.dtype = np.dtype([('seq', np.uint64)] + [(f, np.float64, (n,)) for f in self.fields],
+                              align=True)
+        self.record_bytes = -(-self.dtype.itemsize // 64) * 64
+        record = np.dtype({'names': self.dtype.names,
+                           'formats': [self.dtype.fields[f][0] for f in self.dtype.names],
+                           'offsets': [self.dtype.fields[f][1] for f in self.dtype.names],
+                           'itemsize': self.record_bytes})
+        size = _HEADER_BYTES + capacity * self.record_bytes
+        self.shm = shared_memory.SharedMemory(name=name, create=_create, size=size)
+        self.name = self.shm.name
+
+        self._header = np.ndarray((_HEADER_BYTES // 8,), dtype=np.uint64, buffer=self.shm.buf)
+        self.records = np.ndarray((capacity,), dtype=record, buffer=self.shm.buf,
+                                  offset=_HEADER_BYTES)
+        if _create:
+            self._header[:] = 0
+            self.records['seq'] = 0
+
+        # Per-slot views, built once so claim()/peek() do not create arrays
+        columns = [self.records[f] for f in self.fields]
+        self._views = [tuple(column[i] for column in columns) for i in range(capacity)]
+        self._seq = self.records['seq']
+
+        # Counters owned by this side, mirrored into the header on publish/release
+        self._write = int(self._header[_WRITE])
+        self._read = int(self._header[_READ])
+
+    def spec(self):
+        """
+        Everything another process needs to attach to this ring.
+        """
+        return dict(name=self.name, n=self.n, fields=self.fields, capacity=self.capacity)
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['n'], spec['fields'], spec['capacity'], name=spec['name'], _create=False)
+
+    def __len__(self):
+        """ Number of published records not yet released. """
+        return int(self._header[_WRITE]) - int(self._header[_READ])
+
+    # Producer side
+
+    def try_claim(self):
+        """
+        Views of the next free record, or None if the ring is full.
+        """
+        if self._write - int(self._header[_READ]) >= self.capacity:
+            return None
+        return self._views[self._write % self.capacity]
+
+    def claim(self, timeout=None):
+        """
+        Like try_claim(), waiting for space.
+        :raises TimeoutError: if no record frees up within timeout seconds
+        """
+        return _wait(self.try_claim, timeout)
+
+    def publish(self):
+        """
+        Make the claimed record visible to the consumer.
+        """
+        self._write += 1
+        self._seq[(self._write - 1) % self.capacity] = self._write
+        self._header[_WRITE] = self._write
+
+    def put(self, *arrays, timeout=None):
+        """
+        Copy one array per field into the next record and publish it.
+        """
+        views = self.claim(timeout)
+        for view, values in zip(views, arrays):
+            view[:] = values
+        self.publish()
+
+    # Consumer side
+
+    def try_peek(self):
+        """
+        Views of the oldest unreleased record, or None if the ring is empty.
+        """
+        if int(self._header[_WRITE]) == self._read:
+            return None
+        slot = self._read % self.capacity
+        if self._seq[slot] != self._read + 1:
+            # Counter visible before the data; treat as not yet published
+            return None
+        return self._views[slot]
+
+    def peek(self, timeout=None):
+        """
+        Like try_peek(), waiting for a record.
+        :raises TimeoutError: if nothing arrives within timeout seconds
+        """
+        return _wait(self.try_peek, timeout)
+
+    def release(self):
+        """
+        Hand the peeked record back to the producer.
+        """
+        self._read += 1
+        self._header[_READ] = self._read
+
+    def get(self, timeout=None):
+        """
+        Copy out the oldest record as a tuple of arrays and release it.
+        """
+        views = self.peek(timeout)
+        values = tuple(view.copy() for view in views)
+        self.release()
+        return values
+
+    @property
+    def sequence(self):
+        """ Sequence number of the last record released by this consumer. """
+        return self._read
+
+    def close(self):
+        # Drop the views before closing, or the buffer stays exported
+        self._views = self._seq = self._header = self.records = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+def _wait(try_once, timeout):
+    """
+    Spin on try_once() (yielding the CPU between attempts) until it returns
+    something other than None.
+    """
+    result = try_once()
+    if result is not None:
+        return result
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        time.sleep(0)
+        result = try_once()
+        if result is not None:
+            return result
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError("shared memory ring did not become ready")
+
+class LoopChannel:
+    """
+    Bidirectional link between a plant (or I/O) process and a controller
+    process for n loops: one ShmRing carries (setpoint, measurement) to the
+    controllers and another carries the control outputs back.
+    """
+
+    def __init__(self, n, capacity=64, _rings=None):
+        """
+        :param n: Number of loops
+        :param capacity: Records per direction
+        """
+        if _rings is None:
+            _rings = (ShmRing(n, ('setpoint', 'measurement'), capacity),
+                      ShmRing(n, ('control',), capacity))
+        self.measurements, self.outputs = _rings
+        self.n = n
+
+    def spec(self):
+        return dict(n=self.n, measurements=self.measurements.spec(), outputs=self.outputs.spec())
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['n'], _rings=(ShmRing.attach(spec['measurements']),
+                                      ShmRing.attach(spec['outputs'])))
+
+    def close(self):
+        self.measurements.close()
+        self.outputs.close()
+
+    def unlink(self):
+        self.measurements.unlink()
+        self.outputs.unlink()
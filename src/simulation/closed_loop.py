@@ -0,0 +1,231 @@
+import numpy as np
+from scipy import signal
+
+from controllers.p_controller import PController
+from controllers.pd_controller import PDController
+from controllers.pi_controller import PIController
+from controllers.pid_controller import PIDController
+from controllers.deadbeat_controller import DeadbeatController
+from controllers.feedforward_controller import FeedForwardController
+from controllers.gain_scheduling_controller import GainSchedulingPID
+from controllers.cascade_controller import InnerPID, OuterPID
+from simulation.plants import FirstOrderPlant
+from simulation.kernels import HAVE_COMPILED, run_compiled, _cascade_loop
+
+def _linear_coefficients(controller):
+    """
+    Describe a linear controller as
+      u[k] = kr*r[k] + ke*e[k] + ki*I[k] + kd*(e[k] - e[k-1]) + ky*y[k-1]
+      I[k] = I[k-1] + dt*e[k]
+    Returns a dict of coefficients, or None if the controller has no linear form.
+    Only exact types are matched so subclasses overriding compute() take the
+    interpreted path.
+    """
+    kind = type(controller)
+    if kind is PController:
+        return dict(kr=0.0, ke=controller.Kp, ki=0.0, kd=0.0, ky=0.0, dt=0.0)
+    if kind is PDController:
+        return dict(kr=0.0, ke=controller.Kp, ki=0.0, kd=controller.Kd / controller.dt,
+                    ky=0.0, dt=0.0)
+    if kind is PIController:
+        return dict(kr=0.0, ke=controller.Kp, ki=controller.Ki, kd=0.0, ky=0.0,
+                    dt=controller.dt)
+    if kind is PIDController:
+        return dict(kr=0.0, ke=controller.Kp, ki=controller.Ki,
+                    kd=controller.Kd / controller.dt, ky=0.0, dt=controller.dt)
+    if kind is DeadbeatController:
+        return dict(kr=1.0 / controller.b, ke=0.0, ki=0.0, kd=0.0,
+                    ky=-controller.a / controller.b, dt=0.0)
+    if kind is FeedForwardController and not callable(controller.ff_gain):
+        coeffs = _linear_coefficients(controller.pid)
+        if coeffs is not None:
+            coeffs['kr'] += controller.ff_gain
+        return coeffs
+    return None
+
+def _loop_state(controller):
+    """
+    Return the (integral, previous error) state of a linear controller.
+    """
+    if type(controller) is FeedForwardController:
+        controller = controller.pid
+    integral = getattr(controller, 'integral_term', 0.0)
+    prev_error = getattr(controller, 'prev_error', 0.0)
+    return controller, integral, prev_error
+
+def _simulate_linear(coeffs, controller, plant, setpoint):
+    """
+    Closed-loop rollout of a linear controller and a FirstOrderPlant, evaluated
+    with scipy.signal.lfilter (compiled) instead of a Python loop.
+
+    With z[k] = [y[k-1], I[k-1], e[k-1]] the loop is the LTI system
+      z[k+1] = A z[k] + B r[k],   out[k] = C z[k] + D r[k]
+    for out = [y, I, e, u]. The initial state is applied as an impulse through
+    (A z0, C z0).
+    Returns None if the anti-windup clamp would have been active, in which case
+    the loop is not linear and the caller falls back to the interpreted path.
+    """
+    a, b = plant.a, plant.b
+    kr, ke, ki, kd, ky, dt = (coeffs[k] for k in ('kr', 'ke', 'ki', 'kd', 'ky', 'dt'))
+    inner, integral0, prev_error0 = _loop_state(controller)
+
+    # u[k] = Cu z[k] + Du r[k]
+    Cu = np.array([ky - ke - kd - ki * dt, ki, -kd])
+    Du = kr + ke + kd + ki * dt
+    A = np.array([
+        b * Cu + np.array([a, 0.0, 0.0]),
+        [-dt, 1.0, 0.0],
+        [-1.0, 0.0, 0.0],
+    ])
+    B = np.array([b * Du, dt, 1.0])
+    C = np.vstack([A, Cu])
+    D = np.array([B[0], B[1], B[2], Du])
+    z0 = np.array([plant.y, integral0, prev_error0])
+
+    r = np.asarray(setpoint, dtype=float)[1:]
+    impulse = np.zeros_like(r)
+    impulse[0] = 1.0
+    Az0 = A @ z0
+    Cz0 = C @ z0
+
+    outputs = np.empty((4, len(r)))
+    for row in range(4):
+        num, den = signal.ss2tf(A, B[:, None], C[row:row + 1], D[row:row + 1, None])
+        outputs[row] = signal.lfilter(num[0], den, r)
+        num, den = signal.ss2tf(A, Az0[:, None], C[row:row + 1], Cz0[row:row + 1, None])
+        outputs[row] += signal.lfilter(num[0], den, impulse)
+
+    y, integral, error, u = outputs
+    limit = getattr(inner, 'windup_limit', np.inf)
+    has_integral = type(inner) in (PIController, PIDController)
+    if has_integral and len(r) and np.max(np.abs(integral)) > limit:
+        return None
+
+    # Leave controller and plant in the state the interpreted loop would
+    if len(r):
+        plant.y = y[-1]
+        if has_integral:
+            inner.integral_term = integral[-1]
+        if type(inner) in (PDController, PIController, PIDController):
+            inner.prev_error = error[-1]
+    return y, u, error
+
+def simulate(controller, plant, setpoint, sched_values=None, fast=True):
+    """
+    Run a closed loop over a whole setpoint trajectory.
+
+    At every sample k >= 1:
+      u[k] = controller.compute(setpoint[k], y[k-1])
+      y[k] = plant.step(u[k])
+    with y[0] the plant's current output and u[0] = 0.
+
+    With numba installed, P/PD/PI/PID/on-off/deadbeat controllers on a
+    FirstOrderPlant run in a compiled kernel (simulation.kernels) that is
+    bit-identical to the interpreted loop. Otherwise P/PI/PD/PID/deadbeat/
+    feed-forward controllers on a FirstOrderPlant take a vectorized path
+    (scipy.signal.lfilter) that agrees with the interpreted loop to rounding.
+    Anything else, or a PI/PID loop that hits its anti-windup limit, is
+    stepped in Python.
+
+    :param controller: Any controller with compute(setpoint, measurement)
+    :param plant: Plant with step(u) and an output attribute y, e.g. FirstOrderPlant
+    :param setpoint: Setpoint array, e.g. from SyntheticDataGenerator
+    :param sched_values: Scheduling variable per sample for GainSchedulingPID
+                         (defaults to the measurement)
+    :param fast: Set False to force the interpreted loop
+    :return: y (output), u (control), e (error) arrays, same length as setpoint
+    """
+    setpoint = np.asarray(setpoint, dtype=float)
+    n = len(setpoint)
+    y = np.empty(n)
+    u = np.empty(n)
+    e = np.empty(n)
+    if n == 0:
+        return y, u, e
+    y[0] = plant.y
+    u[0] = 0.0
+    e[0] = setpoint[0] - y[0]
+
+    if fast and type(plant) is FirstOrderPlant and sched_values is None:
+        if HAVE_COMPILED and run_compiled(controller, plant, setpoint, y, u, e):
+            return y, u, e
+        coeffs = _linear_coefficients(controller)
+        if coeffs is not None:
+            result = _simulate_linear(coeffs, controller, plant, setpoint)
+            if result is not None:
+                y[1:], u[1:], e[1:] = result
+                return y, u, e
+
+    compute = controller.compute
+    step = plant.step
+    y_prev = y[0]
+    sp = setpoint.tolist()
+    is_scheduled = isinstance(controller, GainSchedulingPID)
+    sched = None if sched_values is None else np.asarray(sched_values, dtype=float).tolist()
+    for k in range(1, n):
+        if is_scheduled:
+            u_k = compute(sp[k], y_prev, y_prev if sched is None else sched[k])
+        else:
+            u_k = compute(sp[k], y_prev)
+        e[k] = sp[k] - y_prev
+        u[k] = u_k
+        y_prev = step(u_k)
+        y[k] = y_prev
+    return y, u, e
+
+def simulate_cascade(outer, inner, flow_plant, temp_plant, setpoint, fast=True):
+    """
+    Run the cascade loop of run_cascade_example.py over a setpoint trajectory:
+      flow_sp[k] = outer.compute(setpoint[k], temp[k-1])
+      valve[k]   = inner.compute(flow_sp[k], flow[k-1])
+      flow[k]    = flow_plant.step(valve[k])
+      temp[k]    = temp_plant.step(flow[k-1])
+
+    With numba installed, OuterPID/InnerPID on FirstOrderPlants run in a
+    compiled kernel with bit-identical results.
+
+    :param outer: OuterPID (temperature loop)
+    :param inner: InnerPID (flow loop)
+    :param flow_plant, temp_plant: FirstOrderPlant for flow and temperature
+    :param setpoint: Temperature setpoint array
+    :param fast: Set False to force the interpreted loop
+    :return: temp, flow, flow_sp, valve arrays, same length as setpoint
+    """
+    setpoint = np.asarray(setpoint, dtype=float)
+    n = len(setpoint)
+    temp = np.zeros(n)
+    flow = np.zeros(n)
+    flow_sp = np.zeros(n)
+    valve = np.zeros(n)
+    if n == 0:
+        return temp, flow, flow_sp, valve
+    temp[0] = temp_plant.y
+    flow[0] = flow_plant.y
+
+    if (fast and HAVE_COMPILED and type(outer) is OuterPID and type(inner) is InnerPID
+            and type(flow_plant) is FirstOrderPlant and type(temp_plant) is FirstOrderPlant):
+        outer_state = np.array([outer.int_err, outer.prev_err])
+        inner_state = np.array([inner.int_err, inner.prev_err])
+        _cascade_loop(setpoint, temp, flow, flow_sp, valve,
+                      flow_plant.a, flow_plant.b, temp_plant.a, temp_plant.b,
+                      np.array([outer.Kp, outer.Ki, outer.Kd, outer.dt, outer.windup_limit], dtype=float),
+                      outer_state,
+                      np.array([inner.Kp, inner.Ki, inner.Kd, inner.dt, inner.windup_limit], dtype=float),
+                      inner_state)
+        outer.int_err, outer.prev_err = float(outer_state[0]), float(outer_state[1])
+        inner.int_err, inner.prev_err = float(inner_state[0]), float(inner_state[1])
+        temp_plant.y, flow_plant.y = temp[-1], flow[-1]
+        return temp, flow, flow_sp, valve
+
+    sp = setpoint.tolist()
+    t_prev, f_prev = temp[0], flow[0]
+    for k in range(1, n):
+        r_flow = outer.compute(sp[k], t_prev)
+        v = inner.compute(r_flow, f_prev)
+        t_prev = temp_plant.step(f_prev)
+        f_prev = flow_plant.step(v)
+        flow_sp[k] = r_flow
+        valve[k] = v
+        flow[k] = f_prev
+        temp[k] = t_prev
+    return temp, flow, flow_sp, valve
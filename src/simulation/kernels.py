@@ -0,0 +1,180 @@
+"""
+Compiled closed-loop kernels for the scalar controllers.
+
+Each kernel runs a whole rollout of one controller type against a
+FirstOrderPlant, repeating the controller's compute() arithmetic operation for
+operation, so its output is bit-identical to stepping the Python classes.
+When numba is installed the kernels are JIT-compiled (cached on disk after the
+first call); otherwise HAVE_COMPILED is False and simulate() keeps using the
+Python classes.
+"""
+from controllers.kernels import HAVE_COMPILED, compile_kernel as _compile
+from controllers.p_controller import PController
+from controllers.pd_controller import PDController
+from controllers.pi_controller import PIController
+from controllers.pid_controller import PIDController
+from controllers.onoff_controller import OnOffController
+from controllers.deadbeat_controller import DeadbeatController
+
+# All loops share the simulate() convention: y[0] is the initial plant output,
+# and for k >= 1
+#   e[k] = sp[k] - y[k-1],  u[k] = compute(sp[k], y[k-1]),  y[k] = a*y[k-1] + b*u[k]
+
+@_compile
+def _p_loop(sp, y, u, e, a, b, Kp):
+    y_prev = y[0]
+    for k in range(1, len(sp)):
+        error = sp[k] - y_prev
+        u_k = Kp * error
+        e[k] = error
+        u[k] = u_k
+        y_prev = a * y_prev + b * u_k
+        y[k] = y_prev
+
+@_compile
+def _pd_loop(sp, y, u, e, a, b, Kp, Kd, dt, prev_error):
+    y_prev = y[0]
+    for k in range(1, len(sp)):
+        error = sp[k] - y_prev
+        u_k = Kp * error + Kd * ((error - prev_error) / dt)
+        prev_error = error
+        e[k] = error
+        u[k] = u_k
+        y_prev = a * y_prev + b * u_k
+        y[k] = y_prev
+    return prev_error
+
+@_compile
+def _pi_loop(sp, y, u, e, a, b, Kp, Ki, dt, limit, integral):
+    y_prev = y[0]
+    for k in range(1, len(sp)):
+        error = sp[k] - y_prev
+        integral = integral + error * dt
+        if integral > limit:
+            integral = limit
+        elif integral < -limit:
+            integral = -limit
+        u_k = Kp * error + Ki * integral
+        e[k] = error
+        u[k] = u_k
+        y_prev = a * y_prev + b * u_k
+        y[k] = y_prev
+    return integral
+
+@_compile
+def _pid_loop(sp, y, u, e, a, b, Kp, Ki, Kd, dt, limit, integral, prev_error):
+    y_prev = y[0]
+    for k in range(1, len(sp)):
+        error = sp[k] - y_prev
+        integral = integral + error * dt
+        if integral > limit:
+            integral = limit
+        elif integral < -limit:
+            integral = -limit
+        u_k = Kp * error + Ki * integral + Kd * ((error - prev_error) / dt)
+        prev_error = error
+        e[k] = error
+        u[k] = u_k
+        y_prev = a * y_prev + b * u_k
+        y[k] = y_prev
+    return integral, prev_error
+
+@_compile
+def _onoff_loop(sp, y, u, e, a, b, on_threshold, off_threshold, state):
+    y_prev = y[0]
+    for k in range(1, len(sp)):
+        error = sp[k] - y_prev
+        if error > on_threshold:
+            state = 1.0
+        elif error < off_threshold:
+            state = 0.0
+        e[k] = error
+        u[k] = state
+        y_prev = a * y_prev + b * state
+        y[k] = y_prev
+    return state
+
+@_compile
+def _deadbeat_loop(sp, y, u, e, a, b, ca, cb):
+    y_prev = y[0]
+    for k in range(1, len(sp)):
+        u_k = (sp[k] - ca * y_prev) / cb
+        e[k] = sp[k] - y_prev
+        u[k] = u_k
+        y_prev = a * y_prev + b * u_k
+        y[k] = y_prev
+
+@_compile
+def _cascade_loop(sp, temp, flow, flow_sp, valve, a_f, b_f, a_t, b_t,
+                  outer_gains, outer_state, inner_gains, inner_state):
+    # gains = (Kp, Ki, Kd, dt, windup_limit), state = [int_err, prev_err]
+    oKp, oKi, oKd, odt, olim = outer_gains[0], outer_gains[1], outer_gains[2], outer_gains[3], outer_gains[4]
+    iKp, iKi, iKd, idt, ilim = inner_gains[0], inner_gains[1], inner_gains[2], inner_gains[3], inner_gains[4]
+    o_int, o_prev = outer_state[0], outer_state[1]
+    i_int, i_prev = inner_state[0], inner_state[1]
+    t_prev = temp[0]
+    f_prev = flow[0]
+    for k in range(1, len(sp)):
+        error = sp[k] - t_prev
+        o_int += error * odt
+        if o_int > olim:
+            o_int = olim
+        elif o_int < -olim:
+            o_int = -olim
+        r_flow = oKp * error + oKi * o_int + oKd * ((error - o_prev) / odt)
+        o_prev = error
+
+        error = r_flow - f_prev
+        i_int += error * idt
+        if i_int > ilim:
+            i_int = ilim
+        elif i_int < -ilim:
+            i_int = -ilim
+        v = iKp * error + iKi * i_int + iKd * ((error - i_prev) / idt)
+        i_prev = error
+
+        # The temperature responds to the previous flow
+        t_prev = a_t * t_prev + b_t * f_prev
+        f_prev = a_f * f_prev + b_f * v
+        flow_sp[k] = r_flow
+        valve[k] = v
+        flow[k] = f_prev
+        temp[k] = t_prev
+    outer_state[0], outer_state[1] = o_int, o_prev
+    inner_state[0], inner_state[1] = i_int, i_prev
+
+def run_compiled(controller, plant, sp, y, u, e):
+    """
+    Run the kernel for controller's exact type over sp, writing y[1:], u[1:]
+    and e[1:] (y[0] must hold the initial output). Updates the controller's
+    and plant's state like the interpreted loop would.
+    Returns False, without touching anything, if there is no kernel for the
+    controller.
+    """
+    kind = type(controller)
+    a, b = plant.a, plant.b
+    if kind is PController:
+        _p_loop(sp, y, u, e, a, b, controller.Kp)
+    elif kind is PDController:
+        controller.prev_error = _pd_loop(sp, y, u, e, a, b, controller.Kp, controller.Kd,
+                                         controller.dt, controller.prev_error)
+    elif kind is PIController:
+        controller.integral_term = _pi_loop(sp, y, u, e, a, b, controller.Kp, controller.Ki,
+                                            controller.dt, controller.windup_limit,
+                                            controller.integral_term)
+        if len(sp) > 1:
+            controller.prev_error = e[-1]
+    elif kind is PIDController:
+        controller.integral_term, controller.prev_error = _pid_loop(
+            sp, y, u, e, a, b, controller.Kp, controller.Ki, controller.Kd, controller.dt,
+            controller.windup_limit, controller.integral_term, controller.prev_error)
+    elif kind is OnOffController:
+        controller.output_state = _onoff_loop(sp, y, u, e, a, b, controller.on_threshold,
+                                              controller.off_threshold, controller.output_state)
+    elif kind is DeadbeatController:
+        _deadbeat_loop(sp, y, u, e, a, b, controller.a, controller.b)
+    else:
+        return False
+    if len(sp) > 1:
+        plant.y = y[-1]
+    return True
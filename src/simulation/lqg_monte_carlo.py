@@ -0,0 +1,236 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+def _closed_loop_matrices(A, B, C, K, L, dt):
+    """
+    Stack the Euler-discretized plant and LQGController observer into one
+    transition for the row-stacked state z = [x, x_hat]:
+      z[k+1] = z[k] @ Phi.T + w[k] @ Gw.T + v[k] @ Gv.T
+    with u = -K x_hat computed before the observer update, as in LQGController.step_measurement().
+    """
+    nx = A.shape[0]
+    eye = np.eye(nx)
+    BK = B @ K
+    Phi = np.block([
+        [eye + dt * A, -dt * BK],
+        [dt * L @ C, eye + dt * (A - BK - L @ C)],
+    ])
+    Gw = np.vstack([dt * eye, np.zeros((nx, nx))])
+    Gv = np.vstack([np.zeros((nx, C.shape[0])), dt * L])
+    return Phi, Gw, Gv
+
+def _bin_grid(model, x0, x_hat0, n_steps, w_std, v_std, n_bins, span=6.0):
+    """
+    Per-step histogram bins for x and u shared by all shards. The stacked
+    loop is linear with Gaussian noise, so the exact per-step mean m and
+    covariance S of z = [x, x_hat] follow from
+      m[k+1] = Phi m[k],   S[k+1] = Phi S[k] Phi.T + w_std^2 Gw Gw.T + v_std^2 Gv Gv.T
+    and the bins cover mean +- span standard deviations of every x and u entry.
+    :return: (lo, width), each of shape (n_steps, nx + nu)
+    """
+    A, B, C, K, L, dt = model
+    nx = A.shape[0]
+    Phi, Gw, Gv = _closed_loop_matrices(A, B, C, K, L, dt)
+    noise = w_std ** 2 * Gw @ Gw.T + v_std ** 2 * Gv @ Gv.T
+    m = np.concatenate([np.ravel(x0), np.ravel(x_hat0)]).astype(float)
+    S = np.zeros((2 * nx, 2 * nx))
+    mean = np.empty((n_steps, nx + K.shape[0]))
+    var = np.empty_like(mean)
+    for k in range(n_steps):
+        mean[k, :nx] = m[:nx]
+        var[k, :nx] = np.diag(S)[:nx]
+        mean[k, nx:] = -K @ m[nx:]
+        var[k, nx:] = np.einsum('ij,jk,ik->i', K, S[nx:, nx:], K)
+        m = Phi @ m
+        S = Phi @ S @ Phi.T + noise
+    # A floor keeps the bins finite where the spread is zero (e.g. at k = 0)
+    half = span * np.sqrt(np.maximum(var, 0.0)) + 1e-9 * (1.0 + np.abs(mean))
+    return mean - half, 2.0 * half / n_bins
+
+def _histogram_percentiles(counts, lo, width, percentiles):
+    """
+    Percentiles (numpy's linear definition on the sample ranks) read from
+    per-step histograms of shape (n_steps, n_cols, n_bins). The samples of a
+    bin are taken as evenly spread over it, so the resolution is one bin.
+    :return: Array of shape (n_steps, len(percentiles), n_cols)
+    """
+    cum = np.cumsum(counts, axis=-1)
+    n = cum[..., -1]
+    out = np.empty((counts.shape[0], len(percentiles), counts.shape[1]))
+    for i, p in enumerate(percentiles):
+        rank = p / 100.0 * (n - 1)
+        b = np.argmax(cum > rank[..., None], axis=-1)
+        in_bin = np.take_along_axis(counts, b[..., None], axis=-1)[..., 0]
+        before = np.take_along_axis(cum, b[..., None], axis=-1)[..., 0] - in_bin
+        out[:, i] = lo + width * (b + (rank - before + 0.5) / in_bin)
+    return out
+
+def _run_shard(model, x0, x_hat0, n_realizations, n_steps, w_std, v_std, percentiles, grid,
+               seed_seq):
+    """
+    Simulate one shard of realizations and return per-step running sums and
+    either exact percentiles (grid is None) or histograms of x and u on the
+    bins grid = (lo, width, n_bins). Only (n_realizations, nx) arrays are
+    kept, never whole trajectories.
+    """
+    A, B, C, K, L, dt = model
+    nx = A.shape[0]
+    nu = K.shape[0]
+    ny = C.shape[0]
+    rng = np.random.default_rng(seed_seq)
+    Phi_T, Gw_T, Gv_T = (m.T.copy() for m in _closed_loop_matrices(A, B, C, K, L, dt))
+    negK_T = -K.T
+
+    z = np.empty((n_realizations, 2 * nx))
+    z[:, :nx] = np.ravel(x0)
+    z[:, nx:] = np.ravel(x_hat0)
+    z_next = np.empty_like(z)
+    u = np.empty((n_realizations, nu))
+    err = np.empty((n_realizations, nx))
+
+    sum_x = np.zeros((n_steps, nx))
+    sum_x_hat = np.zeros((n_steps, nx))
+    sum_u = np.zeros((n_steps, nu))
+    sum_err = np.zeros((n_steps, nx))
+    sum_err_outer = np.zeros((n_steps, nx, nx))
+    if grid is None:
+        x_pct = np.empty((n_steps, len(percentiles), nx))
+        u_pct = np.empty((n_steps, len(percentiles), nu))
+    else:
+        lo, width, n_bins = grid
+        counts = np.zeros((n_steps, nx + nu, n_bins), dtype=np.int32)
+        pos = np.empty((n_realizations, nx + nu))
+        bins = np.empty((n_realizations, nx + nu), dtype=np.intp)
+        offsets = np.arange(nx + nu) * n_bins
+
+    for k in range(n_steps):
+        x = z[:, :nx]
+        x_hat = z[:, nx:]
+        np.matmul(x_hat, negK_T, out=u)
+        np.subtract(x, x_hat, out=err)
+
+        sum_x[k] = x.sum(axis=0)
+        sum_x_hat[k] = x_hat.sum(axis=0)
+        sum_u[k] = u.sum(axis=0)
+        sum_err[k] = err.sum(axis=0)
+        sum_err_outer[k] = err.T @ err
+        if grid is None:
+            x_pct[k] = np.percentile(x, percentiles, axis=0)
+            u_pct[k] = np.percentile(u, percentiles, axis=0)
+        else:
+            # Bin index of every x and u entry; the rare samples beyond the
+            # grid are counted in the edge bins
+            np.subtract(x, lo[k, :nx], out=pos[:, :nx])
+            np.subtract(u, lo[k, nx:], out=pos[:, nx:])
+            pos /= width[k]
+            np.clip(pos, 0, n_bins - 1, out=pos)
+            bins[...] = pos
+            bins += offsets
+            counts[k] = np.bincount(bins.ravel(), minlength=(nx + nu) * n_bins).reshape(nx + nu, n_bins)
+
+        # One batched matmul advances plant and observer for every realization
+        np.matmul(z, Phi_T, out=z_next)
+        z_next += (w_std * rng.standard_normal((n_realizations, nx))) @ Gw_T
+        z_next += (v_std * rng.standard_normal((n_realizations, ny))) @ Gv_T
+        z, z_next = z_next, z
+
+    shard = dict(n=n_realizations, sum_x=sum_x, sum_x_hat=sum_x_hat, sum_u=sum_u,
+                 sum_err=sum_err, sum_err_outer=sum_err_outer)
+    if grid is None:
+        shard.update(x_pct=x_pct, u_pct=u_pct)
+    else:
+        shard.update(counts=counts)
+    return shard
+
+def lqg_monte_carlo(lqg, x0, n_realizations, n_steps, w_std, v_std, x_hat0=None,
+                    percentiles=(5.0, 50.0, 95.0), seed=None, n_shards=1, n_workers=None,
+                    n_bins=1024):
+    """
+    Monte Carlo closed-loop runs of an LQGController on its own (A, B) plant,
+    with the same Euler plant and noise model as run_lqg_example.py:
+      y = C x + v,       v ~ N(0, v_std^2)
+      u = lqg.step_measurement(y)
+      x <- x + dt*(A x + B u + w),   w ~ N(0, w_std^2)
+    Only the regulator with the fixed-gain observer L is modelled; servo mode
+    and an attached KalmanFilter raise ValueError.
+
+    All realizations in a shard are stepped together as stacked (M, nx) arrays.
+    Shards get independent streams spawned from SeedSequence(seed), so results
+    depend on (seed, n_shards) but not on n_workers. With n_workers > 1 the
+    shards run in a process pool.
+
+    Means and the estimation-error covariance are exact across shards.
+    Percentiles are exact with a single shard. With several shards every
+    shard counts x and u into the same per-step histograms (n_bins bins over
+    mean +- 6 standard deviations, computed from the exact Gaussian
+    propagation of the loop), the counts are summed and the pooled
+    percentiles are read from the merged histogram, to a resolution of
+    12/n_bins standard deviations. Each shard holds n_steps*(nx+nu)*n_bins
+    int32 counts.
+
+    :param lqg: LQGController providing A, B, C, K, L and dt
+    :param x0: Initial true state (nx,) or (nx, 1)
+    :param n_realizations: Total number of realizations M
+    :param n_steps: Number of time steps
+    :param w_std: Process noise standard deviation
+    :param v_std: Measurement noise standard deviation
+    :param x_hat0: Initial state estimate (defaults to zeros)
+    :param percentiles: Percentiles (0-100) to report per step
+    :param seed: Seed for the root SeedSequence
+    :param n_shards: Number of independent shards the realizations are split into
+    :param n_workers: Process pool size (None or 1 runs the shards in-process)
+    :param n_bins: Histogram bins per step and variable when n_shards > 1
+    :return: dict with 'mean_x', 'mean_x_hat', 'mean_u' (n_steps, ...),
+             'x_percentiles', 'u_percentiles' (n_steps, len(percentiles), ...),
+             'error_mean' (n_steps, nx) and 'error_cov' (n_steps, nx, nx)
+    """
+    if lqg.discretization != 'euler':
+        raise ValueError("lqg_monte_carlo models the Euler-discretized LQGController")
+    if lqg.servo:
+        raise ValueError("lqg_monte_carlo models the regulator; servo mode (integrator and "
+                         "reference feedforward) is not supported")
+    if lqg.kalman_filter is not None:
+        raise ValueError("lqg_monte_carlo models the fixed-gain observer L; detach the "
+                         "Kalman filter")
+    model = (lqg.A, lqg.B, lqg.C, lqg.K, lqg.L, lqg.dt)
+    if x_hat0 is None:
+        x_hat0 = np.zeros(lqg.nx)
+    percentiles = np.asarray(percentiles, dtype=float)
+
+    sizes = [len(part) for part in np.array_split(np.arange(n_realizations), n_shards)]
+    seeds = np.random.SeedSequence(seed).spawn(n_shards)
+    grid = None
+    if sum(size > 0 for size in sizes) > 1:
+        grid = _bin_grid(model, x0, x_hat0, n_steps, w_std, v_std, n_bins) + (n_bins,)
+    jobs = [(model, x0, x_hat0, size, n_steps, w_std, v_std, percentiles, grid, s)
+            for size, s in zip(sizes, seeds) if size > 0]
+
+    if n_workers is None or n_workers <= 1:
+        shards = [_run_shard(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            shards = list(pool.map(_run_shard, *zip(*jobs)))
+
+    n = sum(shard['n'] for shard in shards)
+    total = {key: sum(shard[key] for shard in shards)
+             for key in ('sum_x', 'sum_x_hat', 'sum_u', 'sum_err', 'sum_err_outer')}
+    error_mean = total['sum_err'] / n
+    error_cov = total['sum_err_outer'] / n - error_mean[:, :, None] * error_mean[:, None, :]
+
+    if grid is None:
+        x_pct, u_pct = shards[0]['x_pct'], shards[0]['u_pct']
+    else:
+        counts = sum(shard['counts'].astype(np.int64) for shard in shards)
+        pct = _histogram_percentiles(counts, grid[0], grid[1], percentiles)
+        x_pct, u_pct = pct[..., :lqg.nx], pct[..., lqg.nx:]
+
+    return dict(
+        mean_x=total['sum_x'] / n,
+        mean_x_hat=total['sum_x_hat'] / n,
+        mean_u=total['sum_u'] / n,
+        x_percentiles=x_pct,
+        u_percentiles=u_pct,
+        error_mean=error_mean,
+        error_cov=error_cov,
+    )
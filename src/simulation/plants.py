@@ -0,0 +1,37 @@
+class FirstOrderPlant:
+    """
+    Discrete first-order plant used by the closed-loop simulation engine:
+      y[k] = a*y[k-1] + b*u[k]
+
+    This is the model behind the Euler-integrated plants in the run_*_example.py
+    scripts; use FirstOrderPlant.euler() to build it from a time constant and gain.
+    """
+
+    def __init__(self, a, b, y0=0.0):
+        """
+        :param a: Pole of the discrete plant
+        :param b: Input coefficient
+        :param y0: Initial output
+        """
+        self.a = a
+        self.b = b
+        self.y0 = y0
+        self.y = y0
+
+    @classmethod
+    def euler(cls, tau=1.0, gain=1.0, dt=0.01, y0=0.0):
+        """
+        Euler discretization of y'(t) = (gain*u(t) - y(t)) / tau.
+        """
+        alpha = dt / tau
+        return cls(1.0 - alpha, alpha * gain, y0=y0)
+
+    def reset(self):
+        self.y = self.y0
+
+    def step(self, u):
+        """
+        Advance the plant by one sample with input u and return the new output.
+        """
+        self.y = self.a * self.y + self.b * u
+        return self.y
@@ -0,0 +1,206 @@
+import math
+import time
+from fractions import Fraction
+
+def _as_fraction(value):
+    # Periods like 0.01 are not exact in binary; snap to a nearby simple fraction
+    return Fraction(value).limit_denominator(10**9)
+
+class RateGroup:
+    """
+    All loops that run at the same period and phase. On each of its ticks the
+    group reads, steps and writes its loops in insertion order and records
+    how long that took.
+    """
+
+    def __init__(self, name, period, multiple, offset, budget):
+        """
+        :param name: Label used in reports
+        :param period: Period in seconds
+        :param multiple: Period in base ticks
+        :param offset: Phase in base ticks (0 <= offset < multiple)
+        :param budget: Execution time allowed per run (seconds) before it
+                       counts as an overrun
+        """
+        self.name = name
+        self.period = period
+        self.multiple = multiple
+        self.offset = offset
+        self.budget_ns = int(budget * 1e9)
+        self.tasks = []
+
+        self.runs = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.overruns = 0
+
+    def add(self, controller, read, write):
+        self.tasks.append((controller.compute, read, write))
+
+    def run(self, t):
+        """
+        Step every loop of the group once at time t.
+        """
+        clock = time.perf_counter_ns
+        start = clock()
+        for compute, read, write in self.tasks:
+            setpoint, measurement = read(t)
+            u = compute(setpoint, measurement)
+            if write is not None:
+                write(u, t)
+        elapsed = clock() - start
+
+        self.runs += 1
+        self.total_ns += elapsed
+        if elapsed > self.max_ns:
+            self.max_ns = elapsed
+        if elapsed > self.budget_ns:
+            self.overruns += 1
+        return elapsed
+
+    def reset_stats(self):
+        self.runs = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.overruns = 0
+
+class MultiRateScheduler:
+    """
+    Deterministic multi-rate executor for controllers with different sample
+    periods.
+
+    Loops are grouped by (period, offset) into RateGroups. The base tick is the
+    greatest common divisor of all periods, and the schedule repeats every
+    hyperperiod (least common multiple of the periods). It is built once as a
+    table of the groups due on each base tick, so a tick only steps the loops
+    that are due, fastest group first (rate-monotonic order), with no
+    per-tick bookkeeping.
+
+    Any controller with compute(setpoint, measurement) can be scheduled,
+    including the bank controllers (PIDBank, CascadeBank, DiscreteIMCBank, ...)
+    whose single call steps a whole batch of loops: put many loops that share
+    a period into one bank to step them together.
+
+    tick() and run() execute back to back (as fast as possible). Each group's
+    execution time is measured; a run longer than the group's budget (its
+    period unless given) counts as an overrun, as does a whole tick that takes
+    longer than the base tick.
+    """
+
+    def __init__(self, base_period=None):
+        """
+        :param base_period: Base tick in seconds; defaults to the GCD of the
+                            periods of the added loops
+        """
+        self._requested_base = base_period
+        self.base_period = base_period
+        self.groups = {}
+        self._table = None
+        self.ticks = 0
+        self.tick_overruns = 0
+
+    def add(self, controller, period, read, write=None, offset=0, budget=None, name=None):
+        """
+        Schedule a controller.
+        :param controller: Object with compute(setpoint, measurement)
+        :param period: Sample period in seconds (a multiple of the base tick)
+        :param read: Callable read(t) -> (setpoint, measurement)
+        :param write: Optional callable write(u, t) receiving the output
+        :param offset: Phase offset in seconds, e.g. to spread slow groups over
+                       different ticks
+        :param budget: Execution-time budget per group run (seconds); defaults
+                       to the period. The first loop added to a group sets it.
+        :param name: Group label (defaults to the period)
+        :return: The RateGroup the loop was added to
+        """
+        period = _as_fraction(period)
+        offset = _as_fraction(offset)
+        if period <= 0 or not 0 <= offset < period:
+            raise ValueError("period must be positive and 0 <= offset < period")
+        key = (period, offset)
+        group = self.groups.get(key)
+        if group is None:
+            if name is None:
+                name = f"{float(period):g}s" + (f"+{float(offset):g}" if offset else "")
+            group = RateGroup(name, float(period), None, None,
+                              float(period) if budget is None else budget)
+            self.groups[key] = group
+        group.add(controller, read, write)
+        self._table = None
+        return group
+
+    def _compile(self):
+        """
+        Fix the base tick and build the hyperperiod table.
+        """
+        keys = list(self.groups)
+        if not keys:
+            raise ValueError("no loops scheduled")
+        if self._requested_base is None:
+            values = [v for key in keys for v in key if v]
+            num = math.gcd(*(v.numerator for v in values))
+            den = math.lcm(*(v.denominator for v in values))
+            base = Fraction(num, den)
+        else:
+            base = _as_fraction(self._requested_base)
+        self.base = base
+        self.base_period = float(base)
+
+        for (period, offset), group in self.groups.items():
+            if (period / base).denominator != 1 or (offset / base).denominator != 1:
+                raise ValueError(f"period/offset of group {group.name} is not a multiple "
+                                 f"of the base tick {float(base):g}s")
+            group.multiple = int(period / base)
+            group.offset = int(offset / base)
+
+        # Fastest groups first, then by phase
+        ordered = sorted(self.groups.values(), key=lambda g: (g.multiple, g.offset))
+        self.hyperperiod = math.lcm(*(g.multiple for g in ordered))
+        self._table = [tuple(g for g in ordered if k % g.multiple == g.offset)
+                       for k in range(self.hyperperiod)]
+        self._base_ns = int(self.base_period * 1e9)
+
+    def tick(self):
+        """
+        Run the groups due on the next base tick.
+        :return: Time of the tick in seconds
+        """
+        if self._table is None:
+            self._compile()
+        k = self.ticks
+        t = k * self.base_period
+        elapsed = 0
+        for group in self._table[k % self.hyperperiod]:
+            elapsed += group.run(t)
+        if elapsed > self._base_ns:
+            self.tick_overruns += 1
+        self.ticks = k + 1
+        return t
+
+    def run(self, n_ticks):
+        """
+        Run n_ticks base ticks back to back.
+        """
+        tick = self.tick
+        for _ in range(n_ticks):
+            tick()
+
+    def stats(self):
+        """
+        :return: Dict of group name -> dict(period, runs, mean_us, max_us, overruns)
+        """
+        return {g.name: dict(period=g.period, runs=g.runs,
+                             mean_us=g.total_ns / g.runs / 1e3 if g.runs else 0.0,
+                             max_us=g.max_ns / 1e3, overruns=g.overruns)
+                for g in self.groups.values()}
+
+    def report(self):
+        """
+        Per-group timing table as a string.
+        """
+        lines = [f"{'group':<14}{'period s':>10}{'runs':>10}{'mean us':>10}{'max us':>10}{'overruns':>10}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<14}{s['period']:>10g}{s['runs']:>10d}{s['mean_us']:>10.1f}"
+                         f"{s['max_us']:>10.1f}{s['overruns']:>10d}")
+        lines.append(f"ticks: {self.ticks}, tick overruns: {self.tick_overruns}")
+        return "\n".join(lines)
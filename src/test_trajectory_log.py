@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from data.trajectory_log import TrajectoryLog, TrajectoryRecorder
+
+def test_window_with_equal_times_across_chunks(tmp_path):
+    # The t=3 rows span the boundary between chunk 0 and chunk 1
+    t = np.array([0.0, 1.0, 2.0, 3.0, 3.0, 3.0, 4.0, 5.0, 6.0, 7.0])
+    path = str(tmp_path / 'log')
+    with TrajectoryRecorder(path, {'t': (), 'y': ()}, chunk_size=4) as recorder:
+        for k, t_k in enumerate(t):
+            recorder.record(t_k, float(k))
+
+    window = TrajectoryLog(path).window(3.0, 3.5)
+    np.testing.assert_array_equal(window['t'], [3.0, 3.0, 3.0])
+    np.testing.assert_array_equal(window['y'], [3.0, 4.0, 5.0])
+
+def test_record_rejects_incomplete_rows(tmp_path):
+    with TrajectoryRecorder(str(tmp_path / 'log'), {'t': (), 'y': (), 'x': ()}) as recorder:
+        with pytest.raises(ValueError):
+            recorder.record(3.0, 3.0)
+        with pytest.raises(ValueError):
+            recorder.record_many(t=[0.0, 1.0], y=[0.0, 1.0])
+        with pytest.raises(ValueError):
+            recorder.record_many(t=[0.0, 1.0], y=[0.0, 1.0], x=[0.0])
+        assert recorder._row == 0